@@ -123,6 +123,16 @@ STATICFILES_DIRS = [BASE_DIR / 'static']
 MEDIA_URL = 'media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# File uploads: hash CAD files as they stream in (used by the parse cache)
+FILE_UPLOAD_HANDLERS = [
+    'lighting.uploadhandlers.HashingUploadHandler',
+    'django.core.files.uploadhandler.MemoryFileUploadHandler',
+    'django.core.files.uploadhandler.TemporaryFileUploadHandler',
+]
+
+# Parsed CAD result cache (stored under MEDIA_ROOT/parse_cache)
+CAD_PARSE_CACHE_MAX_BYTES = 512 * 1024 * 1024
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/6.0/ref/settings/#default-auto-field
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
@@ -139,3 +149,14 @@ CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = 'UTC'
+
+# Report generation: 'thread' (in-process pool), 'celery' (needs a worker)
+# or 'sync' (inside the request)
+REPORT_BACKEND = 'thread'
+REPORT_WORKERS = 2
+
+# PDF reports with at least this many rooms render room chunks in a process
+# pool and merge them (needs pypdf); PDF_WORKERS = None uses every CPU
+PDF_PARALLEL_MIN_ROOMS = 500
+PDF_CHUNK_ROOMS = 250
+PDF_WORKERS = None
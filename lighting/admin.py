@@ -1,10 +1,10 @@
 from django.contrib import admin
-from .models import LightingCatalog, CADFile, Room, Fixture, Report
+from .models import LightingCatalog, CADFile, Room, Fixture, Report, FixtureRecommendation, SymbolLegend
 
 
 @admin.register(LightingCatalog)
 class LightingCatalogAdmin(admin.ModelAdmin):
-    list_display = ['symbol_name', 'brand', 'model_number', 'lumens', 'wattage', 'unit_cost']
+    list_display = ['symbol_name', 'brand', 'model_number', 'lumens', 'wattage', 'unit_cost', 'efficiency_score']
     list_filter = ['brand']
     search_fields = ['symbol_name', 'brand', 'model_number']
     ordering = ['symbol_name']
@@ -12,33 +12,61 @@ class LightingCatalogAdmin(admin.ModelAdmin):
 
 @admin.register(CADFile)
 class CADFileAdmin(admin.ModelAdmin):
-    list_display = ['project_name', 'user', 'filename', 'status', 'uploaded_at']
+    list_display = ['project_name', 'user', 'filename', 'status', 'fixture_count', 'total_cost', 'uploaded_at']
     list_filter = ['status', 'uploaded_at']
     search_fields = ['project_name', 'filename', 'user__username']
-    readonly_fields = ['uploaded_at', 'processed_at']
+    readonly_fields = ['uploaded_at', 'processed_at', 'total_lumens', 'fixture_count', 'total_cost', 'average_lux', 'revision', 'symbol_report']
     ordering = ['-uploaded_at']
 
 
 @admin.register(Room)
 class RoomAdmin(admin.ModelAdmin):
-    list_display = ['name', 'cad_file', 'area', 'height', 'required_lux', 'current_lux']
+    list_display = ['name', 'cad_file', 'area', 'height', 'required_lux', 'utilization_factor', 'current_lux', 'adequately_lit', 'fixture_count', 'total_cost']
+    readonly_fields = ['utilization_factor', 'total_lumens', 'fixture_count', 'total_cost', 'current_lux']
     list_filter = ['cad_file']
     search_fields = ['name', 'cad_file__project_name']
     ordering = ['cad_file', 'name']
+    list_select_related = ['cad_file']
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).with_lighting_metrics()
+
+    @admin.display(boolean=True, description='Adequately lit', ordering='live_is_adequately_lit')
+    def adequately_lit(self, obj):
+        return obj.live_is_adequately_lit
 
 
 @admin.register(Fixture)
 class FixtureAdmin(admin.ModelAdmin):
     list_display = ['lighting_catalog', 'room', 'quantity', 'total_cost']
     list_filter = ['lighting_catalog', 'room__cad_file']
-    search_fields = ['lighting_catalog__symbol_name', 'room__name']
+    search_fields = ['lighting_catalog__symbol_name', 'cad_symbol', 'room__name']
+    list_select_related = ['lighting_catalog', 'room']
     ordering = ['room', 'lighting_catalog']
 
 
 @admin.register(Report)
 class ReportAdmin(admin.ModelAdmin):
-    list_display = ['cad_file', 'report_type', 'generated_at']
-    list_filter = ['report_type', 'generated_at']
+    list_display = ['cad_file', 'report_type', 'revision', 'status', 'generated_at']
+    list_filter = ['report_type', 'status', 'generated_at']
     search_fields = ['cad_file__project_name']
-    readonly_fields = ['generated_at']
+    readonly_fields = ['revision', 'generated_at']
     ordering = ['-generated_at']
+
+
+@admin.register(FixtureRecommendation)
+class FixtureRecommendationAdmin(admin.ModelAdmin):
+    list_display = ['catalog_item', 'band', 'priority', 'recommended']
+    list_filter = ['band']
+    search_fields = ['catalog_item__symbol_name', 'recommended__symbol_name']
+    list_select_related = ['catalog_item', 'recommended']
+    ordering = ['catalog_item', 'band', 'priority']
+
+
+@admin.register(SymbolLegend)
+class SymbolLegendAdmin(admin.ModelAdmin):
+    list_display = ['cad_symbol', 'lighting_catalog', 'user', 'source', 'updated_at']
+    list_filter = ['source', 'user']
+    search_fields = ['cad_symbol', 'lighting_catalog__symbol_name', 'user__username']
+    list_select_related = ['lighting_catalog', 'user']
+    ordering = ['cad_symbol']
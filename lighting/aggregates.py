@@ -0,0 +1,245 @@
+"""
+Materialized lumen, lux, fixture count and cost aggregates on Room and CADFile
+"""
+import threading
+from contextlib import contextmanager
+from decimal import Decimal
+from typing import Iterable, List, Optional, Set
+
+from django.db import transaction
+from django.db.models import Avg, DecimalField, F, Q, Sum, Value
+from django.db.models.functions import Coalesce
+
+from .models import CADFile, Room, RoomQuerySet, Fixture
+
+ZERO_COST = Decimal('0.00')
+COST_FIELD = DecimalField(max_digits=14, decimal_places=2)
+
+_state = threading.local()
+
+
+class PendingAggregates:
+    """Rooms and projects whose aggregates are rebuilt when a batch ends"""
+
+    def __init__(self):
+        self.room_ids: Set[int] = set()
+        self.cad_file_ids: Set[int] = set()
+
+    def flush(self):
+        """Rebuild everything recorded, once"""
+        if self.room_ids or self.cad_file_ids:
+            rebuild_aggregates(self.cad_file_ids, room_ids=self.room_ids)
+
+
+def pending_aggregates() -> Optional[PendingAggregates]:
+    """The batch collecting changes on this thread, if one is open"""
+    return getattr(_state, 'pending', None)
+
+
+@contextmanager
+def deferred_aggregates():
+    """
+    Batch aggregate maintenance for many fixture and room changes
+
+    Inside the block the fixture and room signal handlers only record the
+    rooms and projects they touch; on exit the recorded rooms are rebuilt
+    with one ``rebuild_aggregates`` call in the same transaction. Nested
+    blocks join the outermost one.
+
+    Yields:
+        PendingAggregates; add ids for changes made without signals
+        (e.g. ``bulk_create``)
+    """
+    pending = pending_aggregates()
+    if pending is not None:
+        yield pending
+        return
+
+    pending = _state.pending = PendingAggregates()
+    try:
+        with transaction.atomic():
+            yield pending
+            _state.pending = None
+            pending.flush()
+    finally:
+        _state.pending = None
+
+
+def room_lux_expression(total_lumens):
+    """
+    SQL expression for Room.current_lux given a total lumens expression
+
+    Mirrors ``Room.calculate_lux``.
+    """
+    return RoomQuerySet.lux_expression(total_lumens)
+
+
+def fixture_contribution(fixture: Fixture):
+    """Lumens, fixture count and cost a fixture adds to its room"""
+    return (
+        fixture.lighting_catalog.lumens * fixture.quantity,
+        fixture.quantity,
+        fixture.lighting_catalog.unit_cost * fixture.quantity,
+    )
+
+
+def apply_room_delta(room_id: int, lumens: int, count: int, cost: Decimal):
+    """
+    Add a delta to a room's stored totals and recompute its lux in one UPDATE
+
+    Args:
+        room_id: Room primary key
+        lumens: Change in total lumens
+        count: Change in fixture count
+        cost: Change in total cost
+    """
+    Room.objects.filter(pk=room_id).update(
+        total_lumens=F('total_lumens') + lumens,
+        fixture_count=F('fixture_count') + count,
+        total_cost=F('total_cost') + cost,
+        current_lux=room_lux_expression(F('total_lumens') + lumens),
+    )
+
+
+def refresh_room_lux(room_id: int):
+    """Recompute a room's lux from its stored total lumens (e.g. after an area or UF change)"""
+    Room.objects.filter(pk=room_id).update(current_lux=room_lux_expression(F('total_lumens')))
+
+
+def refresh_cad_file(cad_file_id: int):
+    """
+    Recompute a CAD file's totals from its rooms' stored aggregates
+
+    Also bumps the file's revision, which keys caches of derived results.
+
+    Args:
+        cad_file_id: CADFile primary key
+    """
+    totals = Room.objects.filter(cad_file_id=cad_file_id).aggregate(
+        total_lumens=Coalesce(Sum('total_lumens'), 0),
+        fixture_count=Coalesce(Sum('fixture_count'), 0),
+        total_cost=Coalesce(Sum('total_cost'), Value(ZERO_COST), output_field=COST_FIELD),
+        average_lux=Coalesce(Avg('current_lux', filter=Q(is_unassigned=False)), 0.0),
+    )
+    totals['average_lux'] = round(totals['average_lux'], 2)
+    CADFile.objects.filter(pk=cad_file_id).update(revision=F('revision') + 1, **totals)
+
+
+def compute_aggregates(cad_file: CADFile, rooms: List[Room], fixtures: List[Fixture]):
+    """
+    Fill aggregate fields on unsaved rows before ``bulk_create``
+
+    Args:
+        cad_file: CADFile the rows belong to
+        rooms: Unsaved rooms
+        fixtures: Unsaved fixtures referencing those rooms
+    """
+    for room in rooms:
+        room.total_lumens = 0
+        room.fixture_count = 0
+        room.total_cost = ZERO_COST
+
+    for fixture in fixtures:
+        lumens, count, cost = fixture_contribution(fixture)
+        fixture.room.total_lumens += lumens
+        fixture.room.fixture_count += count
+        fixture.room.total_cost += cost
+
+    lux_values = []
+    for room in rooms:
+        room.current_lux = room.calculate_lux(room.total_lumens)
+        if not room.is_unassigned:
+            lux_values.append(room.current_lux)
+
+    cad_file.total_lumens = sum(room.total_lumens for room in rooms)
+    cad_file.fixture_count = sum(room.fixture_count for room in rooms)
+    cad_file.total_cost = sum((room.total_cost for room in rooms), ZERO_COST)
+    cad_file.average_lux = round(sum(lux_values) / len(lux_values), 2) if lux_values else 0.0
+
+
+def _rebuild_rooms(rooms, batch_size: int) -> int:
+    """Recompute and store the aggregates of the rooms in a queryset"""
+    # One grouped query for every room's fixture totals
+    fixture_totals = {
+        row['room_id']: row
+        for row in Fixture.objects.filter(room__in=rooms).values('room_id').annotate(
+            lumens=Sum(F('quantity') * F('lighting_catalog__lumens')),
+            count=Sum('quantity'),
+            cost=Sum(F('quantity') * F('lighting_catalog__unit_cost'), output_field=COST_FIELD),
+        )
+    }
+
+    updated = []
+    for room in rooms.only('id', 'area', 'is_unassigned', 'utilization_factor').iterator(chunk_size=batch_size):
+        totals = fixture_totals.get(room.id, {})
+        room.total_lumens = totals.get('lumens') or 0
+        room.fixture_count = totals.get('count') or 0
+        room.total_cost = totals.get('cost') or ZERO_COST
+        room.current_lux = room.calculate_lux(room.total_lumens)
+        updated.append(room)
+    Room.objects.bulk_update(
+        updated, ['total_lumens', 'fixture_count', 'total_cost', 'current_lux'], batch_size=batch_size
+    )
+    return len(updated)
+
+
+def rebuild_aggregates(cad_file_ids: Optional[Iterable[int]] = None, batch_size: int = 1000,
+                       room_ids: Optional[Iterable[int]] = None) -> int:
+    """
+    Rebuild stored aggregates from fixture rows in bulk (bumping revisions)
+
+    Args:
+        cad_file_ids: Limit the rebuild to these CAD files (default: all)
+        batch_size: Rows per bulk_update batch
+        room_ids: Rebuild only these rooms, then the totals of their CAD
+            files and of ``cad_file_ids``; ids of deleted rows are ignored
+
+    Returns:
+        Number of rooms rebuilt
+    """
+    if room_ids is not None:
+        room_ids = sorted(set(room_ids))
+        room_sets = [
+            Room.objects.filter(pk__in=room_ids[start:start + batch_size])
+            for start in range(0, len(room_ids), batch_size)
+        ]
+        cad_file_ids = set(cad_file_ids or ())
+        for rooms in room_sets:
+            cad_file_ids.update(rooms.order_by().values_list('cad_file_id', flat=True).distinct())
+    elif cad_file_ids is not None:
+        cad_file_ids = list(cad_file_ids)
+        room_sets = [Room.objects.filter(cad_file_id__in=cad_file_ids)]
+    else:
+        room_sets = [Room.objects.all()]
+
+    cad_files = CADFile.objects.all()
+    if cad_file_ids is not None:
+        cad_files = cad_files.filter(pk__in=list(cad_file_ids))
+
+    rebuilt = sum(_rebuild_rooms(rooms, batch_size) for rooms in room_sets)
+
+    # One grouped query for every CAD file's room totals
+    room_totals = {
+        row['cad_file_id']: row
+        for row in Room.objects.filter(cad_file__in=cad_files).values('cad_file_id').annotate(
+            lumens=Sum('total_lumens'),
+            count=Sum('fixture_count'),
+            cost=Sum('total_cost'),
+            lux=Avg('current_lux', filter=Q(is_unassigned=False)),
+        )
+    }
+
+    project_rows = []
+    for cad_file in cad_files.only('id').iterator(chunk_size=batch_size):
+        totals = room_totals.get(cad_file.id, {})
+        cad_file.total_lumens = totals.get('lumens') or 0
+        cad_file.fixture_count = totals.get('count') or 0
+        cad_file.total_cost = totals.get('cost') or ZERO_COST
+        cad_file.average_lux = round(totals.get('lux') or 0.0, 2)
+        project_rows.append(cad_file)
+    CADFile.objects.bulk_update(
+        project_rows, ['total_lumens', 'fixture_count', 'total_cost', 'average_lux'], batch_size=batch_size
+    )
+    cad_files.update(revision=F('revision') + 1)
+
+    return rebuilt
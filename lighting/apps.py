@@ -3,3 +3,7 @@ from django.apps import AppConfig
 
 class LightingConfig(AppConfig):
     name = 'lighting'
+
+    def ready(self):
+        # Register signal handlers
+        from . import signals  # noqa: F401
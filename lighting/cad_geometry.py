@@ -0,0 +1,179 @@
+"""
+Columnar NumPy representation of parsed CAD fixture inserts and room outlines
+"""
+from array import array
+from typing import Dict, Iterable, Optional, Tuple
+
+import ezdxf
+import numpy as np
+
+from .utils import (
+    calculate_polygon_areas,
+    infer_unit_scale,
+    is_ascii_dxf,
+    iter_cad_entities,
+    iter_cad_document_entities,
+    read_dxf_insunits,
+)
+
+
+class CADGeometry:
+    """
+    Parsed CAD entities stored as flat arrays instead of per-entity dicts
+
+    Block inserts are columns indexed by insert number: ``x``, ``y``, ``z``
+    and ``rotation`` (float64) plus ``block_codes`` / ``block_layer_codes``
+    (int32) pointing into the ``block_names`` / ``layer_names`` string
+    tables. Room outlines share one ``vertices`` array of shape (V, 2);
+    polygon ``i`` is ``vertices[offsets[i]:offsets[i + 1]]``. ``insunits``
+    is the drawing's $INSUNITS header code (-1 if not set).
+    """
+
+    ARRAY_FIELDS = (
+        'block_codes', 'block_layer_codes', 'x', 'y', 'z', 'rotation',
+        'vertices', 'offsets', 'room_layer_codes',
+    )
+
+    def __init__(self, block_names, layer_names, block_codes, block_layer_codes,
+                 x, y, z, rotation, vertices, offsets, room_layer_codes, insunits=-1):
+        self.block_names = list(block_names)
+        self.layer_names = list(layer_names)
+        self.block_codes = np.asarray(block_codes, dtype=np.int32)
+        self.block_layer_codes = np.asarray(block_layer_codes, dtype=np.int32)
+        self.x = np.asarray(x, dtype=np.float64)
+        self.y = np.asarray(y, dtype=np.float64)
+        self.z = np.asarray(z, dtype=np.float64)
+        self.rotation = np.asarray(rotation, dtype=np.float64)
+        self.vertices = np.asarray(vertices, dtype=np.float64).reshape(-1, 2)
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        self.room_layer_codes = np.asarray(room_layer_codes, dtype=np.int32)
+        self.insunits = int(insunits)
+        self._unit_scale = None
+
+    @classmethod
+    def from_entities(cls, entities: Iterable[Tuple[str, Dict]], insunits: Optional[int] = None) -> 'CADGeometry':
+        """
+        Build columns from an entity stream without keeping per-entity objects
+
+        Args:
+            entities: Iterator of ('INSERT' | 'LWPOLYLINE', data) tuples as
+                produced by ``iter_cad_entities``
+            insunits: $INSUNITS header code of the drawing, if set
+
+        Returns:
+            CADGeometry instance
+        """
+        block_table: Dict[str, int] = {}
+        layer_table: Dict[str, int] = {}
+
+        block_codes = array('i')
+        block_layer_codes = array('i')
+        x, y, z, rotation = array('d'), array('d'), array('d'), array('d')
+        vertices = array('d')
+        offsets = array('q', [0])
+        room_layer_codes = array('i')
+
+        for entity_type, entity in entities:
+            layer_code = layer_table.setdefault(entity['layer'], len(layer_table))
+            if entity_type == 'INSERT':
+                block_codes.append(block_table.setdefault(entity['block_name'], len(block_table)))
+                block_layer_codes.append(layer_code)
+                x.append(entity['x'])
+                y.append(entity['y'])
+                z.append(entity['z'])
+                rotation.append(entity['rotation'])
+            else:
+                for point in entity['points']:
+                    vertices.append(point[0])
+                    vertices.append(point[1])
+                offsets.append(len(vertices) // 2)
+                room_layer_codes.append(layer_code)
+
+        return cls(
+            block_names=block_table, layer_names=layer_table,
+            block_codes=block_codes, block_layer_codes=block_layer_codes,
+            x=x, y=y, z=z, rotation=rotation,
+            vertices=vertices, offsets=offsets, room_layer_codes=room_layer_codes,
+            insunits=-1 if insunits is None else insunits,
+        )
+
+    @classmethod
+    def from_npz(cls, file) -> 'CADGeometry':
+        """Load geometry written by ``save_npz``"""
+        with np.load(file, allow_pickle=False) as data:
+            return cls(
+                block_names=data['block_names'].tolist(),
+                layer_names=data['layer_names'].tolist(),
+                insunits=data['insunits'],
+                **{field: data[field] for field in cls.ARRAY_FIELDS}
+            )
+
+    def save_npz(self, file):
+        """Write geometry as a compressed .npz archive (no pickled objects)"""
+        np.savez_compressed(
+            file,
+            block_names=np.array(self.block_names, dtype=str),
+            layer_names=np.array(self.layer_names, dtype=str),
+            insunits=np.int32(self.insunits),
+            **{field: getattr(self, field) for field in self.ARRAY_FIELDS}
+        )
+
+    @property
+    def total_blocks(self) -> int:
+        return len(self.block_codes)
+
+    @property
+    def total_rooms(self) -> int:
+        return len(self.offsets) - 1
+
+    def polygon(self, index: int) -> np.ndarray:
+        """Vertices of room outline ``index`` as an (n, 2) view"""
+        return self.vertices[self.offsets[index]:self.offsets[index + 1]]
+
+    def select_rooms(self, indices) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Vertices and offsets of a subset of room outlines, in the given order
+
+        Returns:
+            Tuple of (vertices (V', 2), offsets (len(indices) + 1,))
+        """
+        indices = np.asarray(indices, dtype=np.int64)
+        counts = self.offsets[indices + 1] - self.offsets[indices]
+        offsets = np.concatenate([[0], np.cumsum(counts)])
+        local = np.arange(offsets[-1]) - np.repeat(offsets[:-1], counts)
+        return self.vertices[np.repeat(self.offsets[indices], counts) + local], offsets
+
+    def raw_room_areas(self) -> np.ndarray:
+        """Area of every room outline in square drawing units"""
+        return calculate_polygon_areas(self.vertices, self.offsets)
+
+    @property
+    def unit_scale(self) -> float:
+        """Meters per drawing unit, chosen once for the whole drawing"""
+        if self._unit_scale is None:
+            insunits = self.insunits if self.insunits >= 0 else None
+            self._unit_scale = infer_unit_scale(self.raw_room_areas(), insunits)
+        return self._unit_scale
+
+    def room_areas(self) -> np.ndarray:
+        """Area of every room outline in square meters"""
+        return self.raw_room_areas() * (self.unit_scale ** 2)
+
+
+def parse_cad_columnar(file_path: str, streaming: bool = True) -> CADGeometry:
+    """
+    Parse a CAD file straight into columnar arrays
+
+    Args:
+        file_path: Path to the CAD file
+        streaming: Use the single-pass DXF reader for ASCII DXF files
+
+    Returns:
+        CADGeometry instance (errors from the underlying readers propagate)
+    """
+    if streaming and is_ascii_dxf(file_path):
+        return CADGeometry.from_entities(iter_cad_entities(file_path), read_dxf_insunits(file_path))
+
+    doc = ezdxf.readfile(file_path)
+    insunits = doc.header.get('$INSUNITS') if '$INSUNITS' in doc.header else None
+    return CADGeometry.from_entities(iter_cad_document_entities(doc), insunits)
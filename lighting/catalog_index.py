@@ -0,0 +1,243 @@
+"""
+Process-local in-memory index of the lighting catalog for recommendation queries
+"""
+import threading
+import uuid
+from bisect import bisect_left, bisect_right
+from decimal import Decimal
+from typing import Dict, List, Optional
+
+import numpy as np
+from django.core.cache import cache
+
+from .models import LightingCatalog
+
+VERSION_CACHE_KEY = 'lighting:catalog_version'
+
+# Cost bands as (lower, upper) multiples of the current cost, each with an
+# inclusive flag, and the sort order of the matching ORM query
+BUDGET_BANDS = {
+    # Below: 30-100% of current cost (more affordable options)
+    'below': ((Decimal('0.3'), True), (Decimal('1'), False), ('unit_cost', '-lumens')),
+    # Within: 80-120% (similar price range)
+    'within': ((Decimal('0.8'), True), (Decimal('1.2'), True), ('-lumens', 'unit_cost')),
+    # Above: 100-150% (premium options with better specs)
+    'above': ((Decimal('1'), False), (Decimal('1.5'), True), ('-lumens', 'unit_cost')),
+}
+
+# Lumens window (±35%) around the current fixture
+MIN_LUMENS_FACTOR = 0.65
+MAX_LUMENS_FACTOR = 1.35
+
+_lock = threading.Lock()
+_index = None
+
+
+def to_paise(amount) -> Decimal:
+    """Rupee amount as (possibly fractional) paise, exactly"""
+    return Decimal(amount) * 100
+
+
+class CatalogIndex:
+    """
+    Catalog columns sorted by unit cost
+
+    Costs are held as integer paise so band limits compare exactly, as the
+    decimal comparisons in the database do. A band is a contiguous range of
+    the cost column found by bisection; candidates are then filtered by the
+    lumen window with NumPy masks.
+    """
+
+    # Largest query × catalog boolean mask built at once
+    MAX_MASK_CELLS = 4_000_000
+
+    def __init__(self, items: List[LightingCatalog], version: Optional[str] = None):
+        """
+        Args:
+            items: Every catalog entry
+            version: Version stamp the entries were loaded under
+        """
+        self.version = version
+        cost_paise = [int(to_paise(item.unit_cost)) for item in items]
+        order = sorted(range(len(items)), key=lambda i: (cost_paise[i], items[i].id))
+
+        self.items = [items[i] for i in order]
+        self.cost_list = [cost_paise[i] for i in order]
+        self.ids = np.array([item.id for item in self.items], dtype=np.int64)
+        self.lumens = np.array([item.lumens for item in self.items], dtype=np.int64)
+        self.wattage = np.array([item.wattage for item in self.items], dtype=np.float64)
+        self.cost = np.array(self.cost_list, dtype=np.int64)
+        self.by_id = {item.id: item for item in self.items}
+        self.position_by_id = {item.id: position for position, item in enumerate(self.items)}
+
+        # Stored scores (kept by LightingCatalog.save) rank the efficiency list
+        self.efficiency = np.array([item.efficiency_score for item in self.items], dtype=np.float64)
+
+        # Catalog positions in each band ordering, ties broken by id
+        # (lexsort keys are given least significant first)
+        columns = {'unit_cost': self.cost, 'lumens': self.lumens}
+        self.orderings = {}
+        for _, _, ordering in BUDGET_BANDS.values():
+            keys = [self.ids]
+            for field in reversed(ordering):
+                column = columns[field.lstrip('-')]
+                keys.append(-column if field.startswith('-') else column)
+            self.orderings[ordering] = np.lexsort(keys)
+
+    def __len__(self):
+        return len(self.items)
+
+    def band_slice(self, current_cost, budget_range: str) -> slice:
+        """Positions in the cost-sorted columns inside a budget band"""
+        (low, low_inclusive), (high, high_inclusive), _ = BUDGET_BANDS[budget_range]
+        current = to_paise(current_cost)
+        low_bisect = bisect_left if low_inclusive else bisect_right
+        high_bisect = bisect_right if high_inclusive else bisect_left
+        return slice(low_bisect(self.cost_list, current * low), high_bisect(self.cost_list, current * high))
+
+    def band_positions(self, current_costs, catalog_items, budget_range: str,
+                       limit: Optional[int] = None) -> List[np.ndarray]:
+        """
+        Ordered positions of the items a budget band recommends, for many items at once
+
+        Each query row is matched against the whole catalog in one broadcast
+        (chunked to bound memory) and walked in the band's sort order.
+
+        Args:
+            current_costs: Current unit cost (in INR ₹) per query
+            catalog_items: Current LightingCatalog item per query (excluded
+                from its own results)
+            budget_range: 'below', 'within' or 'above'
+            limit: Maximum number of positions per query (default: all)
+
+        Returns:
+            One int64 array of positions into ``items`` per query
+        """
+        bounds = [self.band_slice(cost, budget_range) for cost in current_costs]
+        low = np.array([window.start for window in bounds], dtype=np.int64)
+        high = np.array([window.stop for window in bounds], dtype=np.int64)
+        lumens = np.array([item.lumens for item in catalog_items], dtype=np.float64)
+        ids = np.array([item.id for item in catalog_items], dtype=np.int64)
+
+        # Catalog columns in the band's sort order
+        order = self.orderings[BUDGET_BANDS[budget_range][2]]
+        order_lumens = self.lumens[order]
+        order_ids = self.ids[order]
+
+        results = []
+        chunk = max(1, self.MAX_MASK_CELLS // max(1, len(order)))
+        for start in range(0, len(ids), chunk):
+            rows = slice(start, start + chunk)
+            mask = (
+                (order[None, :] >= low[rows, None])
+                & (order[None, :] < high[rows, None])
+                & (order_lumens[None, :] >= lumens[rows, None] * MIN_LUMENS_FACTOR)
+                & (order_lumens[None, :] <= lumens[rows, None] * MAX_LUMENS_FACTOR)
+                & (order_ids[None, :] != ids[rows, None])
+            )
+            if limit is not None:
+                mask &= np.cumsum(mask, axis=1) <= limit
+            row_index, columns = np.nonzero(mask)
+            splits = np.searchsorted(row_index, np.arange(1, mask.shape[0]))
+            results.extend(np.split(order[columns], splits))
+        return results
+
+    def recommend_many(self, current_costs, catalog_items, limit: int = 15,
+                       top: int = 20) -> List[Dict[str, List[LightingCatalog]]]:
+        """
+        All three budget bands plus the efficiency-ranked list for many items
+
+        Args:
+            current_costs: Current unit cost (in INR ₹) per query
+            catalog_items: Current LightingCatalog item per query
+            limit: Maximum recommendations per band
+            top: Length of the efficiency-ranked list
+
+        Returns:
+            One dict per query with 'below', 'within' and 'above' lists and an
+            'all_recommendations' list: the three bands concatenated (repeats
+            included), stably sorted by efficiency score, first ``top`` kept
+        """
+        bands = ('below', 'within', 'above')
+        positions = {band: self.band_positions(current_costs, catalog_items, band, limit) for band in bands}
+
+        results = []
+        for row in range(len(catalog_items)):
+            combined = np.concatenate([positions[band][row] for band in bands])
+            ranked = combined[np.argsort(-self.efficiency[combined], kind='stable')[:top]]
+            result = {band: [self.items[i] for i in positions[band][row]] for band in bands}
+            result['all_recommendations'] = [self.items[i] for i in ranked]
+            results.append(result)
+        return results
+
+    def recommend(self, current_cost, catalog_item, budget_range: str = 'all', limit: int = 15) -> List[LightingCatalog]:
+        """
+        Budget-band recommendations, as ``get_budget_based_recommendations``
+
+        Returns:
+            List of LightingCatalog items, unique, at most ``limit`` long
+        """
+        bands = ('below', 'within', 'above') if budget_range == 'all' else (budget_range,)
+
+        seen = set()
+        recommendations = []
+        for band in bands:
+            if band not in BUDGET_BANDS:
+                continue
+            for position in self.band_positions([current_cost], [catalog_item], band, limit)[0]:
+                item = self.items[position]
+                if item.id not in seen:
+                    seen.add(item.id)
+                    recommendations.append(item)
+        return recommendations[:limit]
+
+
+def catalog_version() -> str:
+    """Current catalog version stamp shared by every worker through the cache"""
+    version = cache.get(VERSION_CACHE_KEY)
+    if version is None:
+        cache.add(VERSION_CACHE_KEY, uuid.uuid4().hex, None)
+        version = cache.get(VERSION_CACHE_KEY)
+    return version
+
+
+def get_catalog_index() -> CatalogIndex:
+    """
+    Return the process-local catalog index, reloading it if the catalog changed
+
+    Returns:
+        CatalogIndex instance (shared; treat as read-only)
+    """
+    global _index
+
+    version = catalog_version()
+    index = _index
+    if index is not None and index.version == version:
+        return index
+
+    with _lock:
+        if _index is None or _index.version != version:
+            # Read the stamp before the rows so a concurrent edit forces a reload
+            _index = CatalogIndex(list(LightingCatalog.objects.all()), version)
+        return _index
+
+
+def invalidate_catalog_index(shared: bool = True):
+    """
+    Mark every worker's catalog index stale
+
+    Called from LightingCatalog signals; call it directly after bulk changes
+    (``QuerySet.update``, ``bulk_create``) that bypass signals, after
+    ``update_efficiency_scores()`` on the changed rows.
+
+    Args:
+        shared: Also bump the version stamp other workers check; False only
+            drops this process's index (for changes not yet committed, which
+            other workers cannot read)
+    """
+    global _index
+
+    if shared:
+        cache.set(VERSION_CACHE_KEY, uuid.uuid4().hex, None)
+    with _lock:
+        _index = None
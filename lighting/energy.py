@@ -0,0 +1,252 @@
+"""
+Annual (8,760-hour) lighting energy and operating-cost simulation
+"""
+from functools import lru_cache
+from typing import Dict, Iterable, Sequence, Tuple
+
+import numpy as np
+from django.core.cache import cache
+
+from .models import CADFile, Fixture, LightingCatalog
+
+# Simulated (non-leap) year; its weekdays drive the occupancy schedules
+SIMULATION_YEAR = 2025
+
+# Occupied fraction by hour as (start, end, fraction) spans, later spans
+# overriding earlier ones: (weekday spans, weekend spans) per room type
+OCCUPANCY_SCHEDULES = {
+    'bedroom': ([(6, 8, 0.5), (19, 23, 0.8)], [(7, 10, 0.5), (19, 24, 0.8)]),
+    'living_room': ([(6, 8, 0.5), (17, 23, 1.0)], [(8, 23, 0.7)]),
+    'kitchen': ([(6, 9, 0.8), (12, 14, 0.5), (18, 21, 0.9)], [(7, 10, 0.8), (12, 14, 0.7), (18, 21, 0.9)]),
+    'bathroom': ([(6, 8, 0.6), (21, 23, 0.4)], [(7, 10, 0.5), (21, 23, 0.4)]),
+    'office': ([(8, 18, 1.0), (18, 20, 0.3)], [(9, 13, 0.1)]),
+    'classroom': ([(8, 16, 1.0)], []),
+    'conference_room': ([(9, 18, 0.5)], []),
+    'hallway': ([(0, 24, 0.3), (7, 22, 0.8)], [(0, 24, 0.3), (8, 20, 0.5)]),
+    'showroom': ([(10, 21, 1.0)], [(10, 21, 1.0)]),
+    'warehouse': ([(6, 22, 1.0)], [(8, 14, 0.5)]),
+    'laboratory': ([(8, 19, 1.0)], [(10, 14, 0.3)]),
+    'hospital_room': ([(0, 24, 0.3), (7, 22, 1.0)], [(0, 24, 0.3), (7, 22, 1.0)]),
+    'other': ([(8, 18, 0.8)], [(10, 16, 0.3)]),
+}
+
+# Time-of-day tariff bands as (start, end, INR per kWh)
+TARIFF_BANDS = [(0, 6, 6.5), (6, 18, 8.0), (18, 22, 9.5), (22, 24, 6.5)]
+
+# Daylight dimming: share of full power drawn during daylight hours
+DAYLIGHT_HOURS = (9, 17)
+DAYLIGHT_DIMMING_LEVEL = 0.6
+
+# Bump when the schedules, tariff or model change to drop cached results
+SIMULATION_VERSION = 1
+CACHE_TIMEOUT = 24 * 60 * 60
+
+ROOM_TYPES = tuple(OCCUPANCY_SCHEDULES)
+
+
+def day_profile(spans: Sequence[Tuple[int, int, float]]) -> np.ndarray:
+    """24 hourly values from (start, end, value) spans (later spans win)"""
+    profile = np.zeros(24)
+    for start, end, value in spans:
+        profile[start:end] = value
+    return profile
+
+
+@lru_cache(maxsize=1)
+def calendar() -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Hour of day, weekend flag and month (0-11) of every simulated hour"""
+    days = np.arange(f'{SIMULATION_YEAR}-01-01', f'{SIMULATION_YEAR + 1}-01-01', dtype='datetime64[D]')
+    # 1970-01-01 was a Thursday; Monday is 0
+    weekday = (days.astype(np.int64) + 3) % 7
+    month = days.astype('datetime64[M]').astype(np.int64) % 12
+    hour = np.tile(np.arange(24), len(days))
+    return hour, np.repeat(weekday >= 5, 24), np.repeat(month, 24)
+
+
+@lru_cache(maxsize=1)
+def occupancy_matrix() -> np.ndarray:
+    """(room types × 8,760) occupied fraction of every hour, read-only"""
+    hour, weekend, _ = calendar()
+    matrix = np.empty((len(ROOM_TYPES), len(hour)))
+    for row, room_type in enumerate(ROOM_TYPES):
+        weekday_spans, weekend_spans = OCCUPANCY_SCHEDULES[room_type]
+        matrix[row] = np.where(weekend, day_profile(weekend_spans)[hour], day_profile(weekday_spans)[hour])
+    matrix.setflags(write=False)
+    return matrix
+
+
+def tariff_rates(bands: Sequence[Tuple[int, int, float]] = TARIFF_BANDS) -> np.ndarray:
+    """INR per kWh of every simulated hour"""
+    hour, _, _ = calendar()
+    return day_profile(bands)[hour]
+
+
+def dimming_profile(dimming: bool) -> np.ndarray:
+    """Share of full power drawn in every simulated hour"""
+    hour, _, _ = calendar()
+    if not dimming:
+        return np.ones(len(hour))
+    start, end = DAYLIGHT_HOURS
+    return np.where((hour >= start) & (hour < end), DAYLIGHT_DIMMING_LEVEL, 1.0)
+
+
+def room_type_index(room_type: str) -> int:
+    """Row of ``occupancy_matrix`` for a room type (unknown types use 'other')"""
+    return ROOM_TYPES.index(room_type if room_type in OCCUPANCY_SCHEDULES else 'other')
+
+
+def simulate(watts: np.ndarray, type_index: np.ndarray, rates: np.ndarray, dimming: bool = False) -> Dict:
+    """
+    Simulate a year of operation for many fixture rows
+
+    The hourly load of every room type is occupancy × dimming (types ×
+    hours); each fixture row's energy and cost are its power times that
+    type's equivalent full-load hours and tariff-weighted hours, and the
+    project's hourly demand is one (types) × (types × hours) product.
+
+    Args:
+        watts: Installed power per fixture row (wattage × quantity) in W
+        type_index: Occupancy schedule row per fixture row
+        rates: INR per kWh of every simulated hour
+        dimming: Apply daylight dimming
+
+    Returns:
+        Dictionary with per-row 'kwh' and 'cost' arrays, per-type
+        'full_load_hours' and 'cost_hours' (INR per kW per year), the
+        project 'hourly_kw' demand and 'monthly_kwh'
+    """
+    load = occupancy_matrix() * dimming_profile(dimming)
+    full_load_hours = load.sum(axis=1)
+    cost_hours = load @ rates
+
+    kw = np.asarray(watts, dtype=np.float64) / 1000
+    type_index = np.asarray(type_index, dtype=np.int64)
+    hourly_kw = np.bincount(type_index, weights=kw, minlength=len(ROOM_TYPES)) @ load
+
+    _, _, month = calendar()
+    return {
+        'kwh': kw * full_load_hours[type_index],
+        'cost': kw * cost_hours[type_index],
+        'full_load_hours': full_load_hours,
+        'cost_hours': cost_hours,
+        'hourly_kw': hourly_kw,
+        'monthly_kwh': np.bincount(month, weights=hourly_kw, minlength=12),
+    }
+
+
+def project_energy(cad_file: CADFile, dimming: bool = False) -> Dict:
+    """
+    Annual energy and operating cost of a project, cached per revision
+
+    Args:
+        cad_file: CADFile to simulate
+        dimming: Apply daylight dimming
+
+    Returns:
+        Dictionary with 'annual_kwh', 'annual_cost' (INR), 'peak_kw',
+        'monthly_kwh', 'dimming', per-room 'rooms' rows and 'items':
+        per catalog item the installed 'quantity' and 'cost_hours'
+        (quantity-weighted INR per kW per year, used for paybacks)
+    """
+    from .catalog_index import catalog_version
+
+    key = (
+        f'lighting:energy:{SIMULATION_VERSION}:{cad_file.id}:{cad_file.revision}:'
+        f'{catalog_version()}:{int(bool(dimming))}'
+    )
+    result = cache.get(key)
+    if result is not None:
+        return result
+
+    rows = list(
+        Fixture.objects.filter(room__cad_file=cad_file).order_by().values_list(
+            'room_id', 'room__name', 'room__room_type', 'lighting_catalog_id',
+            'lighting_catalog__wattage', 'quantity',
+        )
+    )
+    if rows:
+        room_ids, names, room_types, catalog_ids, wattage, quantity = (np.array(column) for column in zip(*rows))
+    else:
+        room_ids = catalog_ids = quantity = np.zeros(0, dtype=np.int64)
+        names = room_types = np.zeros(0, dtype=object)
+        wattage = np.zeros(0)
+
+    type_index = np.array([room_type_index(room_type) for room_type in room_types.tolist()], dtype=np.int64)
+    quantity = quantity.astype(np.float64)
+    simulation = simulate(wattage.astype(np.float64) * quantity, type_index, tariff_rates(), dimming)
+
+    rooms = {}
+    for room_id, name, kwh, cost in zip(room_ids.tolist(), names.tolist(), simulation['kwh'].tolist(),
+                                        simulation['cost'].tolist()):
+        room = rooms.setdefault(room_id, {'room_id': room_id, 'name': name, 'kwh': 0.0, 'cost': 0.0})
+        room['kwh'] += kwh
+        room['cost'] += cost
+
+    items = {}
+    unit_cost_hours = quantity * simulation['cost_hours'][type_index]
+    for catalog_id, count, weighted in zip(catalog_ids.tolist(), quantity.tolist(), unit_cost_hours.tolist()):
+        item = items.setdefault(catalog_id, {'quantity': 0, 'cost_hours': 0.0})
+        item['quantity'] += int(count)
+        item['cost_hours'] += weighted
+
+    result = {
+        'annual_kwh': round(float(simulation['kwh'].sum()), 2),
+        'annual_cost': round(float(simulation['cost'].sum()), 2),
+        'peak_kw': round(float(simulation['hourly_kw'].max(initial=0.0)), 3),
+        'monthly_kwh': [round(value, 2) for value in simulation['monthly_kwh'].tolist()],
+        'dimming': bool(dimming),
+        'rooms': [
+            {**room, 'kwh': round(room['kwh'], 2), 'cost': round(room['cost'], 2)}
+            for room in sorted(rooms.values(), key=lambda room: room['name'])
+        ],
+        'items': items,
+    }
+    cache.set(key, result, CACHE_TIMEOUT)
+    return result
+
+
+def alternative_paybacks(energy: Dict, catalog_item: LightingCatalog,
+                         alternatives: Iterable[LightingCatalog]) -> Dict[int, Dict]:
+    """
+    Operating cost and payback of swapping every installed unit of an item
+
+    Units are swapped one for one; the operating cost follows each
+    alternative's wattage under the same schedules and tariff.
+
+    Args:
+        energy: Result of ``project_energy``
+        catalog_item: Installed LightingCatalog item
+        alternatives: Candidate LightingCatalog items
+
+    Returns:
+        Dictionary mapping alternative IDs to 'annual_cost' (INR, all
+        swapped units), 'annual_savings' (INR per year, negative if dearer
+        to run) and 'payback_years' (0 when the swap costs nothing up
+        front, None when it never pays back)
+    """
+    alternatives = list(alternatives)
+    usage = energy['items'].get(catalog_item.id)
+    if not usage or not alternatives:
+        return {}
+
+    quantity, cost_hours = usage['quantity'], usage['cost_hours']
+    wattage = np.array([item.wattage for item in alternatives], dtype=np.float64)
+    price = np.array([float(item.unit_cost) for item in alternatives])
+
+    annual_cost = wattage / 1000 * cost_hours
+    savings = catalog_item.wattage / 1000 * cost_hours - annual_cost
+    outlay = (price - float(catalog_item.unit_cost)) * quantity
+    with np.errstate(divide='ignore', invalid='ignore'):
+        payback = np.where(outlay <= 0, 0.0, outlay / savings)
+    never = (savings <= 0) & (outlay > 0)
+
+    return {
+        item.id: {
+            'annual_cost': round(cost, 2),
+            'annual_savings': round(saved, 2),
+            'payback_years': None if lost else round(years, 1),
+        }
+        for item, cost, saved, years, lost in zip(
+            alternatives, annual_cost.tolist(), savings.tolist(), payback.tolist(), never.tolist()
+        )
+    }
@@ -19,7 +19,15 @@ class CADUploadForm(forms.ModelForm):
             'placeholder': '{"CAD_SYMBOL_1": "CATALOG_NAME_1", "CAD_SYMBOL_2": "CATALOG_NAME_2"}',
             'class': 'form-control'
         }),
-        help_text='Optional: Provide a JSON mapping of CAD symbols to catalog names'
+        help_text='Optional: Provide a JSON mapping of CAD symbols to catalog names (remembered for your future uploads)'
+    )
+    
+    layout_fixture = forms.ModelChoiceField(
+        queryset=LightingCatalog.objects.all(),
+        required=False,
+        widget=forms.Select(attrs={'class': 'form-select'}),
+        help_text='Optional: Fixture to lay out in rooms drawn without fixture blocks '
+                  '(drawings with no fixtures at all use the most efficient catalog item)'
     )
     
     class Meta:
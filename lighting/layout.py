@@ -0,0 +1,245 @@
+"""
+Automatic fixture grids for room outlines
+"""
+import math
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from .models import CADFile, Fixture, LightingCatalog, Room
+from .spatial import polygons_contain
+from .utilization import MAINTENANCE_FACTOR, WORK_PLANE_HEIGHT
+from .utils import calculate_polygon_areas, calculate_required_fixtures
+
+# Largest spacing between luminaires as a multiple of their height above the
+# work plane (spacing-to-height ratio of a general-diffuse luminaire)
+SPACING_TO_HEIGHT_RATIO = 1.5
+
+# Refinement passes for outlines the first grid covers poorly
+MAX_LAYOUT_PASSES = 8
+
+# Grid size limit per room (bounding box cells)
+MAX_GRID_CELLS = 100_000
+
+
+class RoomLayout(NamedTuple):
+    """Grid points (m) of every room in one batch: room i owns x/y[room == i]"""
+    x: np.ndarray
+    y: np.ndarray
+    room: np.ndarray
+
+
+def outline_arrays(rooms: List[Room], unit_scale: float) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Room outlines in meters as flat vertices and offsets
+
+    Rooms without a recorded outline get a square of their area at the
+    origin, as ``photometry.room_polygon`` assumes for an empty room.
+
+    Returns:
+        Tuple of (vertices (V, 2), offsets (M + 1,))
+    """
+    outlines = []
+    for room in rooms:
+        vertices = room.outline_vertices
+        if len(vertices) >= 3:
+            outlines.append(vertices * unit_scale)
+        else:
+            half = math.sqrt(max(room.area, 0.0)) / 2
+            outlines.append(np.array([[-half, -half], [half, -half], [half, half], [-half, half]]))
+
+    offsets = np.zeros(len(outlines) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(outline) for outline in outlines])
+    vertices = np.concatenate(outlines) if outlines else np.zeros((0, 2))
+    return vertices, offsets
+
+
+def grid_layout(vertices: np.ndarray, offsets: np.ndarray, counts: np.ndarray,
+                max_spacing: np.ndarray) -> RoomLayout:
+    """
+    Cell-centred fixture grids clipped to many polygons at once
+
+    Each room's bounding box is split into nx × ny cells sized so that the
+    cells inside the outline number at least ``counts`` and no spacing
+    exceeds ``max_spacing``; the centres inside the outline are the fixture
+    positions (half a spacing from the walls). Non-rectangular outlines
+    start from a denser grid in proportion to the area they leave empty,
+    and rooms whose clipped grid still falls short are regridded more
+    densely. Points of every room are generated and clipped together.
+
+    Args:
+        vertices: (V, 2) outline vertices in meters
+        offsets: (M + 1,) offsets; room i is vertices[offsets[i]:offsets[i + 1]]
+        counts: Minimum number of fixtures per room
+        max_spacing: Largest allowed spacing per room in meters
+
+    Returns:
+        RoomLayout; rooms with a zero count get no points
+    """
+    room_count = len(offsets) - 1
+    counts = np.asarray(counts, dtype=np.int64)
+    empty = RoomLayout(np.zeros(0), np.zeros(0), np.zeros(0, dtype=np.int64))
+    if not room_count or not len(vertices):
+        return empty
+
+    # Bounding boxes: reduce over [start, end) pairs; the padding row keeps
+    # an end index equal to len(vertices) in range
+    padded = np.vstack([vertices, np.zeros((1, 2))])
+    bounds = np.column_stack([offsets[:-1], offsets[1:]]).ravel()
+    low = np.minimum.reduceat(padded, bounds)[::2]
+    size = np.maximum(np.maximum.reduceat(padded, bounds)[::2] - low, 1e-9)
+    width, depth = size[:, 0], size[:, 1]
+
+    fill = np.clip(calculate_polygon_areas(vertices, offsets) / (width * depth), 0.05, 1.0)
+    target = counts / fill
+
+    spacing_x = np.ceil(width / max_spacing)
+    spacing_y = np.ceil(depth / max_spacing)
+    pending = np.flatnonzero(counts > 0)
+    nx = np.ones(room_count, dtype=np.int64)
+    ny = np.ones(room_count, dtype=np.int64)
+    found = [empty] * room_count
+    placed = np.zeros(room_count, dtype=np.int64)
+
+    for _ in range(MAX_LAYOUT_PASSES):
+        if not len(pending):
+            break
+        # Columns in proportion to the box's aspect ratio, rows to cover the target
+        columns = np.maximum(np.ceil(np.sqrt(target[pending] * width[pending] / depth[pending])), spacing_x[pending])
+        rows = np.maximum(np.ceil(target[pending] / columns), spacing_y[pending])
+        columns = np.minimum(columns, MAX_GRID_CELLS)
+        rows = np.clip(rows, 1, np.maximum(MAX_GRID_CELLS // columns, 1))
+        nx[pending], ny[pending] = np.maximum(columns, nx[pending]), np.maximum(rows, ny[pending])
+
+        # Expand every pending room into its grid cells
+        cells = nx[pending] * ny[pending]
+        point_room = np.repeat(pending, cells)
+        local = np.arange(cells.sum()) - np.repeat(np.cumsum(cells) - cells, cells)
+        column, row = local // ny[point_room], local % ny[point_room]
+        x = low[point_room, 0] + (column + 0.5) * width[point_room] / nx[point_room]
+        y = low[point_room, 1] + (row + 0.5) * depth[point_room] / ny[point_room]
+
+        inside = polygons_contain(vertices, offsets, x, y, point_room)
+        x, y, point_room = x[inside], y[inside], point_room[inside]
+        placed[pending] = np.bincount(point_room, minlength=room_count)[pending]
+
+        starts = np.searchsorted(point_room, pending, side='left')
+        ends = np.searchsorted(point_room, pending, side='right')
+        for room, start, end in zip(pending.tolist(), starts.tolist(), ends.tolist()):
+            found[room] = RoomLayout(x[start:end], y[start:end], point_room[start:end])
+
+        # Regrid rooms that came up short, denser by the shortfall
+        short = placed[pending] < counts[pending]
+        capped = nx[pending] * ny[pending] >= MAX_GRID_CELLS
+        pending, shortfall = pending[short & ~capped], placed[pending][short & ~capped]
+        target[pending] *= 1.1 * counts[pending] / np.maximum(shortfall, 1)
+
+    # Slivers no grid cell centre falls in get one fixture at the box centre
+    for room in np.flatnonzero((counts > 0) & (placed == 0)).tolist():
+        centre = low[room] + size[room] / 2
+        found[room] = RoomLayout(centre[:1], centre[1:], np.array([room], dtype=np.int64))
+
+    return RoomLayout(
+        np.concatenate([layout.x for layout in found]),
+        np.concatenate([layout.y for layout in found]),
+        np.concatenate([layout.room for layout in found]),
+    )
+
+
+def required_counts(rooms: List[Room], catalog_item: LightingCatalog) -> np.ndarray:
+    """Fixtures of ``catalog_item`` each room needs by the lumen method"""
+    return np.array([
+        0 if room.is_unassigned else calculate_required_fixtures(
+            room.area, catalog_item.lumens, room.required_lux,
+            lumen_factor=room.utilization_factor * MAINTENANCE_FACTOR,
+        )
+        for room in rooms
+    ], dtype=np.int64)
+
+
+def layout_fixtures(rooms: List[Room], catalog_item: LightingCatalog, unit_scale: float) -> List[Fixture]:
+    """
+    Build unsaved fixture grids of one catalog item for many rooms
+
+    Args:
+        rooms: Rooms to light (the unassigned bucket is skipped); saved or not
+        catalog_item: LightingCatalog item to install
+        unit_scale: Meters per drawing unit of the CAD file
+
+    Returns:
+        One unsaved Fixture per lit room, its points in drawing units
+    """
+    if not rooms or catalog_item.lumens <= 0:
+        return []
+
+    vertices, offsets = outline_arrays(rooms, unit_scale)
+    mounting_height = np.array([max(room.height - WORK_PLANE_HEIGHT, 0.1) for room in rooms])
+    layout = grid_layout(vertices, offsets, required_counts(rooms, catalog_item),
+                         SPACING_TO_HEIGHT_RATIO * mounting_height)
+
+    order = np.argsort(layout.room, kind='stable')
+    point_x, point_y, point_room = layout.x[order] / unit_scale, layout.y[order] / unit_scale, layout.room[order]
+    room_ids, starts = np.unique(point_room, return_index=True)
+    ends = np.append(starts[1:], len(point_room))
+
+    fixtures = []
+    for room, start, end in zip(room_ids.tolist(), starts.tolist(), ends.tolist()):
+        x, y = point_x[start:end], point_y[start:end]
+        fixtures.append(Fixture(
+            room=rooms[room],
+            lighting_catalog=catalog_item,
+            quantity=len(x),
+            x_coordinate=float(x[0]),
+            y_coordinate=float(y[0]),
+            points=Fixture.pack_points(x, y, np.zeros(len(x))),
+        ))
+    return fixtures
+
+
+def default_layout_item() -> Optional[LightingCatalog]:
+    """Most efficient catalog item, used when a drawing has no fixture blocks"""
+    from .catalog_index import get_catalog_index
+
+    index = get_catalog_index()
+    if not len(index):
+        return None
+    return index.items[int(np.argmax(index.efficiency))]
+
+
+def auto_layout(cad_file: CADFile, catalog_item: LightingCatalog, room_ids: Optional[Iterable[int]] = None,
+                replace: bool = False) -> List[Dict]:
+    """
+    Lay out fixture grids in a project's rooms and save them
+
+    Args:
+        cad_file: CADFile to lay out
+        catalog_item: LightingCatalog item to install
+        room_ids: Limit to these rooms (default: every assigned room)
+        replace: Replace the rooms' existing fixtures; otherwise rooms that
+            already have fixtures are left alone
+
+    Returns:
+        One dict per room laid out with 'room_id', 'name' and 'fixtures'
+    """
+    from .aggregates import deferred_aggregates
+
+    rooms = cad_file.rooms.filter(is_unassigned=False)
+    if room_ids is not None:
+        rooms = rooms.filter(pk__in=list(room_ids))
+    if not replace:
+        rooms = rooms.filter(fixtures__isnull=True)
+    rooms = list(rooms)
+
+    fixtures = layout_fixtures(rooms, catalog_item, cad_file.unit_scale)
+    with deferred_aggregates() as pending:
+        if replace:
+            Fixture.objects.filter(room__in=rooms).delete()
+        Fixture.objects.bulk_create(fixtures)
+        # bulk_create skips the aggregate signals
+        pending.room_ids.update(room.id for room in rooms)
+        pending.cad_file_ids.add(cad_file.id)
+
+    return [
+        {'room_id': fixture.room.id, 'name': fixture.room.name, 'fixtures': fixture.quantity}
+        for fixture in fixtures
+    ]
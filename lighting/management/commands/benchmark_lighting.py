@@ -0,0 +1,499 @@
+"""
+Management command to benchmark CAD processing and lighting analysis paths
+"""
+import os
+import tempfile
+import time
+import tracemalloc
+from contextlib import contextmanager
+from decimal import Decimal
+
+import numpy as np
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import RequestFactory, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from lighting.models import CADFile, Room, Fixture, LightingCatalog
+from lighting.utils import (
+    parse_cad,
+    iter_cad_entities,
+    calculate_polyline_area,
+    calculate_polygon_areas,
+    persist_analysis,
+    get_budget_based_recommendations,
+    calculate_fixture_efficiency_score,
+    generate_pdf_report,
+    stream_csv_report,
+)
+from lighting.catalog_index import get_catalog_index
+from lighting.recommendations import project_recommendations
+from lighting.optimizer import optimize_project
+from lighting.photometry import Luminaires, grid_points, illuminance
+from lighting.layout import grid_layout
+from lighting.pdf_report import parallel_available
+from lighting.report_data import build_report_snapshot, snapshot_as_dict
+from lighting.sweep import sweep_project
+from lighting.views import results
+
+
+def write_synthetic_dxf(file_path, fixtures, rooms):
+    """
+    Write a synthetic office floor plan DXF for benchmarking
+
+    Args:
+        file_path: Destination path
+        fixtures: Number of fixture block inserts
+        rooms: Number of closed room polylines (laid out on a grid, in mm)
+    """
+    import ezdxf
+
+    doc = ezdxf.new('R2010')
+    doc.header['$INSUNITS'] = 4  # millimeters
+    modelspace = doc.modelspace()
+    for name in ('LED_PANEL_600X600', 'DOWNLIGHT_12W', 'LINEAR_LED_40W'):
+        block = doc.blocks.new(name)
+        block.add_circle((0, 0), 300)
+
+    columns = max(1, int(rooms ** 0.5))
+    room_size = 5000.0
+    for i in range(rooms):
+        x0 = (i % columns) * room_size
+        y0 = (i // columns) * room_size
+        modelspace.add_lwpolyline(
+            [(x0, y0), (x0 + room_size, y0), (x0 + room_size, y0 + room_size), (x0, y0 + room_size)],
+            close=True,
+            dxfattribs={'layer': 'ROOM'},
+        )
+
+    names = ('LED_PANEL_600X600', 'DOWNLIGHT_12W', 'LINEAR_LED_40W')
+    span = columns * room_size
+    for i in range(fixtures):
+        modelspace.add_blockref(
+            names[i % len(names)],
+            ((i * 617.0) % span, ((i * 389.0) // span * 250.0) % span),
+            dxfattribs={'layer': 'FIXTURES', 'rotation': (i % 4) * 90.0},
+        )
+
+    doc.saveas(file_path)
+
+
+def synthetic_room_outlines(rooms, seed=0):
+    """
+    Build random convex-ish room outlines in flat-vertex/offset layout (mm)
+
+    Returns:
+        Tuple of (vertices (V, 2), offsets (rooms + 1,))
+    """
+    rng = np.random.default_rng(seed)
+    counts = rng.integers(4, 13, size=rooms)
+    offsets = np.concatenate([[0], np.cumsum(counts)])
+    polygon_ids = np.repeat(np.arange(rooms), counts)
+    position = np.arange(offsets[-1]) - offsets[:-1][polygon_ids]
+    angles = 2 * np.pi * position / counts[polygon_ids]
+    radius = rng.uniform(2000, 8000, size=rooms)[polygon_ids]
+    centers = rng.uniform(0, 1e6, size=(rooms, 2))[polygon_ids]
+    vertices = centers + np.column_stack([np.cos(angles), np.sin(angles)]) * radius[:, None]
+    return vertices, offsets
+
+
+@contextmanager
+def benchmark_database():
+    """
+    Run against a throwaway on-disk test database
+
+    SQLite test databases default to in-memory, which would hide the
+    per-commit fsync cost that write benchmarks are meant to show.
+    """
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        connection.settings_dict.setdefault('TEST', {})
+        connection.settings_dict['TEST']['NAME'] = os.path.join(tmp_dir, 'benchmark.sqlite3')
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            yield
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+def synthetic_analysis(cad_file, rooms, catalog_items, fixtures_per_room=2):
+    """Unsaved rooms and fixtures shaped like ``build_analysis`` output"""
+    room_rows = []
+    fixture_rows = []
+    for i in range(rooms):
+        room = Room(cad_file=cad_file, name=f"Room {i + 1}", area=20.0 + i % 50, height=3.0)
+        room.apply_derived_fields()
+        room_rows.append(room)
+        for j in range(fixtures_per_room):
+            fixture_rows.append(Fixture(
+                room=room,
+                lighting_catalog=catalog_items[(i + j) % len(catalog_items)],
+                quantity=1 + (i + j) % 8,
+                x_coordinate=float(i),
+                y_coordinate=float(j),
+            ))
+    Room.apply_utilization_factors(room_rows)
+    return room_rows, fixture_rows
+
+
+def synthetic_catalog(size, seed=0):
+    """Create ``size`` catalog entries with spread-out lumens, wattage and cost"""
+    rng = np.random.default_rng(seed)
+    lumens = rng.integers(300, 12000, size=size)
+    items = LightingCatalog.objects.bulk_create([
+        LightingCatalog(
+            symbol_name=f'CAT_{i}', model_number=f'C-{i}', brand='Bench',
+            lumens=int(lumens[i]), wattage=round(float(lumens[i]) / rng.uniform(80, 160), 1),
+            beam_angle=90.0, color_temp=4000,
+            unit_cost=Decimal(f'{float(lumens[i]) * rng.uniform(0.2, 0.6):.2f}'),
+        )
+        for i in range(size)
+    ])
+    # bulk_create skips save(), which stores the efficiency score
+    catalog = LightingCatalog.objects.filter(pk__in=[item.pk for item in items])
+    catalog.update_efficiency_scores()
+    return list(catalog.order_by('id'))
+
+
+def measure(func):
+    """Run func once and return (result, seconds, peak traced bytes)"""
+    tracemalloc.start()
+    started = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+class Command(BaseCommand):
+    help = 'Benchmark CAD processing and lighting analysis on synthetic projects'
+
+    suites = ['parse', 'areas', 'persist', 'recommendations', 'optimize', 'photometry', 'layout', 'sweep', 'reports']
+    default_sizes = {
+        'parse': [10000, 100000],
+        'areas': [10000, 100000],
+        'persist': [5000],
+        'recommendations': [1000],
+        'optimize': [200, 500],
+        'photometry': [1000, 5000],
+        'layout': [1000, 10000],
+        'sweep': [40, 300],
+        'reports': [10, 100, 1000],
+    }
+
+    def add_arguments(self, parser):
+        parser.add_argument('suite', choices=self.suites, help='Benchmark suite to run')
+        parser.add_argument(
+            '--sizes', nargs='+', type=int,
+            help='Problem sizes to benchmark (fixture inserts for "parse", fixture rows for '
+                 '"recommendations" and "sweep", luminaires for "photometry", rooms otherwise)'
+        )
+        parser.add_argument(
+            '--catalog-size', type=int, default=2000,
+            help='Catalog entries for the "recommendations", "optimize" and "sweep" suites'
+        )
+
+    def handle(self, *args, **options):
+        suite = options['suite']
+        self.options = options
+        getattr(self, f"benchmark_{suite}")(options['sizes'] or self.default_sizes[suite])
+
+    def benchmark_parse(self, sizes):
+        """Compare ezdxf document parsing with the streaming DXF reader"""
+        self.stdout.write(f"{'inserts':>10} {'file MB':>8} {'mode':<20} {'seconds':>8} {'peak MB':>8} {'ents/s':>10}")
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            for size in sizes:
+                file_path = os.path.join(tmp_dir, f'synthetic_{size}.dxf')
+                write_synthetic_dxf(file_path, fixtures=size, rooms=max(1, size // 20))
+                file_mb = os.path.getsize(file_path) / 1e6
+
+                runs = [
+                    ('document', lambda: parse_cad(file_path, streaming=False)['total_blocks']),
+                    ('streaming', lambda: parse_cad(file_path, streaming=True)['total_blocks']),
+                    ('streaming (count)', lambda: sum(
+                        1 for entity_type, _ in iter_cad_entities(file_path) if entity_type == 'INSERT'
+                    )),
+                ]
+                for mode, run in runs:
+                    count, elapsed, peak = measure(run)
+                    self.stdout.write(
+                        f"{size:>10} {file_mb:>8.1f} {mode:<20} {elapsed:>8.2f} "
+                        f"{peak / 1e6:>8.1f} {count / elapsed:>10.0f}"
+                    )
+
+        self.stdout.write(self.style.SUCCESS('Benchmark complete'))
+
+    def benchmark_areas(self, sizes):
+        """Compare the per-polygon Shoelace loop with the batched NumPy path"""
+        self.stdout.write(f"{'rooms':>10} {'loop s':>10} {'batch s':>10} {'speedup':>8} {'max rel err':>12}")
+
+        for size in sizes:
+            vertices, offsets = synthetic_room_outlines(size)
+            polygons = [vertices[offsets[i]:offsets[i + 1]].tolist() for i in range(size)]
+
+            # The loop path returns m² with per-polygon unit guessing; compare
+            # raw areas by undoing its mm² scaling
+            loop_areas, loop_seconds, _ = measure(
+                lambda: [calculate_polyline_area(points) * 1_000_000.0 for points in polygons]
+            )
+            batch_areas, batch_seconds, _ = measure(lambda: calculate_polygon_areas(vertices, offsets))
+
+            error = np.max(np.abs(batch_areas - loop_areas) / batch_areas)
+            self.stdout.write(
+                f"{size:>10} {loop_seconds:>10.3f} {batch_seconds:>10.4f} "
+                f"{loop_seconds / batch_seconds:>7.0f}x {error:>12.2e}"
+            )
+
+        self.stdout.write(self.style.SUCCESS('Benchmark complete'))
+
+    def benchmark_persist(self, sizes):
+        """Compare per-row Room/Fixture writes with bulk transactional persistence"""
+        self.stdout.write(f"{'rooms':>8} {'rows':>8} {'mode':<10} {'seconds':>8} {'rows/s':>10}")
+
+        with benchmark_database():
+            user = User.objects.create_user(username='benchmark')
+            catalog_items = [
+                LightingCatalog.objects.create(
+                    symbol_name=f'BENCH_{i}', model_number=f'B-{i}', brand='Bench',
+                    lumens=1000 * (i + 1), wattage=10.0 * (i + 1), beam_angle=90.0,
+                    color_temp=4000, unit_cost=500 * (i + 1),
+                )
+                for i in range(3)
+            ]
+
+            for size in sizes:
+                for mode in ('per-row', 'bulk'):
+                    cad_file = CADFile.objects.create(user=user, filename='synthetic.dxf', file='cad_files/synthetic.dxf')
+                    rooms, fixtures = synthetic_analysis(cad_file, size, catalog_items)
+                    row_count = len(rooms) + len(fixtures)
+
+                    if mode == 'per-row':
+                        def run():
+                            # Previous process_cad_file behaviour: autocommit per row
+                            cad_file.status = 'processing'
+                            cad_file.save()
+                            for room in rooms:
+                                room.save()
+                            for fixture in fixtures:
+                                fixture.save()
+                            cad_file.status = 'completed'
+                            cad_file.save()
+                    else:
+                        def run():
+                            persist_analysis(cad_file, rooms, fixtures)
+
+                    started = time.perf_counter()
+                    run()
+                    elapsed = time.perf_counter() - started
+                    self.stdout.write(
+                        f"{size:>8} {row_count:>8} {mode:<10} {elapsed:>8.2f} {row_count / elapsed:>10.0f}"
+                    )
+
+        self.stdout.write(self.style.SUCCESS('Benchmark complete'))
+
+    def benchmark_recommendations(self, sizes):
+        """Compare per-fixture recommendation lookups with the project-wide batch"""
+        self.stdout.write(f"{'fixtures':>8} {'distinct':>8} {'mode':<14} {'seconds':>8}")
+
+        with benchmark_database():
+            user = User.objects.create_user(username='benchmark')
+            catalog_items = synthetic_catalog(self.options['catalog_size'])
+            factory = RequestFactory()
+
+            for size in sizes:
+                cad_file = CADFile.objects.create(
+                    user=user, filename='synthetic.dxf', file='cad_files/synthetic.dxf', status='completed'
+                )
+                # Ten fixture rows per room; each catalog item is reused across ten rooms
+                distinct = catalog_items[:max(1, size // 10)]
+                rooms, fixtures = synthetic_analysis(cad_file, max(1, size // 10), distinct, fixtures_per_room=10)
+                persist_analysis(cad_file, rooms, fixtures)
+                get_catalog_index()
+
+                def per_fixture():
+                    # Previous results view: three band lookups and a sort per fixture
+                    for fixture in Fixture.objects.filter(room__cad_file=cad_file).select_related('lighting_catalog'):
+                        item = fixture.lighting_catalog
+                        bands = [
+                            get_budget_based_recommendations(item.unit_cost, item, budget_range=band, limit=15)
+                            for band in ('below', 'within', 'above')
+                        ]
+                        combined = [rec for band in bands for rec in band]
+                        for rec in combined:
+                            rec.efficiency_score = calculate_fixture_efficiency_score(rec)
+                        combined.sort(key=lambda rec: rec.efficiency_score, reverse=True)
+
+                def render_results():
+                    request = factory.get(f'/results/{cad_file.id}/')
+                    request.user = user
+                    return results(request, cad_file.id)
+
+                runs = [
+                    ('per-fixture', per_fixture),
+                    ('batched', lambda: project_recommendations(cad_file)),
+                    # First view computes and stores alternatives; later views read them
+                    ('view (cold)', render_results),
+                    ('view (stored)', render_results),
+                ]
+                for mode, run in runs:
+                    started = time.perf_counter()
+                    run()
+                    elapsed = time.perf_counter() - started
+                    self.stdout.write(f"{len(fixtures):>8} {len(distinct):>8} {mode:<14} {elapsed:>8.3f}")
+
+        self.stdout.write(self.style.SUCCESS('Benchmark complete'))
+
+    def benchmark_optimize(self, sizes):
+        """Time whole-project optimization for each objective, with and without a budget"""
+        self.stdout.write(
+            f"{'rooms':>8} {'fixtures':>8} {'mode':<16} {'seconds':>8} {'cost ₹':>12} {'watts':>10} {'lit':>6}"
+        )
+
+        with benchmark_database():
+            user = User.objects.create_user(username='benchmark')
+            catalog_items = synthetic_catalog(self.options['catalog_size'])
+
+            for size in sizes:
+                cad_file = CADFile.objects.create(
+                    user=user, filename='synthetic.dxf', file='cad_files/synthetic.dxf', status='completed'
+                )
+                rooms, fixtures = synthetic_analysis(cad_file, size, catalog_items[:200], fixtures_per_room=4)
+                persist_analysis(cad_file, rooms, fixtures)
+                get_catalog_index()
+
+                cheapest = optimize_project(cad_file, 'cost')
+                lowest_wattage = optimize_project(cad_file, 'wattage')
+                # A budget halfway between the two forces the Lagrangian search
+                budget = Decimal(str(round((cheapest['proposed_cost'] + lowest_wattage['proposed_cost']) / 2, 2)))
+
+                runs = [
+                    ('cost', lambda: optimize_project(cad_file, 'cost')),
+                    ('wattage', lambda: optimize_project(cad_file, 'wattage')),
+                    ('wattage+budget', lambda: optimize_project(cad_file, 'wattage', budget)),
+                ]
+                for mode, run in runs:
+                    started = time.perf_counter()
+                    proposal = run()
+                    elapsed = time.perf_counter() - started
+                    lit = sum(room['meets_requirement'] for room in proposal['rooms'])
+                    self.stdout.write(
+                        f"{size:>8} {len(fixtures):>8} {mode:<16} {elapsed:>8.3f} "
+                        f"{proposal['proposed_cost']:>12.2f} {proposal['proposed_wattage']:>10.1f} "
+                        f"{lit:>3}/{len(proposal['rooms'])}"
+                    )
+
+        self.stdout.write(self.style.SUCCESS('Benchmark complete'))
+
+    def benchmark_photometry(self, sizes):
+        """Time a 100k-point illuminance grid over one large room"""
+        self.stdout.write(f"{'lights':>8} {'points':>8} {'seconds':>8} {'peak MB':>8} {'avg lux':>8} {'U0':>6}")
+
+        rng = np.random.default_rng(0)
+        side = 316.0  # ~100,000 m², so a 1 m grid holds ~100k points
+        polygon = np.array([[0.0, 0.0], [side, 0.0], [side, side], [0.0, side]])
+        for size in sizes:
+            lights = Luminaires(
+                x=rng.uniform(0, side, size), y=rng.uniform(0, side, size),
+                lumens=rng.uniform(2000, 12000, size), beam_angle=rng.uniform(60, 120, size),
+            )
+            grid = grid_points(polygon, spacing=1.0)
+            lux, elapsed, peak = measure(lambda: illuminance(grid.x, grid.y, lights, 5.0))
+            summary = grid._replace(lux=lux).summary()
+            self.stdout.write(
+                f"{size:>8} {summary['points']:>8} {elapsed:>8.2f} {peak / 1e6:>8.1f} "
+                f"{summary['avg_lux']:>8.1f} {summary['uniformity']:>6.3f}"
+            )
+
+        self.stdout.write(self.style.SUCCESS('Benchmark complete'))
+
+    def benchmark_layout(self, sizes):
+        """Time fixture grid generation and clipping over many room outlines"""
+        self.stdout.write(f"{'rooms':>8} {'required':>9} {'placed':>9} {'seconds':>8} {'peak MB':>8} {'short':>6}")
+
+        rng = np.random.default_rng(0)
+        for size in sizes:
+            vertices, offsets = synthetic_room_outlines(size)
+            vertices = vertices / 1000  # meters
+            counts = rng.integers(1, 60, size=size)
+            layout, elapsed, peak = measure(lambda: grid_layout(vertices, offsets, counts, np.full(size, 3.4)))
+            placed = np.bincount(layout.room, minlength=size)
+            self.stdout.write(
+                f"{size:>8} {counts.sum():>9} {len(layout.x):>9} {elapsed:>8.2f} "
+                f"{peak / 1e6:>8.1f} {int((placed < counts).sum()):>6}"
+            )
+
+        self.stdout.write(self.style.SUCCESS('Benchmark complete'))
+
+    def benchmark_sweep(self, sizes):
+        """Time substitution sweeps and their Pareto fronts"""
+        self.stdout.write(
+            f"{'fixtures':>8} {'log10 combos':>12} {'evaluated':>10} {'seconds':>8} {'front':>6} {'best lit':>9}"
+        )
+
+        with benchmark_database():
+            user = User.objects.create_user(username='benchmark')
+            catalog_items = synthetic_catalog(self.options['catalog_size'])
+
+            for size in sizes:
+                cad_file = CADFile.objects.create(
+                    user=user, filename='synthetic.dxf', file='cad_files/synthetic.dxf', status='completed'
+                )
+                rooms, fixtures = synthetic_analysis(cad_file, max(1, size // 4), catalog_items[:200], fixtures_per_room=4)
+                persist_analysis(cad_file, rooms, fixtures)
+                get_catalog_index()
+
+                result, elapsed, _ = measure(lambda: sweep_project(cad_file))
+                best = max((point['adequate_rooms'] for point in result['front']), default=0)
+                self.stdout.write(
+                    f"{len(fixtures):>8} {result['combinations_log10']:>12.1f} {result['evaluated']:>10} "
+                    f"{elapsed:>8.2f} {result['front_size']:>6} {best:>4}/{result['rooms']}"
+                )
+
+        self.stdout.write(self.style.SUCCESS('Benchmark complete'))
+
+    def benchmark_reports(self, sizes):
+        """Query counts and render times of the report snapshot and its renderers"""
+        self.stdout.write(f"{'rooms':>8} {'fixtures':>8} {'mode':<12} {'queries':>8} {'seconds':>8}")
+
+        with benchmark_database(), tempfile.TemporaryDirectory() as media_root, override_settings(MEDIA_ROOT=media_root):
+            user = User.objects.create_user(username='benchmark')
+            catalog_items = synthetic_catalog(50)
+
+            for size in sizes:
+                cad_file = CADFile.objects.create(
+                    user=user, filename='synthetic.dxf', file='cad_files/synthetic.dxf', status='completed'
+                )
+                rooms, fixtures = synthetic_analysis(cad_file, size, catalog_items, fixtures_per_room=4)
+                persist_analysis(cad_file, rooms, fixtures)
+                cad_file = CADFile.objects.get(pk=cad_file.pk)
+
+                def lazy_walk():
+                    # Previous renderers: related rows loaded per room and per fixture
+                    for room in cad_file.rooms.all():
+                        lumens = sum(fixture.lighting_catalog.lumens * fixture.quantity for fixture in room.fixtures.all())
+                        room.calculate_lux(lumens)
+
+                runs = [
+                    ('lazy walk', lazy_walk),
+                    ('snapshot', lambda: build_report_snapshot(cad_file)),
+                    ('json', lambda: snapshot_as_dict(build_report_snapshot(cad_file))),
+                    ('csv', lambda: sum(len(chunk) for chunk in stream_csv_report(cad_file))),
+                    ('pdf', lambda: generate_pdf_report(cad_file)),
+                ]
+                if parallel_available():
+                    # Force the chunked path, 4 chunks
+                    chunk_rooms = max(1, -(-size // 4))
+                    chunked = override_settings(PDF_PARALLEL_MIN_ROOMS=0, PDF_CHUNK_ROOMS=chunk_rooms)
+                    runs.append(('pdf chunked', chunked(lambda: generate_pdf_report(cad_file))))
+                for mode, run in runs:
+                    with CaptureQueriesContext(connection) as queries:
+                        started = time.perf_counter()
+                        run()
+                        elapsed = time.perf_counter() - started
+                    self.stdout.write(
+                        f"{size:>8} {len(fixtures):>8} {mode:<12} {len(queries.captured_queries):>8} {elapsed:>8.3f}"
+                    )
+
+        self.stdout.write(self.style.SUCCESS('Benchmark complete'))
@@ -0,0 +1,73 @@
+"""
+Management command to warm, purge or inspect the parsed CAD result cache
+"""
+import os
+
+from django.core.management.base import BaseCommand
+
+from lighting.models import CADFile
+from lighting import parse_cache
+
+
+class Command(BaseCommand):
+    help = (
+        'Warm, purge or report on the content-addressed CAD parse cache '
+        '(hit/miss counters live in the Django cache and are per process with the default LocMemCache)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('action', choices=['warm', 'purge', 'stats'], help='Cache operation to run')
+        parser.add_argument(
+            'paths', nargs='*',
+            help='CAD files to warm (default: every uploaded CADFile)'
+        )
+
+    def handle(self, *args, **options):
+        action = options['action']
+
+        if action == 'purge':
+            removed = parse_cache.purge()
+            self.stdout.write(self.style.SUCCESS(f'Removed {removed} cache entries'))
+        elif action == 'warm':
+            self.warm(options['paths'])
+
+        stats = parse_cache.cache_stats()
+        self.stdout.write(
+            f"Entries: {stats['entries']}  Size: {stats['bytes'] / 1024:.1f} KiB  "
+            f"Hits: {stats['hits']}  Misses: {stats['misses']}"
+        )
+
+    def warm(self, paths):
+        """Parse files into the cache, skipping ones already cached"""
+        if paths:
+            targets = [(path, None) for path in paths]
+        else:
+            targets = [
+                (cad_file.file.path, cad_file)
+                for cad_file in CADFile.objects.exclude(file='')
+            ]
+
+        warmed = 0
+        for path, cad_file in targets:
+            if not os.path.exists(path):
+                self.stdout.write(self.style.WARNING(f'Missing file: {path}'))
+                continue
+
+            content_hash = parse_cache.file_sha256(path)
+            if cad_file is not None and cad_file.content_hash != content_hash:
+                CADFile.objects.filter(pk=cad_file.pk).update(content_hash=content_hash)
+
+            if os.path.exists(parse_cache.get_cache_path(content_hash)):
+                continue
+
+            try:
+                geometry = parse_cache.parse_cad_columnar(path)
+            except Exception as e:
+                self.stdout.write(self.style.WARNING(f'Failed to parse {path}: {e}'))
+                continue
+
+            parse_cache.store_parsed(content_hash, geometry)
+            warmed += 1
+            self.stdout.write(self.style.SUCCESS(f'Cached: {path}'))
+
+        self.stdout.write(self.style.SUCCESS(f'Warmed {warmed} cache entries'))
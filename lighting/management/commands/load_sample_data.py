@@ -3,6 +3,7 @@ Management command to load sample lighting catalog data
 """
 from django.core.management.base import BaseCommand
 from django.contrib.auth.models import User, Group
+from django.db import transaction
 from lighting.models import LightingCatalog
 from decimal import Decimal
 
@@ -332,19 +333,22 @@ class Command(BaseCommand):
             },
         ]
         
-        for fixture_data in fixtures:
-            fixture, created = LightingCatalog.objects.get_or_create(
-                symbol_name=fixture_data['symbol_name'],
-                defaults=fixture_data
-            )
-            if created:
-                self.stdout.write(
-                    self.style.SUCCESS(f'Created fixture: {fixture.symbol_name}')
-                )
-            else:
-                self.stdout.write(
-                    self.style.WARNING(f'Fixture already exists: {fixture.symbol_name}')
+        # One transaction: the catalog index and stored alternatives are
+        # refreshed once on commit instead of after every fixture
+        with transaction.atomic():
+            for fixture_data in fixtures:
+                fixture, created = LightingCatalog.objects.get_or_create(
+                    symbol_name=fixture_data['symbol_name'],
+                    defaults=fixture_data
                 )
+                if created:
+                    self.stdout.write(
+                        self.style.SUCCESS(f'Created fixture: {fixture.symbol_name}')
+                    )
+                else:
+                    self.stdout.write(
+                        self.style.WARNING(f'Fixture already exists: {fixture.symbol_name}')
+                    )
         
         # Create a demo user if it doesn't exist
         if not User.objects.filter(username='demo').exists():
@@ -0,0 +1,18 @@
+"""
+Management command to rebuild materialized lighting aggregates
+"""
+from django.core.management.base import BaseCommand
+
+from lighting.aggregates import rebuild_aggregates
+
+
+class Command(BaseCommand):
+    help = 'Recompute stored lumen, lux, fixture count and cost totals on rooms and CAD files'
+
+    def add_arguments(self, parser):
+        parser.add_argument('cad_file_ids', nargs='*', type=int, help='CAD file IDs (default: all)')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows per bulk update batch')
+
+    def handle(self, *args, **options):
+        rooms = rebuild_aggregates(options['cad_file_ids'] or None, batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt aggregates for {rooms} rooms'))
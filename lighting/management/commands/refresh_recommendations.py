@@ -0,0 +1,29 @@
+"""
+Management command to recompute stored fixture recommendations
+"""
+from django.core.management.base import BaseCommand
+
+from lighting.models import LightingCatalog
+from lighting.recommendations import refresh_recommendations
+
+
+class Command(BaseCommand):
+    help = 'Recompute stored alternative fixtures for catalog items'
+
+    def add_arguments(self, parser):
+        parser.add_argument('catalog_ids', nargs='*', type=int, help='Catalog item IDs (default: whole catalog)')
+        parser.add_argument(
+            '--missing', action='store_true',
+            help='Only items never stored (e.g. added with bulk_create or before the table existed)'
+        )
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows per bulk insert batch')
+
+    def handle(self, *args, **options):
+        catalog_ids = options['catalog_ids'] or None
+        if options['missing']:
+            missing = LightingCatalog.objects.filter(recommendations_updated_at__isnull=True)
+            if catalog_ids:
+                missing = missing.filter(pk__in=catalog_ids)
+            catalog_ids = list(missing.values_list('pk', flat=True))
+        count = refresh_recommendations(catalog_ids, batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Refreshed recommendations for {count} catalog items'))
@@ -0,0 +1,18 @@
+# Generated by Django 6.0 on 2026-10-18 10:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lighting', '0003_cadfile_content_hash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cadfile',
+            name='unit_scale',
+            field=models.FloatField(default=0.001, help_text='Meters per drawing unit used for areas and positions'),
+        ),
+    ]
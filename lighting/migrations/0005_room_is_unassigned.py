@@ -0,0 +1,18 @@
+# Generated by Django 6.0 on 2026-10-18 12:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lighting', '0004_cadfile_unit_scale'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='room',
+            name='is_unassigned',
+            field=models.BooleanField(default=False, help_text='Holds fixtures outside every room outline'),
+        ),
+    ]
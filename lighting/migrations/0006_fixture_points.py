@@ -0,0 +1,18 @@
+# Generated by Django 6.0 on 2026-10-18 13:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lighting', '0005_room_is_unassigned'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='fixture',
+            name='points',
+            field=models.BinaryField(blank=True, help_text='Packed float64 (x, y, rotation) of every insert, in drawing units / degrees', null=True),
+        ),
+    ]
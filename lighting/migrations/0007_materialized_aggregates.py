@@ -0,0 +1,105 @@
+# Generated by Django 6.0 on 2026-10-18 15:02
+
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import Avg, F, Q, Sum
+
+
+def populate_aggregates(apps, schema_editor):
+    """Fill the new aggregate columns for analyses created before them"""
+    CADFile = apps.get_model('lighting', 'CADFile')
+    Room = apps.get_model('lighting', 'Room')
+    Fixture = apps.get_model('lighting', 'Fixture')
+
+    fixture_totals = {
+        row['room_id']: row
+        for row in Fixture.objects.values('room_id').annotate(
+            lumens=Sum(F('quantity') * F('lighting_catalog__lumens')),
+            count=Sum('quantity'),
+            cost=Sum(F('quantity') * F('lighting_catalog__unit_cost'),
+                     output_field=models.DecimalField(max_digits=14, decimal_places=2)),
+        )
+    }
+    rooms = []
+    for room in Room.objects.only('id', 'area', 'is_unassigned'):
+        totals = fixture_totals.get(room.id, {})
+        room.total_lumens = totals.get('lumens') or 0
+        room.fixture_count = totals.get('count') or 0
+        room.total_cost = totals.get('cost') or Decimal('0.00')
+        if room.is_unassigned or room.area <= 0:
+            room.current_lux = 0.0
+        else:
+            room.current_lux = round(room.total_lumens * 0.7 / room.area, 2)
+        rooms.append(room)
+    Room.objects.bulk_update(rooms, ['total_lumens', 'fixture_count', 'total_cost', 'current_lux'], batch_size=1000)
+
+    room_totals = {
+        row['cad_file_id']: row
+        for row in Room.objects.values('cad_file_id').annotate(
+            lumens=Sum('total_lumens'),
+            count=Sum('fixture_count'),
+            cost=Sum('total_cost'),
+            lux=Avg('current_lux', filter=Q(is_unassigned=False)),
+        )
+    }
+    cad_files = []
+    for cad_file in CADFile.objects.only('id'):
+        totals = room_totals.get(cad_file.id, {})
+        cad_file.total_lumens = totals.get('lumens') or 0
+        cad_file.fixture_count = totals.get('count') or 0
+        cad_file.total_cost = totals.get('cost') or Decimal('0.00')
+        cad_file.average_lux = round(totals.get('lux') or 0.0, 2)
+        cad_files.append(cad_file)
+    CADFile.objects.bulk_update(cad_files, ['total_lumens', 'fixture_count', 'total_cost', 'average_lux'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lighting', '0006_fixture_points'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cadfile',
+            name='average_lux',
+            field=models.FloatField(default=0, editable=False, help_text='Average current lux across rooms'),
+        ),
+        migrations.AddField(
+            model_name='cadfile',
+            name='fixture_count',
+            field=models.IntegerField(default=0, editable=False, help_text='Total number of fixtures'),
+        ),
+        migrations.AddField(
+            model_name='cadfile',
+            name='total_cost',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, help_text='Total fixture cost in Indian Rupees (₹)', max_digits=14),
+        ),
+        migrations.AddField(
+            model_name='cadfile',
+            name='total_lumens',
+            field=models.BigIntegerField(default=0, editable=False, help_text='Total installed lumens'),
+        ),
+        migrations.AddField(
+            model_name='room',
+            name='current_lux',
+            field=models.FloatField(default=0, editable=False, help_text='Current illuminance from installed fixtures'),
+        ),
+        migrations.AddField(
+            model_name='room',
+            name='fixture_count',
+            field=models.IntegerField(default=0, editable=False, help_text='Total number of fixtures'),
+        ),
+        migrations.AddField(
+            model_name='room',
+            name='total_cost',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, help_text='Total fixture cost in Indian Rupees (₹)', max_digits=14),
+        ),
+        migrations.AddField(
+            model_name='room',
+            name='total_lumens',
+            field=models.BigIntegerField(default=0, editable=False, help_text='Total installed lumens'),
+        ),
+        migrations.RunPython(populate_aggregates, migrations.RunPython.noop),
+    ]
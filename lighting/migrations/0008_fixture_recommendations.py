@@ -0,0 +1,36 @@
+# Generated by Django 6.0 on 2026-10-18 16:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lighting', '0007_materialized_aggregates'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='lightingcatalog',
+            name='recommendations_updated_at',
+            field=models.DateTimeField(blank=True, editable=False, help_text='When stored alternatives for this fixture were last computed', null=True),
+        ),
+        migrations.CreateModel(
+            name='FixtureRecommendation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('band', models.CharField(choices=[('below', 'Below Budget'), ('within', 'Within Budget'), ('above', 'Above Budget'), ('top', 'Most Efficient')], max_length=10)),
+                ('priority', models.PositiveIntegerField(help_text='Rank within the band (1=highest)')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('catalog_item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='recommendations', to='lighting.lightingcatalog')),
+                ('recommended', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='recommended_for', to='lighting.lightingcatalog')),
+            ],
+            options={
+                'verbose_name': 'Fixture Recommendation',
+                'verbose_name_plural': 'Fixture Recommendations',
+                'ordering': ['catalog_item', 'band', 'priority'],
+                'constraints': [models.UniqueConstraint(fields=('catalog_item', 'band', 'priority'), name='unique_recommendation_rank')],
+            },
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 6.0 on 2026-10-18 16:45
+
+from django.db import migrations, models
+
+
+def populate_efficiency_scores(apps, schema_editor):
+    """Store the efficiency score of existing catalog entries"""
+    LightingCatalog = apps.get_model('lighting', 'LightingCatalog')
+    items = list(LightingCatalog.objects.all())
+    for item in items:
+        if item.wattage <= 0 or item.unit_cost <= 0:
+            item.efficiency_score = 0.0
+        else:
+            luminous_efficacy = item.lumens / item.wattage
+            cost_efficiency = item.lumens / float(item.unit_cost)
+            item.efficiency_score = round((luminous_efficacy * 0.6) + (cost_efficiency * 0.4), 2)
+    LightingCatalog.objects.bulk_update(items, ['efficiency_score'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lighting', '0008_fixture_recommendations'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='lightingcatalog',
+            name='efficiency_score',
+            field=models.FloatField(db_index=True, default=0, editable=False, help_text='Combined lumens-per-watt and lumens-per-rupee score (higher is better)'),
+        ),
+        migrations.AddIndex(
+            model_name='lightingcatalog',
+            index=models.Index(fields=['lumens', 'efficiency_score'], name='catalog_lumens_efficiency_idx'),
+        ),
+        migrations.RunPython(populate_efficiency_scores, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 6.0 on 2026-10-18 17:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lighting', '0009_catalog_efficiency_score'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cadfile',
+            name='symbol_report',
+            field=models.JSONField(blank=True, default=dict, editable=False, help_text='CAD symbols left unmapped or matched with low confidence'),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 6.0 on 2026-10-18 17:40
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lighting', '0010_cadfile_symbol_report'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='fixture',
+            name='cad_symbol',
+            field=models.CharField(blank=True, default='', help_text='CAD block name the fixture was mapped from', max_length=255),
+        ),
+        migrations.CreateModel(
+            name='SymbolLegend',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cad_symbol', models.CharField(help_text='Block name as it appears in CAD', max_length=255)),
+                ('source', models.CharField(choices=[('legend', 'Upload Legend'), ('selection', 'Fixture Selection'), ('matcher', 'Symbol Matcher'), ('admin', 'Admin')], default='admin', max_length=10)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('lighting_catalog', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='legend_entries', to='lighting.lightingcatalog')),
+                ('user', models.ForeignKey(blank=True, help_text='Owner of the mapping; leave empty to share it firm-wide', null=True, on_delete=django.db.models.deletion.CASCADE, related_name='symbol_legend', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Symbol Legend Entry',
+                'verbose_name_plural': 'Symbol Legend',
+                'ordering': ['cad_symbol'],
+                'constraints': [models.UniqueConstraint(fields=('cad_symbol', 'user'), name='unique_user_legend_symbol'), models.UniqueConstraint(condition=models.Q(('user__isnull', True)), fields=('cad_symbol',), name='unique_firm_legend_symbol')],
+            },
+        ),
+    ]
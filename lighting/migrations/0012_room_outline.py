@@ -0,0 +1,18 @@
+# Generated by Django 6.0 on 2026-10-18 18:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lighting', '0011_symbol_legend'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='room',
+            name='outline',
+            field=models.BinaryField(blank=True, help_text='Packed float64 (x, y) outline vertices, in drawing units', null=True),
+        ),
+    ]
@@ -0,0 +1,144 @@
+# Generated by Django 6.0 on 2026-10-18 19:10
+
+import math
+
+import django.core.validators
+import numpy as np
+from django.db import migrations, models
+from django.db.models import Avg
+
+# Frozen copy of lighting.utilization as of this migration, so later changes
+# to the engine do not change what the migration computes
+WORK_PLANE_HEIGHT = 0.75
+MAINTENANCE_FACTOR = 0.8
+MIN_MOUNTING_HEIGHT = 0.1
+
+ROOM_INDICES = np.array([0.75, 1.0, 1.25, 1.5, 2.0, 2.5, 3.0, 4.0, 5.0])
+CEILING_REFLECTANCES = np.array([0.3, 0.5, 0.7])
+WALL_REFLECTANCES = np.array([0.1, 0.3, 0.5])
+
+UF_TABLE = np.array([
+    [
+        [0.29, 0.35, 0.39, 0.42, 0.47, 0.50, 0.52, 0.55, 0.57],
+        [0.34, 0.39, 0.43, 0.46, 0.50, 0.53, 0.55, 0.57, 0.59],
+        [0.39, 0.44, 0.48, 0.50, 0.54, 0.56, 0.58, 0.60, 0.61],
+    ],
+    [
+        [0.30, 0.36, 0.40, 0.44, 0.49, 0.52, 0.55, 0.58, 0.60],
+        [0.35, 0.40, 0.45, 0.48, 0.53, 0.56, 0.58, 0.61, 0.63],
+        [0.41, 0.46, 0.50, 0.53, 0.57, 0.60, 0.62, 0.64, 0.66],
+    ],
+    [
+        [0.31, 0.37, 0.42, 0.46, 0.52, 0.56, 0.59, 0.63, 0.65],
+        [0.36, 0.42, 0.47, 0.51, 0.56, 0.60, 0.63, 0.66, 0.68],
+        [0.43, 0.49, 0.54, 0.57, 0.62, 0.65, 0.67, 0.70, 0.72],
+    ],
+])
+
+
+def room_index(area, perimeter, mounting_height):
+    """Room index K = 2A / (Hm × P), 0 where the perimeter is 0"""
+    area = np.asarray(area, dtype=np.float64)
+    perimeter = np.asarray(perimeter, dtype=np.float64)
+    height = np.maximum(np.asarray(mounting_height, dtype=np.float64), MIN_MOUNTING_HEIGHT)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        index = 2 * area / (height * perimeter)
+    return np.where(perimeter > 0, index, 0.0)
+
+
+def blend_weights(values, value):
+    """Bracketing table positions and the weight of the upper one (clamped)"""
+    value = float(np.clip(value, values[0], values[-1]))
+    upper = int(np.clip(np.searchsorted(values, value), 1, len(values) - 1))
+    lower = upper - 1
+    return lower, upper, (value - values[lower]) / (values[upper] - values[lower])
+
+
+def utilization_factors(index, ceiling, wall):
+    """UF per room: bilinear in the reflectances, linear in the room index"""
+    factors = []
+    for room_index_value, room_ceiling, room_wall in zip(index.tolist(), ceiling, wall):
+        c0, c1, tc = blend_weights(CEILING_REFLECTANCES, room_ceiling)
+        w0, w1, tw = blend_weights(WALL_REFLECTANCES, room_wall)
+        curve = (
+            (1 - tc) * (1 - tw) * UF_TABLE[c0, w0]
+            + (1 - tc) * tw * UF_TABLE[c0, w1]
+            + tc * (1 - tw) * UF_TABLE[c1, w0]
+            + tc * tw * UF_TABLE[c1, w1]
+        )
+        factors.append(float(np.interp(room_index_value, ROOM_INDICES, curve)))
+    return np.array(factors)
+
+
+def populate_utilization_factors(apps, schema_editor):
+    """Compute utilization factors for existing rooms and restate their lux with them"""
+    CADFile = apps.get_model('lighting', 'CADFile')
+    Room = apps.get_model('lighting', 'Room')
+
+    rooms = list(Room.objects.select_related('cad_file').only(
+        'id', 'area', 'length', 'width', 'height', 'outline', 'is_unassigned', 'total_lumens',
+        'ceiling_reflectance', 'wall_reflectance', 'cad_file__unit_scale',
+    ))
+    if not rooms:
+        return
+
+    perimeters = []
+    for room in rooms:
+        if room.length and room.width:
+            perimeters.append(2 * (room.length + room.width))
+        elif room.outline and len(room.outline) >= 48:
+            vertices = np.frombuffer(bytes(room.outline), dtype=np.float64).reshape(-1, 2)
+            edges = np.diff(np.vstack([vertices, vertices[:1]]), axis=0)
+            perimeters.append(float(np.hypot(edges[:, 0], edges[:, 1]).sum()) * room.cad_file.unit_scale)
+        else:
+            perimeters.append(4 * math.sqrt(max(room.area, 0.0)))
+
+    index = room_index(
+        [room.area for room in rooms], perimeters, [room.height - WORK_PLANE_HEIGHT for room in rooms]
+    )
+    factors = utilization_factors(
+        index, [room.ceiling_reflectance for room in rooms], [room.wall_reflectance for room in rooms]
+    )
+    for room, factor in zip(rooms, factors.tolist()):
+        room.utilization_factor = round(factor, 4)
+        if room.is_unassigned or room.area <= 0 or not room.total_lumens:
+            room.current_lux = 0.0
+        else:
+            room.current_lux = round(room.total_lumens * room.utilization_factor * MAINTENANCE_FACTOR / room.area, 2)
+    Room.objects.bulk_update(rooms, ['utilization_factor', 'current_lux'], batch_size=1000)
+
+    averages = dict(
+        Room.objects.filter(is_unassigned=False).values('cad_file_id').annotate(
+            lux=Avg('current_lux')
+        ).values_list('cad_file_id', 'lux')
+    )
+    cad_files = list(CADFile.objects.only('id'))
+    for cad_file in cad_files:
+        cad_file.average_lux = round(averages.get(cad_file.id) or 0.0, 2)
+    CADFile.objects.bulk_update(cad_files, ['average_lux'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lighting', '0012_room_outline'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='room',
+            name='ceiling_reflectance',
+            field=models.FloatField(default=0.7, help_text='Ceiling reflectance (0-1)', validators=[django.core.validators.MinValueValidator(0), django.core.validators.MaxValueValidator(1)]),
+        ),
+        migrations.AddField(
+            model_name='room',
+            name='utilization_factor',
+            field=models.FloatField(default=0.5, editable=False, help_text='Utilization factor from the room index and reflectances'),
+        ),
+        migrations.AddField(
+            model_name='room',
+            name='wall_reflectance',
+            field=models.FloatField(default=0.5, help_text='Wall reflectance (0-1)', validators=[django.core.validators.MinValueValidator(0), django.core.validators.MaxValueValidator(1)]),
+        ),
+        migrations.RunPython(populate_utilization_factors, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 6.0 on 2026-10-18 19:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lighting', '0013_room_utilization_factor'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cadfile',
+            name='revision',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text="Bumped whenever the project's rooms or fixtures change"),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 6.0 on 2026-10-18 20:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lighting', '0014_cadfile_revision'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='report',
+            name='error_message',
+            field=models.TextField(blank=True, default=''),
+        ),
+        migrations.AddField(
+            model_name='report',
+            name='revision',
+            field=models.PositiveIntegerField(blank=True, editable=False, help_text='CADFile revision the report was built from', null=True),
+        ),
+        migrations.AddField(
+            model_name='report',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('ready', 'Ready'), ('failed', 'Failed')], default='pending', max_length=10),
+        ),
+        migrations.AlterField(
+            model_name='report',
+            name='file_path',
+            field=models.FileField(blank=True, upload_to='reports/'),
+        ),
+        migrations.AddIndex(
+            model_name='report',
+            index=models.Index(fields=['cad_file', 'report_type', 'revision'], name='report_revision_idx'),
+        ),
+    ]
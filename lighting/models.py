@@ -2,7 +2,56 @@ from django.db import models
 from django.contrib.auth.models import User
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.core.exceptions import ValidationError
+from django.db.models import Case, ExpressionWrapper, F, Q, Sum, Value, When
+from django.db.models.functions import Cast, Coalesce, Round
 import math
+from decimal import Decimal
+import numpy as np
+
+from .utilization import MAINTENANCE_FACTOR, WORK_PLANE_HEIGHT, room_index, utilization_factors
+
+
+class AggregateBatchQuerySet(models.QuerySet):
+    """Bulk deletes update room and project aggregates once, not per row"""
+
+    def delete(self):
+        from .aggregates import deferred_aggregates
+        with deferred_aggregates():
+            return super().delete()
+
+
+class AggregateBatchDeleteMixin:
+    """Cascade deletes of a model update room and project aggregates once"""
+
+    def delete(self, *args, **kwargs):
+        from .aggregates import deferred_aggregates
+        with deferred_aggregates():
+            return super().delete(*args, **kwargs)
+
+
+class LightingCatalogQuerySet(models.QuerySet):
+    """Catalog queries built on the efficiency score"""
+
+    @staticmethod
+    def efficiency_score_expression():
+        """
+        SQL expression reproducing ``LightingCatalog.calculate_efficiency_score``
+        
+        Casts keep SQLite from using integer division on whole-rupee costs.
+        """
+        lumens = Cast('lumens', models.FloatField())
+        return Case(
+            When(Q(wattage__lte=0) | Q(unit_cost__lte=0), then=Value(0.0)),
+            default=Round(
+                (lumens / F('wattage')) * 0.6 + (lumens / Cast('unit_cost', models.FloatField())) * 0.4,
+                2,
+            ),
+            output_field=models.FloatField(),
+        )
+
+    def update_efficiency_scores(self):
+        """Recompute stored scores in one UPDATE (for rows written via ``update()`` or ``bulk_create``)"""
+        return self.update(efficiency_score=self.efficiency_score_expression())
 
 
 class LightingCatalog(models.Model):
@@ -16,19 +65,67 @@ class LightingCatalog(models.Model):
     color_temp = models.IntegerField(validators=[MinValueValidator(0)], help_text="Color temperature in Kelvin")
     unit_cost = models.DecimalField(max_digits=10, decimal_places=2, validators=[MinValueValidator(0)], help_text="Cost in Indian Rupees (₹)")
     image = models.ImageField(upload_to='fixtures/', blank=True, null=True)
+    efficiency_score = models.FloatField(
+        default=0, editable=False, db_index=True,
+        help_text="Combined lumens-per-watt and lumens-per-rupee score (higher is better)"
+    )
+    recommendations_updated_at = models.DateTimeField(
+        null=True, blank=True, editable=False,
+        help_text="When stored alternatives for this fixture were last computed"
+    )
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = LightingCatalogQuerySet.as_manager()
+
+    # Fields the efficiency score is derived from
+    EFFICIENCY_FIELDS = {'lumens', 'wattage', 'unit_cost'}
+
     class Meta:
         ordering = ['symbol_name']
+        indexes = [
+            models.Index(fields=['lumens', 'efficiency_score'], name='catalog_lumens_efficiency_idx'),
+        ]
         verbose_name = "Lighting Catalog Entry"
         verbose_name_plural = "Lighting Catalog"
 
     def __str__(self):
         return f"{self.symbol_name} - {self.brand} {self.model_number}"
 
+    def save(self, *args, **kwargs):
+        """Override save to keep the stored efficiency score current"""
+        # Store cost exactly as the database keeps it so Python- and
+        # SQL-computed scores agree
+        self.unit_cost = Decimal(self.unit_cost).quantize(Decimal('0.01'))
+        self.efficiency_score = self.calculate_efficiency_score()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and self.EFFICIENCY_FIELDS.intersection(update_fields):
+            kwargs['update_fields'] = set(update_fields) | {'efficiency_score'}
+        super().save(*args, **kwargs)
+
+    def calculate_efficiency_score(self):
+        """
+        Calculate efficiency score (lumens per watt per rupee)
+        
+        Returns:
+            Efficiency score (higher is better)
+        """
+        if self.wattage <= 0 or self.unit_cost <= 0:
+            return 0.0
+        
+        # Lumens per watt (energy efficiency)
+        luminous_efficacy = self.lumens / self.wattage
+        
+        # Cost efficiency (lumens per rupee)
+        cost_efficiency = self.lumens / float(self.unit_cost)
+        
+        # Combined score (normalized)
+        efficiency_score = (luminous_efficacy * 0.6) + (cost_efficiency * 0.4)
+        
+        return round(efficiency_score, 2)
+
 
-class CADFile(models.Model):
+class CADFile(AggregateBatchDeleteMixin, models.Model):
     """Uploaded CAD files"""
     STATUS_CHOICES = [
         ('pending', 'Pending'),
@@ -41,11 +138,23 @@ class CADFile(models.Model):
     project_name = models.CharField(max_length=255, default="Untitled Project")
     filename = models.CharField(max_length=255)
     file = models.FileField(upload_to='cad_files/')
+    content_hash = models.CharField(max_length=64, blank=True, db_index=True, help_text="SHA-256 of the uploaded file")
+    unit_scale = models.FloatField(default=0.001, help_text="Meters per drawing unit used for areas and positions")
+    symbol_report = models.JSONField(default=dict, blank=True, editable=False, help_text="CAD symbols left unmapped or matched with low confidence")
+    
+    # Materialized aggregates (kept up to date by lighting.aggregates)
+    total_lumens = models.BigIntegerField(default=0, editable=False, help_text="Total installed lumens")
+    fixture_count = models.IntegerField(default=0, editable=False, help_text="Total number of fixtures")
+    total_cost = models.DecimalField(max_digits=14, decimal_places=2, default=0, editable=False, help_text="Total fixture cost in Indian Rupees (₹)")
+    average_lux = models.FloatField(default=0, editable=False, help_text="Average current lux across rooms")
+    revision = models.PositiveIntegerField(default=0, editable=False, help_text="Bumped whenever the project's rooms or fixtures change")
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
     uploaded_at = models.DateTimeField(auto_now_add=True)
     processed_at = models.DateTimeField(null=True, blank=True)
     error_message = models.TextField(blank=True, null=True)
 
+    objects = AggregateBatchQuerySet.as_manager()
+
     class Meta:
         ordering = ['-uploaded_at']
         verbose_name = "CAD File"
@@ -55,7 +164,48 @@ class CADFile(models.Model):
         return f"{self.project_name} - {self.filename}"
 
 
-class Room(models.Model):
+class RoomQuerySet(AggregateBatchQuerySet):
+    """Room queries with lighting metrics computed in SQL"""
+
+    @staticmethod
+    def lux_expression(total_lumens):
+        """
+        SQL expression for a room's lux given a total lumens expression
+
+        Mirrors ``Room.calculate_lux``.
+        """
+        return Case(
+            When(Q(is_unassigned=True) | Q(area__lte=0), then=Value(0.0)),
+            default=Round(total_lumens * F('utilization_factor') * MAINTENANCE_FACTOR / F('area'), 2),
+        )
+
+    def with_lighting_metrics(self):
+        """
+        Annotate lighting metrics computed from fixture rows, in one query
+
+        Annotations: ``live_total_lumens``, ``live_fixture_count``,
+        ``live_total_cost``, ``live_current_lux`` and
+        ``live_is_adequately_lit``. They match the stored aggregates when
+        those are current.
+        """
+        cost_field = models.DecimalField(max_digits=14, decimal_places=2)
+        return self.annotate(
+            live_total_lumens=Coalesce(Sum(F('fixtures__quantity') * F('fixtures__lighting_catalog__lumens')), 0),
+            live_fixture_count=Coalesce(Sum('fixtures__quantity'), 0),
+            live_total_cost=Coalesce(
+                Sum(F('fixtures__quantity') * F('fixtures__lighting_catalog__unit_cost'), output_field=cost_field),
+                Value(Decimal('0.00')), output_field=cost_field,
+            ),
+        ).annotate(
+            live_current_lux=self.lux_expression(F('live_total_lumens')),
+        ).annotate(
+            live_is_adequately_lit=ExpressionWrapper(
+                Q(live_current_lux__gte=F('required_lux')), output_field=models.BooleanField()
+            ),
+        )
+
+
+class Room(AggregateBatchDeleteMixin, models.Model):
     """Room detected from CAD file"""
     
     # Room type choices with standard lux recommendations
@@ -108,6 +258,32 @@ class Room(models.Model):
     # Lux calculation - now dynamically calculated based on room type
     required_lux = models.FloatField(validators=[MinValueValidator(0)], default=300, help_text="Required illuminance in lux", blank=True)
     
+    # Lumen method inputs (floor reflectance is taken as 0.2)
+    ceiling_reflectance = models.FloatField(
+        validators=[MinValueValidator(0), MaxValueValidator(1)], default=0.7, help_text="Ceiling reflectance (0-1)"
+    )
+    wall_reflectance = models.FloatField(
+        validators=[MinValueValidator(0), MaxValueValidator(1)], default=0.5, help_text="Wall reflectance (0-1)"
+    )
+    utilization_factor = models.FloatField(
+        default=0.5, editable=False, help_text="Utilization factor from the room index and reflectances"
+    )
+    
+    # Bucket for fixtures found outside every room outline
+    is_unassigned = models.BooleanField(default=False, help_text="Holds fixtures outside every room outline")
+    outline = models.BinaryField(
+        null=True, blank=True, editable=False,
+        help_text="Packed float64 (x, y) outline vertices, in drawing units"
+    )
+    
+    # Materialized aggregates (kept up to date by lighting.aggregates)
+    total_lumens = models.BigIntegerField(default=0, editable=False, help_text="Total installed lumens")
+    fixture_count = models.IntegerField(default=0, editable=False, help_text="Total number of fixtures")
+    total_cost = models.DecimalField(max_digits=14, decimal_places=2, default=0, editable=False, help_text="Total fixture cost in Indian Rupees (₹)")
+    current_lux = models.FloatField(default=0, editable=False, help_text="Current illuminance from installed fixtures")
+    
+    objects = RoomQuerySet.as_manager()
+    
     class Meta:
         ordering = ['name']
         verbose_name = "Room"
@@ -117,7 +293,13 @@ class Room(models.Model):
         return f"{self.name} ({self.area}m²) - {self.get_room_type_display()}"
     
     def save(self, *args, **kwargs):
-        """Override save to calculate area and required lux dynamically"""
+        """Override save to calculate area, required lux and utilization factor dynamically"""
+        self.apply_derived_fields()
+        self.apply_utilization_factors([self])
+        super().save(*args, **kwargs)
+    
+    def apply_derived_fields(self):
+        """Calculate area and required lux (also used before bulk_create)"""
         # Calculate area from length and width if provided
         if self.length and self.width:
             calculated_area = self.length * self.width
@@ -126,10 +308,40 @@ class Room(models.Model):
                 self.area = calculated_area
         
         # Set required lux based on room type if not explicitly set
-        if not self.required_lux or self.required_lux == 300:  # 300 is default
+        # (the unassigned bucket has no lighting requirement)
+        if not self.is_unassigned and (not self.required_lux or self.required_lux == 300):  # 300 is default
             self.required_lux = self.LUX_STANDARDS.get(self.room_type, 300)
+    
+    @classmethod
+    def apply_utilization_factors(cls, rooms):
+        """Set utilization_factor on many rooms with one engine call (also used before bulk_create)"""
+        if not rooms:
+            return
         
-        super().save(*args, **kwargs)
+        index = room_index(
+            [room.area for room in rooms],
+            [room.floor_perimeter() for room in rooms],
+            [room.height - WORK_PLANE_HEIGHT for room in rooms],
+        )
+        factors = utilization_factors(
+            index,
+            [room.ceiling_reflectance for room in rooms],
+            [room.wall_reflectance for room in rooms],
+        )
+        for room, factor in zip(rooms, factors.tolist()):
+            room.utilization_factor = round(factor, 4)
+    
+    def floor_perimeter(self):
+        """Perimeter in meters from dimensions, the outline, or a square of the area"""
+        if self.length and self.width:
+            return 2 * (self.length + self.width)
+        
+        vertices = self.outline_vertices
+        if len(vertices) >= 3:
+            edges = np.diff(np.vstack([vertices, vertices[:1]]), axis=0)
+            return float(np.hypot(edges[:, 0], edges[:, 1]).sum()) * self.cad_file.unit_scale
+        
+        return 4 * math.sqrt(max(self.area, 0.0))
     
     def clean(self):
         """Validate room data"""
@@ -145,6 +357,13 @@ class Room(models.Model):
             if abs(self.area - calculated_area) > 0.1 * calculated_area:
                 self.area = calculated_area
     
+    @property
+    def outline_vertices(self) -> np.ndarray:
+        """(n, 2) read-only view of the outline vertices (empty if none was recorded)"""
+        if not self.outline:
+            return np.zeros((0, 2))
+        return np.frombuffer(self.outline, dtype=np.float64).reshape(-1, 2)
+    
     @classmethod
     def calculate_required_lux(cls, room_type):
         """Get recommended lux level for a room type"""
@@ -152,38 +371,30 @@ class Room(models.Model):
     
     def calculate_required_lumens(self):
         """Calculate total lumens required based on room dimensions and type"""
-        # Formula: Required Lumens = Room Area (m²) × Required Lux Level
-        # Apply room utilization factor and maintenance factor
-        room_index = (self.length * self.width) / (self.height * (self.length + self.width)) if self.length and self.width else 1.0
-        utilization_factor = 0.7  # Accounts for light absorption and reflection
-        maintenance_factor = 0.8  # Accounts for lamp depreciation and dirt
+        # Lumen method: Required Lumens = Area (m²) × Required Lux / (UF × MF)
+        if self.is_unassigned or self.utilization_factor <= 0:
+            return 0
         
-        required_lumens = (self.area * self.required_lux) / (utilization_factor * maintenance_factor)
-        return math.ceil(required_lumens)
+        required_lumens = (self.area * self.required_lux) / (self.utilization_factor * MAINTENANCE_FACTOR)
+        return math.ceil(required_lumens - 1e-9)
 
     @property
     def total_lumens_required(self):
         """Calculate total lumens required for this room (considers efficiency factors)"""
         return self.calculate_required_lumens()
 
-    @property
-    def current_lux(self):
-        """Calculate current lux based on installed fixtures"""
-        # Guard against zero area
-        if self.area <= 0:
+    def calculate_lux(self, total_lumens):
+        """Calculate lux for a given installed lumen total (stored as current_lux)"""
+        # Guard against zero area and the unassigned fixtures bucket
+        if self.area <= 0 or self.is_unassigned:
             return 0.0
         
-        # Calculate total lumens from all fixtures
-        total_lumens = sum(fixture.total_lumens for fixture in self.fixtures.all())
-        
         # Guard against no fixtures
         if total_lumens == 0:
             return 0.0
         
-        # Apply lighting efficiency factor (accounting for losses, reflections, etc.)
-        # Typical efficiency factor is 0.6-0.8 for indoor spaces
-        efficiency_factor = 0.7
-        effective_lumens = total_lumens * efficiency_factor
+        # Apply utilization and maintenance factors (lumen method)
+        effective_lumens = total_lumens * self.utilization_factor * MAINTENANCE_FACTOR
         
         # Calculate lux (lumens per square meter)
         lux = effective_lumens / self.area
@@ -200,9 +411,19 @@ class Fixture(models.Model):
     """Lighting fixtures in a room"""
     room = models.ForeignKey(Room, on_delete=models.CASCADE, related_name='fixtures')
     lighting_catalog = models.ForeignKey(LightingCatalog, on_delete=models.CASCADE, related_name='installations')
+    cad_symbol = models.CharField(max_length=255, blank=True, default='', help_text="CAD block name the fixture was mapped from")
     quantity = models.IntegerField(validators=[MinValueValidator(1)], default=1)
     x_coordinate = models.FloatField(null=True, blank=True, help_text="X position from CAD")
     y_coordinate = models.FloatField(null=True, blank=True, help_text="Y position from CAD")
+    points = models.BinaryField(
+        null=True, blank=True, editable=False,
+        help_text="Packed float64 (x, y, rotation) of every insert, in drawing units / degrees"
+    )
+    
+    # Columns of each packed insertion point
+    POINT_FIELDS = ('x', 'y', 'rotation')
+    
+    objects = AggregateBatchQuerySet.as_manager()
     
     class Meta:
         ordering = ['room', 'lighting_catalog']
@@ -212,6 +433,43 @@ class Fixture(models.Model):
     def __str__(self):
         return f"{self.lighting_catalog.symbol_name} x{self.quantity} in {self.room.name}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        """Remember loaded values so aggregate updates can apply deltas"""
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
+    @staticmethod
+    def pack_points(x, y, rotation) -> bytes:
+        """Pack insertion point columns into the binary ``points`` format"""
+        return np.column_stack([x, y, rotation]).astype(np.float64, copy=False).tobytes()
+
+    @property
+    def insertion_points(self) -> np.ndarray:
+        """
+        All insertion points as a read-only (quantity, 3) float64 view
+        
+        Columns are x, y and rotation. The array wraps the stored bytes
+        without copying; fixtures saved before points were recorded fall
+        back to the single x/y coordinate.
+        """
+        if self.points:
+            return np.frombuffer(self.points, dtype=np.float64).reshape(-1, len(self.POINT_FIELDS))
+        if self.x_coordinate is None or self.y_coordinate is None:
+            return np.zeros((0, len(self.POINT_FIELDS)))
+        return np.array([[self.x_coordinate, self.y_coordinate, 0.0]])
+
+    @property
+    def positions(self) -> np.ndarray:
+        """(quantity, 2) view of insertion point x, y"""
+        return self.insertion_points[:, :2]
+
+    @property
+    def rotations(self) -> np.ndarray:
+        """(quantity,) view of insertion rotations in degrees"""
+        return self.insertion_points[:, 2]
+
     @property
     def total_lumens(self):
         """Total lumens from this fixture"""
@@ -230,15 +488,88 @@ class Report(models.Model):
         ('csv', 'CSV Report'),
     ]
 
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('ready', 'Ready'),
+        ('failed', 'Failed'),
+    ]
+
     cad_file = models.ForeignKey(CADFile, on_delete=models.CASCADE, related_name='reports')
     report_type = models.CharField(max_length=10, choices=REPORT_TYPE_CHOICES)
-    file_path = models.FileField(upload_to='reports/')
+    revision = models.PositiveIntegerField(null=True, blank=True, editable=False, help_text="CADFile revision the report was built from")
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    file_path = models.FileField(upload_to='reports/', blank=True)
+    error_message = models.TextField(blank=True, default='')
     generated_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
         ordering = ['-generated_at']
         verbose_name = "Report"
         verbose_name_plural = "Reports"
+        indexes = [
+            models.Index(fields=['cad_file', 'report_type', 'revision'], name='report_revision_idx'),
+        ]
 
     def __str__(self):
         return f"{self.report_type.upper()} - {self.cad_file.project_name} - {self.generated_at.strftime('%Y-%m-%d')}"
+
+
+class FixtureRecommendation(models.Model):
+    """Precomputed alternative for a catalog item, kept current by lighting.recommendations"""
+    BAND_CHOICES = [
+        ('below', 'Below Budget'),
+        ('within', 'Within Budget'),
+        ('above', 'Above Budget'),
+        ('top', 'Most Efficient'),
+    ]
+
+    catalog_item = models.ForeignKey(LightingCatalog, on_delete=models.CASCADE, related_name='recommendations')
+    recommended = models.ForeignKey(LightingCatalog, on_delete=models.CASCADE, related_name='recommended_for')
+    band = models.CharField(max_length=10, choices=BAND_CHOICES)
+    priority = models.PositiveIntegerField(help_text="Rank within the band (1=highest)")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['catalog_item', 'band', 'priority']
+        constraints = [
+            models.UniqueConstraint(fields=['catalog_item', 'band', 'priority'], name='unique_recommendation_rank'),
+        ]
+        verbose_name = "Fixture Recommendation"
+        verbose_name_plural = "Fixture Recommendations"
+
+    def __str__(self):
+        return f"{self.catalog_item.symbol_name} -> {self.recommended.symbol_name} ({self.band} #{self.priority})"
+
+
+class SymbolLegend(models.Model):
+    """Confirmed CAD block to catalog mapping for a user (or firm-wide if user is empty)"""
+    SOURCE_CHOICES = [
+        ('legend', 'Upload Legend'),
+        ('selection', 'Fixture Selection'),
+        ('matcher', 'Symbol Matcher'),
+        ('admin', 'Admin'),
+    ]
+
+    user = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name='symbol_legend', null=True, blank=True,
+        help_text="Owner of the mapping; leave empty to share it firm-wide"
+    )
+    cad_symbol = models.CharField(max_length=255, help_text="Block name as it appears in CAD")
+    lighting_catalog = models.ForeignKey(LightingCatalog, on_delete=models.CASCADE, related_name='legend_entries')
+    source = models.CharField(max_length=10, choices=SOURCE_CHOICES, default='admin')
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['cad_symbol']
+        constraints = [
+            models.UniqueConstraint(fields=['cad_symbol', 'user'], name='unique_user_legend_symbol'),
+            models.UniqueConstraint(
+                fields=['cad_symbol'], condition=models.Q(user__isnull=True), name='unique_firm_legend_symbol'
+            ),
+        ]
+        verbose_name = "Symbol Legend Entry"
+        verbose_name_plural = "Symbol Legend"
+
+    def __str__(self):
+        owner = self.user.username if self.user_id else 'firm'
+        return f"{self.cad_symbol} -> {self.lighting_catalog.symbol_name} ({owner})"
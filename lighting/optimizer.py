@@ -0,0 +1,359 @@
+"""
+Whole-project fixture selection optimizer
+
+Each fixture row (a catalog item installed ``quantity`` times in a room) is a
+group that may switch to another catalog item. Every room must keep enough
+lumens for its required lux under the ``Room.calculate_lux`` model, so each
+room is a multiple-choice knapsack: pick one option per group, minimize cost
+(or wattage), subject to total lumens >= the room's requirement. Rooms are
+solved exactly by merging per-group Pareto frontiers of (lumens, weight),
+with lumens capped at the requirement so surplus light never keeps a state
+alive. A total budget cap couples the rooms; it is handled by Lagrangian
+relaxation of the budget, bisecting the multiplier until the cap holds.
+"""
+from decimal import Decimal
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .catalog_index import MAX_LUMENS_FACTOR, MIN_LUMENS_FACTOR, CatalogIndex, get_catalog_index, to_paise
+from .models import CADFile, Fixture, Room
+
+OBJECTIVES = ('cost', 'wattage')
+
+# Default lumen window for alternatives, as used by recommendations (±35%)
+DEFAULT_LUMEN_WINDOW = (MIN_LUMENS_FACTOR, MAX_LUMENS_FACTOR)
+
+# Cap on DP states kept per room; beyond it, states are thinned to the
+# cheapest per lumen bucket (feasibility stays exact, optimality approximate)
+MAX_STATES = 2000
+
+# Budget search: at most this many λ steps, stopping once λ is within
+# a relative tolerance of the smallest multiplier that fits the budget
+LAGRANGE_ITERATIONS = 30
+LAGRANGE_TOLERANCE = 0.01
+
+
+def pareto_front(lumens: np.ndarray, weight: np.ndarray) -> np.ndarray:
+    """
+    Indices of (lumens, weight) pairs not dominated by another pair
+
+    A pair is dominated if another has at least as many lumens for less
+    weight (or equal weight and more lumens).
+
+    Returns:
+        Indices into the inputs, sorted by lumens descending
+    """
+    order = np.lexsort((weight, -lumens))
+    sorted_weight = weight[order]
+    keep = np.ones(len(order), dtype=bool)
+    keep[1:] = sorted_weight[1:] < np.minimum.accumulate(sorted_weight)[:-1]
+    return order[keep]
+
+
+def thin_states(lumens: np.ndarray, weight: np.ndarray, required: int, max_states: int) -> np.ndarray:
+    """Cheapest state per lumen bucket so at most ~max_states remain"""
+    step = max(1.0, required / max_states)
+    buckets = np.floor(lumens / step).astype(np.int64)
+    order = np.lexsort((weight, buckets))
+    first = np.ones(len(order), dtype=bool)
+    first[1:] = buckets[order][1:] != buckets[order][:-1]
+    return order[first]
+
+
+def solve_room(required: int, groups: List[Tuple[int, np.ndarray]], index: CatalogIndex,
+               weights: np.ndarray) -> Tuple[List[int], bool]:
+    """
+    Choose one catalog position per group minimizing total weight
+
+    Args:
+        required: Lumens the room needs (0 for no requirement)
+        groups: (quantity, candidate catalog positions) per fixture group
+        index: CatalogIndex the positions refer to
+        weights: Per-position weight (cost, wattage or a Lagrangian mix)
+
+    Returns:
+        Tuple of (chosen position per group, whether the requirement is met).
+        If no selection meets it, the brightest (then cheapest) is returned.
+    """
+    state_lumens = np.zeros(1, dtype=np.int64)
+    state_weight = np.zeros(1, dtype=np.float64)
+    history = []
+
+    for quantity, positions in groups:
+        option_lumens = np.minimum(index.lumens[positions] * quantity, required)
+        option_weight = weights[positions] * quantity
+        front = pareto_front(option_lumens, option_weight)
+        option_positions = positions[front]
+        option_lumens, option_weight = option_lumens[front], option_weight[front]
+
+        combined_lumens = np.minimum(state_lumens[:, None] + option_lumens[None, :], required).ravel()
+        combined_weight = (state_weight[:, None] + option_weight[None, :]).ravel()
+        keep = pareto_front(combined_lumens, combined_weight)
+        if len(keep) > MAX_STATES:
+            thinned = thin_states(combined_lumens[keep], combined_weight[keep], required, MAX_STATES)
+            keep = keep[thinned]
+            keep = keep[pareto_front(combined_lumens[keep], combined_weight[keep])]
+
+        history.append((keep // len(option_positions), option_positions[keep % len(option_positions)]))
+        state_lumens, state_weight = combined_lumens[keep], combined_weight[keep]
+
+    feasible = state_lumens >= required
+    if feasible.any():
+        candidates = np.flatnonzero(feasible)
+        best = candidates[np.argmin(state_weight[candidates])]
+    else:
+        best = np.lexsort((state_weight, -state_lumens))[0]
+
+    choices = []
+    for parents, chosen in reversed(history):
+        choices.append(int(chosen[best]))
+        best = parents[best]
+    choices.reverse()
+    return choices, bool(feasible.any())
+
+
+class ProjectOptimizer:
+    """
+    Fixture groups and candidates of one CADFile, solvable for any weighting
+
+    Args:
+        cad_file: CADFile to optimize
+        lumen_window: (low, high) lumen multiples of each group's current
+            item that alternatives must fall within, or None for the whole
+            catalog
+        index: CatalogIndex to draw alternatives from
+    """
+
+    def __init__(self, cad_file: CADFile, lumen_window: Optional[Tuple[float, float]] = DEFAULT_LUMEN_WINDOW,
+                 index: Optional[CatalogIndex] = None):
+        self.cad_file = cad_file
+        self.index = index or get_catalog_index()
+        self.rooms: List[Room] = list(cad_file.rooms.prefetch_related('fixtures'))
+        self.cost = self.index.cost.astype(np.float64)
+
+        candidates: Dict[int, np.ndarray] = {}
+        self.room_groups = []
+        for room in self.rooms:
+            groups = []
+            for fixture in room.fixtures.all():
+                current = self.index.position_by_id[fixture.lighting_catalog_id]
+                if room.is_unassigned:
+                    # Fixtures outside every room have no lux to keep; leave them
+                    positions = np.array([current])
+                else:
+                    if fixture.lighting_catalog_id not in candidates:
+                        candidates[fixture.lighting_catalog_id] = self.candidate_positions(current, lumen_window)
+                    positions = candidates[fixture.lighting_catalog_id]
+                groups.append((fixture, positions))
+            self.room_groups.append(groups)
+
+    def candidate_positions(self, current: int, lumen_window) -> np.ndarray:
+        """Catalog positions an item may be swapped for (always including itself)"""
+        if lumen_window is None:
+            return np.arange(len(self.index))
+        low, high = lumen_window
+        lumens = self.index.lumens[current]
+        mask = (self.index.lumens >= lumens * low) & (self.index.lumens <= lumens * high)
+        mask[current] = True
+        return np.flatnonzero(mask)
+
+    @staticmethod
+    def required_lumens(room: Room) -> int:
+        """Installed lumens a room needs to reach its required lux"""
+        if room.is_unassigned or room.area <= 0 or not room.required_lux:
+            return 0
+        return room.calculate_required_lumens()
+
+    def solve(self, weights: np.ndarray) -> Tuple[List[List[int]], List[bool]]:
+        """Solve every room independently for one weighting"""
+        selection, met = [], []
+        for room, groups in zip(self.rooms, self.room_groups):
+            if not groups:
+                selection.append([])
+                met.append(self.required_lumens(room) == 0)
+                continue
+            choices, feasible = solve_room(
+                self.required_lumens(room),
+                [(fixture.quantity, positions) for fixture, positions in groups],
+                self.index, weights,
+            )
+            selection.append(choices)
+            met.append(feasible)
+        return selection, met
+
+    def total(self, selection: List[List[int]], column: np.ndarray) -> float:
+        """Sum of ``column`` over a selection, weighted by quantity"""
+        return sum(
+            column[position] * fixture.quantity
+            for groups, choices in zip(self.room_groups, selection)
+            for (fixture, _), position in zip(groups, choices)
+        )
+
+    def optimize(self, objective: str = 'cost', budget: Optional[Decimal] = None) -> Tuple[List[List[int]], List[bool]]:
+        """
+        Best selection for an objective, optionally under a total cost cap
+
+        With objective 'wattage' and a budget, the cap is relaxed into the
+        objective as wattage + λ·cost and λ is bisected to the smallest
+        value whose solution fits the budget.
+        """
+        if objective not in OBJECTIVES:
+            raise ValueError(f"Unknown objective '{objective}'")
+
+        if objective == 'cost':
+            return self.solve(self.cost)
+
+        solution = self.solve(self.index.wattage)
+        if budget is None:
+            return solution
+        cap = float(to_paise(budget))
+        if self.total(solution[0], self.cost) <= cap:
+            return solution
+
+        # Cheapest selection; if even that exceeds the cap, return it
+        cheapest = self.solve(self.cost)
+        if self.total(cheapest[0], self.cost) > cap:
+            return cheapest
+
+        # Grow λ from watts-per-paise scale until the cap holds, then bisect
+        low = 0.0
+        high = float(self.index.wattage.max(initial=1.0)) / max(1.0, float(self.cost.max(initial=1.0)))
+        best = None
+        for _ in range(LAGRANGE_ITERATIONS):
+            candidate = self.solve(self.index.wattage + high * self.cost)
+            if self.total(candidate[0], self.cost) <= cap:
+                best = candidate
+                break
+            low, high = high, high * 4
+        if best is None:
+            return cheapest
+
+        for _ in range(LAGRANGE_ITERATIONS):
+            if high - low <= LAGRANGE_TOLERANCE * high:
+                break
+            middle = (low + high) / 2
+            candidate = self.solve(self.index.wattage + middle * self.cost)
+            if self.total(candidate[0], self.cost) <= cap:
+                best, high = candidate, middle
+            else:
+                low = middle
+        return best
+
+    def proposal(self, selection: List[List[int]], met: List[bool], objective: str,
+                 budget: Optional[Decimal] = None) -> Dict:
+        """Describe a selection as changes plus cost, wattage and lux deltas"""
+        items = self.index.items
+        changes = []
+        rooms = []
+        current_cost = proposed_cost = Decimal('0.00')
+        current_wattage = proposed_wattage = 0.0
+
+        for room, groups, choices, room_met in zip(self.rooms, self.room_groups, selection, met):
+            current_lumens = proposed_lumens = 0
+            for (fixture, _), position in zip(groups, choices):
+                current, proposed = self.index.by_id[fixture.lighting_catalog_id], items[position]
+                current_cost += current.unit_cost * fixture.quantity
+                proposed_cost += proposed.unit_cost * fixture.quantity
+                current_wattage += current.wattage * fixture.quantity
+                proposed_wattage += proposed.wattage * fixture.quantity
+                current_lumens += current.lumens * fixture.quantity
+                proposed_lumens += proposed.lumens * fixture.quantity
+                if proposed.id != current.id:
+                    changes.append({
+                        'fixture_id': fixture.id,
+                        'room': room.name,
+                        'quantity': fixture.quantity,
+                        'current_catalog_id': current.id,
+                        'current_symbol': current.symbol_name,
+                        'catalog_id': proposed.id,
+                        'symbol': proposed.symbol_name,
+                        'brand': proposed.brand,
+                        'model_number': proposed.model_number,
+                        'cost_delta': float((proposed.unit_cost - current.unit_cost) * fixture.quantity),
+                        'wattage_delta': round((proposed.wattage - current.wattage) * fixture.quantity, 2),
+                    })
+            if room.is_unassigned:
+                continue
+            rooms.append({
+                'room_id': room.id,
+                'name': room.name,
+                'required_lux': room.required_lux,
+                'current_lux': room.calculate_lux(current_lumens),
+                'proposed_lux': room.calculate_lux(proposed_lumens),
+                'meets_requirement': room_met,
+            })
+
+        return {
+            'objective': objective,
+            'budget': float(budget) if budget is not None else None,
+            'budget_met': budget is None or proposed_cost <= budget,
+            'all_rooms_lit': all(room['meets_requirement'] for room in rooms),
+            'current_cost': float(current_cost),
+            'proposed_cost': float(proposed_cost),
+            'cost_delta': float(proposed_cost - current_cost),
+            'current_wattage': round(current_wattage, 2),
+            'proposed_wattage': round(proposed_wattage, 2),
+            'wattage_delta': round(proposed_wattage - current_wattage, 2),
+            'changes': changes,
+            'rooms': rooms,
+        }
+
+
+def optimize_project(cad_file: CADFile, objective: str = 'cost', budget: Optional[Decimal] = None,
+                     lumen_window: Optional[Tuple[float, float]] = DEFAULT_LUMEN_WINDOW) -> Dict:
+    """
+    Propose a catalog item per fixture group for a whole project
+
+    Nothing is written; pass the proposal's changes to ``apply_selection``
+    once accepted.
+
+    Args:
+        cad_file: CADFile to optimize
+        objective: 'cost' (total ₹) or 'wattage' (total W) to minimize
+        budget: Optional total fixture cost cap (in INR ₹)
+        lumen_window: Alternatives' lumen range relative to the current
+            item, or None to consider the whole catalog
+
+    Returns:
+        Proposal dictionary with 'changes', per-room lux in 'rooms' and
+        cost/wattage totals and deltas
+    """
+    optimizer = ProjectOptimizer(cad_file, lumen_window)
+    selection, met = optimizer.optimize(objective, budget)
+    return optimizer.proposal(selection, met, objective, budget)
+
+
+def apply_selection(cad_file: CADFile, changes: List[Dict]) -> int:
+    """
+    Apply accepted fixture changes (as in a proposal's 'changes')
+
+    Fixtures are saved individually; their aggregate signals are batched
+    so room and project totals are rebuilt once at the end.
+
+    Args:
+        cad_file: CADFile the fixtures belong to
+        changes: Dicts with 'fixture_id' and 'catalog_id'
+
+    Returns:
+        Number of fixtures changed
+    """
+    from .aggregates import deferred_aggregates
+    from .models import LightingCatalog
+
+    targets = {int(change['fixture_id']): int(change['catalog_id']) for change in changes}
+    catalog = LightingCatalog.objects.in_bulk(set(targets.values()))
+    missing = set(targets.values()) - set(catalog)
+    if missing:
+        raise LightingCatalog.DoesNotExist(f"Unknown catalog items: {sorted(missing)}")
+
+    updated = 0
+    with deferred_aggregates():
+        fixtures = Fixture.objects.filter(room__cad_file=cad_file, id__in=targets).select_related('lighting_catalog')
+        for fixture in fixtures:
+            new_catalog = catalog[targets[fixture.id]]
+            if fixture.lighting_catalog_id != new_catalog.id:
+                fixture.lighting_catalog = new_catalog
+                fixture.save()
+                updated += 1
+    return updated
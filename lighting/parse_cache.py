@@ -0,0 +1,193 @@
+"""
+Content-addressed cache of parsed CAD results, keyed by file SHA-256
+"""
+import hashlib
+import os
+from typing import Dict, Optional, Tuple
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .cad_geometry import CADGeometry, parse_cad_columnar
+
+CACHE_FORMAT_VERSION = 3
+CACHE_SUFFIX = f".v{CACHE_FORMAT_VERSION}.npz"
+# Hit/miss counters live in the Django cache: with the default LocMemCache
+# they count this process only; point CACHES at a shared backend (Redis,
+# Memcached) for counts across all workers
+HITS_KEY = 'lighting:parse_cache:hits'
+MISSES_KEY = 'lighting:parse_cache:misses'
+
+
+def get_cache_dir() -> str:
+    """Directory holding cached parse results (created on demand)"""
+    cache_dir = os.path.join(settings.MEDIA_ROOT, 'parse_cache')
+    os.makedirs(cache_dir, exist_ok=True)
+    return cache_dir
+
+
+def get_cache_path(content_hash: str) -> str:
+    """Path of the cache entry for a file hash"""
+    return os.path.join(get_cache_dir(), f"{content_hash}{CACHE_SUFFIX}")
+
+
+def file_sha256(file_path: str, chunk_size: int = 1024 * 1024) -> str:
+    """
+    Hash a file on disk without loading it into memory
+
+    Args:
+        file_path: Path to the file
+        chunk_size: Bytes read per iteration
+
+    Returns:
+        Hex SHA-256 digest
+    """
+    hasher = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+def _increment(key: str):
+    """Increment a shared counter in the Django cache"""
+    cache.add(key, 0, timeout=None)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 1, timeout=None)
+
+
+def get_cached_parse(content_hash: str) -> Optional[CADGeometry]:
+    """
+    Load a cached parse result and mark it as recently used
+
+    Args:
+        content_hash: SHA-256 of the CAD file
+
+    Returns:
+        CADGeometry instance, or None on a miss
+    """
+    path = get_cache_path(content_hash)
+    try:
+        geometry = CADGeometry.from_npz(path)
+    except (OSError, ValueError, KeyError):
+        return None
+
+    # Bump mtime so eviction treats the entry as recently used
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+    return geometry
+
+
+def store_parsed(content_hash: str, geometry: CADGeometry):
+    """
+    Write a parse result to the cache and enforce the size budget
+
+    Args:
+        content_hash: SHA-256 of the CAD file
+        geometry: Result of ``parse_cad_columnar``
+    """
+    path = get_cache_path(content_hash)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        geometry.save_npz(f)
+    os.replace(tmp_path, path)
+
+    evict(getattr(settings, 'CAD_PARSE_CACHE_MAX_BYTES', 512 * 1024 * 1024))
+
+
+def evict(max_bytes: int) -> int:
+    """
+    Delete least recently used entries until the cache fits in max_bytes
+
+    Args:
+        max_bytes: Size budget for the cache directory
+
+    Returns:
+        Number of entries removed
+    """
+    entries = []
+    total = 0
+    with os.scandir(get_cache_dir()) as it:
+        for entry in it:
+            if entry.is_file() and entry.name.endswith(CACHE_SUFFIX):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+                total += stat.st_size
+
+    removed = 0
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+        except OSError:
+            continue
+        total -= size
+        removed += 1
+    return removed
+
+
+def purge() -> int:
+    """
+    Remove every cache entry
+
+    Returns:
+        Number of entries removed
+    """
+    return evict(0)
+
+
+def cache_stats() -> Dict:
+    """
+    Report hit/miss counters and on-disk usage
+
+    Entries and size are read from the shared cache directory; hits and
+    misses come from the Django cache and are per process unless CACHES
+    uses a shared backend.
+
+    Returns:
+        Dictionary with hits, misses, entries and size in bytes
+    """
+    entries = 0
+    size = 0
+    with os.scandir(get_cache_dir()) as it:
+        for entry in it:
+            if entry.is_file() and entry.name.endswith(CACHE_SUFFIX):
+                entries += 1
+                size += entry.stat().st_size
+
+    return {
+        'hits': cache.get(HITS_KEY, 0),
+        'misses': cache.get(MISSES_KEY, 0),
+        'entries': entries,
+        'bytes': size,
+    }
+
+
+def parse_cad_cached(file_path: str, content_hash: Optional[str] = None) -> Tuple[CADGeometry, str]:
+    """
+    Parse a CAD file, reusing a cached result for byte-identical files
+
+    Args:
+        file_path: Path to the CAD file
+        content_hash: SHA-256 of the file if already known (e.g. from upload)
+
+    Returns:
+        Tuple of (CADGeometry, content hash). Parse errors propagate and are
+        not cached.
+    """
+    content_hash = content_hash or file_sha256(file_path)
+
+    geometry = get_cached_parse(content_hash)
+    if geometry is not None:
+        _increment(HITS_KEY)
+    else:
+        _increment(MISSES_KEY)
+        geometry = parse_cad_columnar(file_path)
+        store_parsed(content_hash, geometry)
+
+    return geometry, content_hash
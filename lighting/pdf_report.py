@@ -0,0 +1,296 @@
+"""
+PDF report rendering: shared styles, story builders and chunked parallel rendering
+
+Large projects are split into chunks of rooms rendered in a process pool;
+the parent renders the title pages with a table of contents and the
+summary, merges everything with pypdf and stamps "Page n of N" on every
+page. Smaller projects, or environments without pypdf or child processes,
+keep the single-process ``SimpleDocTemplate`` path.
+"""
+import io
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, NamedTuple, Optional, Sequence, Tuple
+
+from reportlab.lib import colors
+from reportlab.lib.enums import TA_CENTER
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
+from reportlab.lib.units import inch
+from reportlab.pdfgen import canvas
+from reportlab.platypus import PageBreak, Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+
+from .report_data import ReportProject, ReportRoom, ReportSnapshot
+
+try:
+    from pypdf import PdfReader, PdfWriter
+except ImportError:  # Optional: without it every report takes the single-process path
+    PdfReader = PdfWriter = None
+
+# Defaults for settings.PDF_PARALLEL_MIN_ROOMS, PDF_CHUNK_ROOMS and PDF_WORKERS
+PARALLEL_MIN_ROOMS = 500
+CHUNK_ROOMS = 250
+DEFAULT_WORKERS = None  # os.cpu_count()
+
+# Styles are compiled once per process and shared by every table
+STYLES = getSampleStyleSheet()
+TITLE_STYLE = ParagraphStyle(
+    'CustomTitle',
+    parent=STYLES['Heading1'],
+    fontSize=24,
+    textColor=colors.HexColor('#1a5490'),
+    spaceAfter=30,
+    alignment=TA_CENTER,
+)
+INFO_TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (0, -1), colors.grey),
+    ('TEXTCOLOR', (0, 0), (0, -1), colors.whitesmoke),
+    ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+    ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, -1), 10),
+    ('BOTTOMPADDING', (0, 0), (-1, -1), 12),
+    ('BACKGROUND', (1, 0), (1, -1), colors.beige),
+    ('GRID', (0, 0), (-1, -1), 1, colors.black),
+])
+ROOM_TABLE_STYLE = TableStyle([
+    ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, -1), 9),
+    ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
+    ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
+])
+FIXTURE_TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+    ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, -1), 8),
+    ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
+    ('GRID', (0, 0), (-1, -1), 1, colors.black),
+    ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.lightgrey]),
+])
+SUMMARY_TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (0, -1), colors.HexColor('#1a5490')),
+    ('TEXTCOLOR', (0, 0), (0, -1), colors.whitesmoke),
+    ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+    ('FONTNAME', (0, 0), (-1, -1), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, -1), 12),
+    ('BOTTOMPADDING', (0, 0), (-1, -1), 15),
+    ('GRID', (0, 0), (-1, -1), 2, colors.black),
+])
+CONTENTS_TABLE_STYLE = TableStyle([
+    ('FONTSIZE', (0, 0), (-1, -1), 9),
+    ('ALIGN', (1, 0), (1, -1), 'RIGHT'),
+    ('BOTTOMPADDING', (0, 0), (-1, -1), 2),
+    ('TOPPADDING', (0, 0), (-1, -1), 2),
+    ('LINEBELOW', (0, 0), (-1, -1), 0.25, colors.lightgrey),
+])
+
+
+class RenderedChunk(NamedTuple):
+    """A rendered run of rooms: PDF bytes, page count and each room's first page (1-based)"""
+    pdf: bytes
+    pages: int
+    room_pages: Tuple[Tuple[str, int], ...]
+
+
+class SectionDocTemplate(SimpleDocTemplate):
+    """SimpleDocTemplate recording the page each room heading lands on"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.room_pages = []
+
+    def afterFlowable(self, flowable):
+        room_name = getattr(flowable, 'room_name', None)
+        if room_name is not None:
+            self.room_pages.append((room_name, self.page))
+
+
+def project_story(project: ReportProject) -> list:
+    """Title and project information table"""
+    project_info = [
+        ['Project:', project.project_name],
+        ['File:', project.filename],
+        ['Date:', project.uploaded_at.strftime('%Y-%m-%d %H:%M')],
+        ['User:', project.user_name],
+    ]
+    info_table = Table(project_info, colWidths=[2*inch, 4*inch])
+    info_table.setStyle(INFO_TABLE_STYLE)
+    return [
+        Paragraph("AutoLight Analyser Report", TITLE_STYLE),
+        Spacer(1, 0.3 * inch),
+        info_table,
+        Spacer(1, 0.5 * inch),
+    ]
+
+
+def section_heading() -> list:
+    """Heading of the room-by-room section"""
+    return [Paragraph("Lighting Analysis by Room", STYLES['Heading2']), Spacer(1, 0.2 * inch)]
+
+
+def room_story(room: ReportRoom) -> list:
+    """Heading, metrics table and fixture table of one room"""
+    heading = Paragraph(f"<b>{room.name}</b>", STYLES['Heading3'])
+    heading.room_name = room.name
+
+    room_data = [
+        ['Area:', f"{room.area:.2f} m²"],
+        ['Height:', f"{room.height:.2f} m"],
+        ['Required Lux:', f"{room.required_lux:.0f} lux"],
+        ['Current Lux:', f"{room.current_lux:.0f} lux"],
+        ['Status:', 'Adequate' if room.is_adequately_lit else 'Insufficient'],
+    ]
+    room_table = Table(room_data, colWidths=[2*inch, 3*inch])
+    room_table.setStyle(ROOM_TABLE_STYLE)
+    story = [heading, room_table, Spacer(1, 0.2 * inch)]
+
+    if room.fixtures:
+        fixture_data = [['Fixture', 'Quantity', 'Lumens/Unit', 'Total Lumens', 'Unit Cost', 'Total Cost']]
+        for fixture in room.fixtures:
+            fixture_data.append([
+                fixture.symbol_name,
+                str(fixture.quantity),
+                str(fixture.lumens),
+                str(fixture.total_lumens),
+                f"₹{fixture.unit_cost:.2f}",
+                f"₹{fixture.total_cost:.2f}",
+            ])
+        fixture_table = Table(fixture_data, colWidths=[1.8*inch, 0.8*inch, 0.9*inch, 1*inch, 0.8*inch, 0.9*inch])
+        fixture_table.setStyle(FIXTURE_TABLE_STYLE)
+        story.append(fixture_table)
+    else:
+        story.append(Paragraph("<i>No fixtures installed in this room</i>", STYLES['Italic']))
+
+    story.append(Spacer(1, 0.3 * inch))
+    return story
+
+
+def summary_story(snapshot: ReportSnapshot) -> list:
+    """Project summary table"""
+    summary_data = [
+        ['Total Rooms:', str(snapshot.total_rooms)],
+        ['Total Fixtures:', str(snapshot.total_fixtures)],
+        ['Total Project Cost:', f"₹{snapshot.total_cost:.2f}"],
+    ]
+    summary_table = Table(summary_data, colWidths=[3*inch, 3*inch])
+    summary_table.setStyle(SUMMARY_TABLE_STYLE)
+    return [Paragraph("Project Summary", STYLES['Heading2']), Spacer(1, 0.2 * inch), summary_table]
+
+
+def contents_story(entries: Sequence[Tuple[str, str]]) -> list:
+    """Table of contents from (title, page label) pairs"""
+    table = Table([list(entry) for entry in entries], colWidths=[5*inch, 1*inch])
+    table.setStyle(CONTENTS_TABLE_STYLE)
+    return [Paragraph("Contents", STYLES['Heading2']), Spacer(1, 0.2 * inch), table]
+
+
+def render_story(story: list) -> Tuple[bytes, int, List[Tuple[str, int]]]:
+    """
+    Render flowables to PDF bytes
+
+    Returns:
+        Tuple of (PDF bytes, page count, (room name, page) pairs)
+    """
+    buffer = io.BytesIO()
+    doc = SectionDocTemplate(buffer, pagesize=A4)
+    doc.build(story)
+    return buffer.getvalue(), doc.page, doc.room_pages
+
+
+def render_single(snapshot: ReportSnapshot, file_path: str):
+    """Render the whole report with one ``doc.build`` in this process"""
+    story = project_story(snapshot.project) + section_heading()
+    for room in snapshot.rooms:
+        story += room_story(room)
+    story += [PageBreak()] + summary_story(snapshot)
+    SimpleDocTemplate(file_path, pagesize=A4).build(story)
+
+
+def render_room_chunk(rooms: Sequence[ReportRoom], first: bool) -> RenderedChunk:
+    """Render a run of rooms (the first chunk opens with the section heading); runs in a worker"""
+    story = section_heading() if first else []
+    for room in rooms:
+        story += room_story(room)
+    pdf, pages, room_pages = render_story(story)
+    return RenderedChunk(pdf, pages, tuple(room_pages))
+
+
+def front_matter(project: ReportProject, entries: Sequence[Tuple[str, int]], offset: int) -> Tuple[bytes, int]:
+    """Title pages with the table of contents, page numbers shifted by ``offset``"""
+    labels = [(title, str(page + offset)) for title, page in entries]
+    pdf, pages, _ = render_story(project_story(project) + contents_story(labels))
+    return pdf, pages
+
+
+def page_number_overlay(total: int) -> bytes:
+    """One page per report page carrying only its "Page n of N" footer"""
+    buffer = io.BytesIO()
+    overlay = canvas.Canvas(buffer, pagesize=A4)
+    width, _ = A4
+    for number in range(1, total + 1):
+        overlay.setFont('Helvetica', 8)
+        overlay.drawCentredString(width / 2, 0.5 * inch, f"Page {number} of {total}")
+        overlay.showPage()
+    overlay.save()
+    return buffer.getvalue()
+
+
+def parallel_available() -> bool:
+    """pypdf is installed and this process may start children (not a daemonic pool worker)"""
+    return PdfWriter is not None and not multiprocessing.current_process().daemon
+
+
+def render_parallel(snapshot: ReportSnapshot, file_path: str, chunk_rooms: int = CHUNK_ROOMS,
+                    workers: Optional[int] = DEFAULT_WORKERS):
+    """
+    Render room chunks in a process pool and merge them into one PDF
+
+    Workers are spawned (safe from threaded web and report workers) and
+    set up Django before unpickling records. The contents is rendered
+    twice: once to learn how many pages it takes, then with final numbers.
+
+    Args:
+        snapshot: ReportSnapshot to render
+        file_path: Destination path
+        chunk_rooms: Rooms per worker task
+        workers: Pool size (default: CPU count)
+    """
+    import django
+
+    rooms = snapshot.rooms
+    chunks = [rooms[start:start + chunk_rooms] for start in range(0, len(rooms), chunk_rooms)]
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=django.setup) as pool:
+        rendered = list(pool.map(render_room_chunk, chunks, [index == 0 for index in range(len(chunks))]))
+
+    # Room pages relative to the first room page
+    entries, offset = [], 0
+    for chunk in rendered:
+        entries += [(name, page + offset) for name, page in chunk.room_pages]
+        offset += chunk.pages
+    summary_pdf, summary_pages, _ = render_story(summary_story(snapshot))
+    entries.append(("Project Summary", offset + 1))
+
+    _, front_pages = front_matter(snapshot.project, entries, 0)
+    front_pdf, final_front_pages = front_matter(snapshot.project, entries, front_pages)
+    if final_front_pages != front_pages:
+        front_pdf, front_pages = front_matter(snapshot.project, entries, final_front_pages)
+
+    writer = PdfWriter()
+    for part in [front_pdf] + [chunk.pdf for chunk in rendered] + [summary_pdf]:
+        writer.append(PdfReader(io.BytesIO(part)))
+
+    total = len(writer.pages)
+    overlay = PdfReader(io.BytesIO(page_number_overlay(total)))
+    for page, stamp in zip(writer.pages, overlay.pages):
+        page.merge_page(stamp)
+
+    # Bookmarks mirror the contents
+    section = writer.add_outline_item("Lighting Analysis by Room", front_pages)
+    for title, page in entries[:-1]:
+        writer.add_outline_item(title, front_pages + page - 1, parent=section)
+    writer.add_outline_item("Project Summary", front_pages + entries[-1][1] - 1)
+
+    with open(file_path, 'wb') as output:
+        writer.write(output)
@@ -0,0 +1,239 @@
+"""
+Point-by-point work-plane illuminance over room outlines
+"""
+import math
+from typing import Dict, Iterable, List, NamedTuple, Optional
+
+import numpy as np
+
+from .models import CADFile, Fixture, Room
+from .spatial import points_in_polygon
+from .utilization import WORK_PLANE_HEIGHT
+
+# Grid spacing (m), widened for large rooms to stay within MAX_GRID_POINTS
+DEFAULT_SPACING = 0.5
+MAX_GRID_POINTS = 100_000
+
+# Largest grid point × luminaire block evaluated at once
+MAX_CELLS = 4_000_000
+
+# Narrowest beam modelled; keeps the cone intensity finite
+MIN_BEAM_ANGLE = 1.0
+
+
+class Luminaires(NamedTuple):
+    """Luminaire columns in meters: one row per installed unit"""
+    x: np.ndarray
+    y: np.ndarray
+    lumens: np.ndarray
+    beam_angle: np.ndarray
+
+
+class IlluminanceGrid(NamedTuple):
+    """Work-plane grid points (m) and horizontal illuminance (lux) at each"""
+    x: np.ndarray
+    y: np.ndarray
+    lux: np.ndarray
+    spacing: float
+
+    def summary(self) -> Dict:
+        """Emin, Eavg, Emax and uniformity (Emin / Eavg)"""
+        if not len(self.lux):
+            return {'points': 0, 'spacing': self.spacing, 'min_lux': 0.0, 'avg_lux': 0.0,
+                    'max_lux': 0.0, 'uniformity': 0.0}
+        minimum, average, maximum = float(self.lux.min()), float(self.lux.mean()), float(self.lux.max())
+        return {
+            'points': len(self.lux),
+            'spacing': round(self.spacing, 3),
+            'min_lux': round(minimum, 2),
+            'avg_lux': round(average, 2),
+            'max_lux': round(maximum, 2),
+            'uniformity': round(minimum / average, 3) if average > 0 else 0.0,
+        }
+
+
+def luminaires(fixtures: Iterable[Fixture], unit_scale: float) -> Luminaires:
+    """Expand fixture rows into one entry per insertion point, in meters"""
+    x, y, lumens, beam = [], [], [], []
+    for fixture in fixtures:
+        positions = fixture.positions * unit_scale
+        x.append(positions[:, 0])
+        y.append(positions[:, 1])
+        lumens.append(np.full(len(positions), float(fixture.lighting_catalog.lumens)))
+        beam.append(np.full(len(positions), float(fixture.lighting_catalog.beam_angle)))
+    if not x:
+        empty = np.zeros(0)
+        return Luminaires(empty, empty, empty, empty)
+    return Luminaires(np.concatenate(x), np.concatenate(y), np.concatenate(lumens), np.concatenate(beam))
+
+
+def grid_points(polygon: np.ndarray, spacing: float = DEFAULT_SPACING,
+                max_points: int = MAX_GRID_POINTS) -> IlluminanceGrid:
+    """
+    Cell-centred grid over a polygon's bounding box, clipped to the polygon
+
+    Args:
+        polygon: (n, 2) outline vertices in meters
+        spacing: Requested spacing in meters
+        max_points: Widen the spacing until the box holds at most this many points
+
+    Returns:
+        IlluminanceGrid with zero lux
+    """
+    low, high = polygon.min(axis=0), polygon.max(axis=0)
+    width, depth = np.maximum(high - low, 1e-9)
+    spacing = max(spacing, math.sqrt(width * depth / max_points))
+    xs = low[0] + (np.arange(max(1, int(width / spacing))) + 0.5) * spacing
+    ys = low[1] + (np.arange(max(1, int(depth / spacing))) + 0.5) * spacing
+    x, y = (axis.ravel() for axis in np.meshgrid(xs, ys))
+
+    inside = points_in_polygon(x, y, polygon)
+    return IlluminanceGrid(x[inside], y[inside], np.zeros(int(inside.sum())), spacing)
+
+
+def illuminance(x: np.ndarray, y: np.ndarray, lights: Luminaires, mounting_height: float) -> np.ndarray:
+    """
+    Direct horizontal illuminance at work-plane points
+
+    Each luminaire is a point source spreading its lumens evenly over a cone
+    of its beam angle: I = Φ / (2π (1 - cos(β/2))) within the cone, zero
+    outside. At horizontal distance r and height h, E = I cos θ / d² with
+    d² = r² + h² and cos θ = h / d.
+
+    A cone lights a disc of radius h·tan(β/2) on the work plane, so points
+    are grouped into square tiles of that radius and each tile is only
+    evaluated against luminaires within reach of it. Tiles are processed in
+    blocks so memory stays bounded for any room size.
+
+    Args:
+        x: Point x coordinates (m)
+        y: Point y coordinates (m)
+        lights: Luminaires in meters
+        mounting_height: Luminaire height above the work plane (m)
+
+    Returns:
+        Illuminance in lux per point
+    """
+    lux = np.zeros(len(x))
+    if not len(lights.x) or not len(x):
+        return lux
+
+    half_angle = np.radians(np.clip(lights.beam_angle, MIN_BEAM_ANGLE, 360.0) / 2)
+    cos_cutoff = np.cos(np.minimum(half_angle, np.pi / 2))
+    # Wide beams (≥ 180°) spread over the lower hemisphere
+    intensity = lights.lumens / (2 * np.pi * (1 - cos_cutoff))
+    height_squared = mounting_height ** 2
+
+    # Tiles as wide as the longest reach; hemispherical beams reach everywhere
+    span = max(float(np.ptp(x)), float(np.ptp(y)), 1e-9)
+    if half_angle.max() < np.pi / 2:
+        reach = float(mounting_height * np.tan(half_angle.max()))
+    else:
+        reach = span
+    tile = max(reach, span / 1024, 1e-9)
+
+    light_order = np.argsort(lights.x, kind='stable')
+    light_x, light_y = lights.x[light_order], lights.y[light_order]
+    intensity, cos_cutoff = intensity[light_order], cos_cutoff[light_order]
+
+    tile_x = np.floor((x - x.min()) / tile).astype(np.int64)
+    tile_y = np.floor((y - y.min()) / tile).astype(np.int64)
+    keys = tile_y * (tile_x.max() + 1) + tile_x
+    point_order = np.argsort(keys, kind='stable')
+    _, starts = np.unique(keys[point_order], return_index=True)
+    ends = np.append(starts[1:], len(point_order))
+
+    for start, end in zip(starts.tolist(), ends.tolist()):
+        points = point_order[start:end]
+        px, py = x[points], y[points]
+
+        # Luminaires within reach of the tile's bounding box
+        low = np.searchsorted(light_x, px.min() - reach, side='left')
+        high = np.searchsorted(light_x, px.max() + reach, side='right')
+        nearby = np.flatnonzero(
+            (light_y[low:high] >= py.min() - reach) & (light_y[low:high] <= py.max() + reach)
+        ) + low
+        if not len(nearby):
+            continue
+        lx, ly = light_x[nearby], light_y[nearby]
+        tile_intensity, tile_cutoff = intensity[nearby], cos_cutoff[nearby]
+
+        chunk = max(1, MAX_CELLS // len(nearby))
+        for offset in range(0, len(points), chunk):
+            rows = slice(offset, offset + chunk)
+            dx = px[rows, None] - lx[None, :]
+            dy = py[rows, None] - ly[None, :]
+            distance_squared = dx * dx + dy * dy + height_squared
+            cosine = mounting_height / np.sqrt(distance_squared)
+            contribution = np.where(cosine >= tile_cutoff, tile_intensity * cosine / distance_squared, 0.0)
+            lux[points[rows]] = contribution.sum(axis=1)
+    return lux
+
+
+def room_polygon(room: Room, lights: Luminaires, unit_scale: float) -> np.ndarray:
+    """
+    Room outline in meters
+
+    Rooms saved without an outline (the drawing's default area, or rooms
+    processed before outlines were recorded) use a square of the room's
+    area centred on its luminaires.
+    """
+    vertices = room.outline_vertices
+    if len(vertices) >= 3:
+        return vertices * unit_scale
+
+    side = math.sqrt(max(room.area, 0.0))
+    centre = np.array([lights.x.mean(), lights.y.mean()]) if len(lights.x) else np.zeros(2)
+    half = side / 2
+    return centre + np.array([[-half, -half], [half, -half], [half, half], [-half, half]])
+
+
+def room_illuminance(room: Room, fixtures: Iterable[Fixture], unit_scale: float,
+                     spacing: float = DEFAULT_SPACING) -> IlluminanceGrid:
+    """
+    Illuminance grid over one room
+
+    Args:
+        room: Room (its ``height`` is the mounting height)
+        fixtures: The room's fixtures, with ``lighting_catalog`` loaded
+        unit_scale: Meters per drawing unit of the CAD file
+        spacing: Grid spacing in meters
+
+    Returns:
+        IlluminanceGrid of the room
+    """
+    lights = luminaires(fixtures, unit_scale)
+    grid = grid_points(room_polygon(room, lights, unit_scale), spacing)
+    mounting_height = max(room.height - WORK_PLANE_HEIGHT, 0.1)
+    return grid._replace(lux=illuminance(grid.x, grid.y, lights, mounting_height))
+
+
+def project_photometry(cad_file: CADFile, spacing: float = DEFAULT_SPACING,
+                       room_ids: Optional[List[int]] = None) -> List[Dict]:
+    """
+    Point-by-point illuminance statistics for every room of a project
+
+    Args:
+        cad_file: CADFile to evaluate
+        spacing: Grid spacing in meters
+        room_ids: Limit to these rooms (default: all assigned rooms)
+
+    Returns:
+        One dict per room with 'room_id', 'name', 'required_lux' and the
+        grid summary ('points', 'spacing', 'min_lux', 'avg_lux', 'max_lux',
+        'uniformity')
+    """
+    rooms = cad_file.rooms.filter(is_unassigned=False).prefetch_related('fixtures__lighting_catalog')
+    if room_ids is not None:
+        rooms = rooms.filter(pk__in=room_ids)
+
+    results = []
+    for room in rooms:
+        grid = room_illuminance(room, room.fixtures.all(), cad_file.unit_scale, spacing)
+        results.append({
+            'room_id': room.id,
+            'name': room.name,
+            'required_lux': room.required_lux,
+            **grid.summary(),
+        })
+    return results
@@ -0,0 +1,319 @@
+"""
+Project-wide fixture recommendations and the stored recommendation table
+"""
+import threading
+from typing import Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+import numpy as np
+from django.db import transaction
+from django.utils import timezone
+
+from .catalog_index import (
+    BUDGET_BANDS,
+    MAX_LUMENS_FACTOR,
+    MIN_LUMENS_FACTOR,
+    CatalogIndex,
+    get_catalog_index,
+    invalidate_catalog_index,
+    to_paise,
+)
+from .models import CADFile, Fixture, FixtureRecommendation, LightingCatalog
+
+BAND_LIMIT = 15
+TOP_LIMIT = 20
+
+# Lowest and highest cost multiples any budget band accepts (30-150%)
+MIN_COST_FACTOR = min(low for (low, _), _, _ in BUDGET_BANDS.values())
+MAX_COST_FACTOR = max(high for _, (high, _), _ in BUDGET_BANDS.values())
+
+# PendingCatalogChanges of the transaction open on each thread
+_pending = threading.local()
+
+
+class CatalogChange(NamedTuple):
+    """One catalog add, edit or delete as seen when it was saved"""
+    catalog_id: int
+    lumens: int
+    unit_cost: object
+    previous: Optional[Tuple]
+    deleted: bool
+    refresh: bool
+
+
+def project_recommendations(cad_file: CADFile, limit: int = BAND_LIMIT, top: int = TOP_LIMIT,
+                            index: Optional[CatalogIndex] = None) -> Dict[int, Dict[str, List[LightingCatalog]]]:
+    """
+    Budget-band and efficiency-ranked alternatives for every fixture in a project
+
+    Each distinct catalog item is computed once, however many rooms use it.
+
+    Args:
+        cad_file: CADFile to recommend alternatives for
+        limit: Maximum recommendations per budget band
+        top: Length of the efficiency-ranked list
+        index: CatalogIndex to query (default: the process-local index)
+
+    Returns:
+        Dictionary mapping catalog item ID to its 'below', 'within', 'above'
+        and 'all_recommendations' lists
+    """
+    if index is None:
+        index = get_catalog_index()
+
+    # order_by() drops Fixture's default ordering, which would defeat DISTINCT
+    catalog_ids = Fixture.objects.filter(room__cad_file=cad_file).order_by().values_list(
+        'lighting_catalog_id', flat=True
+    ).distinct()
+    catalog_items = [index.by_id[pk] for pk in catalog_ids if pk in index.by_id]
+
+    results = index.recommend_many(
+        [item.unit_cost for item in catalog_items], catalog_items, limit=limit, top=top
+    )
+    return {item.id: result for item, result in zip(catalog_items, results)}
+
+
+def refresh_recommendations(catalog_ids: Optional[Iterable[int]] = None,
+                            index: Optional[CatalogIndex] = None, batch_size: int = 1000) -> int:
+    """
+    Recompute stored FixtureRecommendation rows
+
+    Args:
+        catalog_ids: Catalog items to refresh (default: the whole catalog)
+        index: CatalogIndex to query (default: the process-local index)
+        batch_size: Rows per bulk_create batch
+
+    Returns:
+        Number of catalog items refreshed
+    """
+    if index is None:
+        index = get_catalog_index()
+
+    if catalog_ids is None:
+        catalog_items = index.items
+    else:
+        catalog_items = [index.by_id[pk] for pk in set(catalog_ids) if pk in index.by_id]
+    item_ids = [item.id for item in catalog_items]
+
+    results = index.recommend_many(
+        [item.unit_cost for item in catalog_items], catalog_items, limit=BAND_LIMIT, top=TOP_LIMIT
+    )
+    rows = []
+    for item, result in zip(catalog_items, results):
+        for band in ('below', 'within', 'above', 'top'):
+            key = 'all_recommendations' if band == 'top' else band
+            rows.extend(
+                FixtureRecommendation(catalog_item_id=item.id, recommended_id=rec.id, band=band, priority=rank)
+                for rank, rec in enumerate(result[key], start=1)
+            )
+
+    with transaction.atomic():
+        stale = FixtureRecommendation.objects.all()
+        refreshed = LightingCatalog.objects.all()
+        if catalog_ids is not None:
+            stale = stale.filter(catalog_item_id__in=item_ids)
+            refreshed = refreshed.filter(pk__in=item_ids)
+        stale.delete()
+        FixtureRecommendation.objects.bulk_create(rows, batch_size=batch_size)
+        refreshed.update(recommendations_updated_at=timezone.now())
+
+    return len(catalog_items)
+
+
+def overlapping_catalog_ids(states: Iterable[Tuple[int, object]], index: Optional[CatalogIndex] = None) -> Set[int]:
+    """
+    Catalog items whose recommendation windows contain any of the given specs
+
+    An item's stored alternatives can only change when a catalog entry
+    enters, leaves or moves within its lumen window (±35%) and cost range
+    (30-150%), so only these items need refreshing after a catalog change.
+
+    Args:
+        states: (lumens, unit_cost) pairs, e.g. a changed item's old and new values
+        index: CatalogIndex to query (default: the process-local index)
+
+    Returns:
+        Set of catalog item IDs
+    """
+    if index is None:
+        index = get_catalog_index()
+
+    # Cost limits compared exactly in paise: cost * den >= num * item cost
+    min_num, min_den = MIN_COST_FACTOR.as_integer_ratio()
+    max_num, max_den = MAX_COST_FACTOR.as_integer_ratio()
+
+    affected = np.zeros(len(index), dtype=bool)
+    for state_lumens, state_cost in states:
+        cost = int(to_paise(state_cost))
+        affected |= (
+            (state_lumens >= index.lumens * MIN_LUMENS_FACTOR)
+            & (state_lumens <= index.lumens * MAX_LUMENS_FACTOR)
+            & (cost * min_den >= index.cost * min_num)
+            & (cost * max_den <= index.cost * max_num)
+        )
+    return set(index.ids[affected].tolist())
+
+
+def refresh_for_catalog_change(instance: LightingCatalog, previous: Optional[Tuple] = None,
+                               deleted: bool = False) -> int:
+    """
+    Refresh stored alternatives affected by one catalog add, edit or delete
+
+    Args:
+        instance: The changed LightingCatalog entry
+        previous: Its (lumens, unit_cost) before an edit, if any
+        deleted: True if the entry was removed
+
+    Returns:
+        Number of catalog items refreshed
+    """
+    return refresh_for_catalog_changes([
+        CatalogChange(instance.pk, instance.lumens, instance.unit_cost, previous, deleted, True)
+    ])
+
+
+def refresh_for_catalog_changes(changes: Iterable[CatalogChange], index: Optional[CatalogIndex] = None) -> int:
+    """
+    Refresh stored alternatives affected by many catalog changes at once
+
+    Args:
+        changes: CatalogChange records, oldest first
+        index: CatalogIndex to query (default: the process-local index)
+
+    Returns:
+        Number of catalog items refreshed
+    """
+    changes = [change for change in changes if change.refresh]
+    if not changes:
+        return 0
+    if index is None:
+        index = get_catalog_index()
+
+    states = []
+    for change in changes:
+        states.append((change.lumens, change.unit_cost))
+        if change.previous is not None:
+            states.append(change.previous[:2])
+
+    catalog_ids = overlapping_catalog_ids(states, index)
+    for change in changes:
+        if change.deleted:
+            catalog_ids.discard(change.catalog_id)
+        else:
+            # The item's own windows move with its lumens and cost
+            catalog_ids.add(change.catalog_id)
+    return refresh_recommendations(catalog_ids, index)
+
+
+class PendingCatalogChanges:
+    """Catalog changes of one transaction (or savepoint), flushed by its single on-commit hook"""
+
+    def __init__(self, connection):
+        self.changes: List[CatalogChange] = []
+        self.connection = connection
+        self.savepoint_ids = self.current_savepoints()
+
+    def current_savepoints(self) -> set:
+        """Open savepoints (``atomic(savepoint=False)`` blocks add None)"""
+        return set(self.connection.savepoint_ids) - {None}
+
+    @property
+    def registered(self) -> bool:
+        """Whether the hook is still queued at the current savepoint (gone after a rollback)"""
+        return self.savepoint_ids == self.current_savepoints() and any(
+            entry[1] == self.flush for entry in self.connection.run_on_commit
+        )
+
+    def flush(self) -> int:
+        """
+        Publish the changes to every worker and refresh alternatives
+
+        Returns:
+            Number of catalog items refreshed
+        """
+        if getattr(_pending, 'changes', None) is self:
+            _pending.changes = None
+        if not self.changes:
+            return 0
+
+        invalidate_catalog_index()
+        return refresh_for_catalog_changes(self.changes)
+
+
+def pending_catalog_changes() -> Optional[PendingCatalogChanges]:
+    """The changes waiting for this thread's transaction to commit, if any"""
+    pending = getattr(_pending, 'changes', None)
+    return pending if pending is not None and pending.registered else None
+
+
+def schedule_catalog_refresh(instance: LightingCatalog, previous: Optional[Tuple] = None,
+                             deleted: bool = False, refresh: bool = True):
+    """
+    Queue a catalog change for one index reload and refresh after commit
+
+    The first change in a transaction (or savepoint) registers one on-commit
+    hook and later ones join its queue, so a bulk import in one transaction
+    reloads the index and refreshes alternatives once. Changes queued in a
+    transaction that rolls back lose their hook and are dropped with it.
+    Outside a transaction the hook runs at once.
+
+    Args:
+        instance: The changed LightingCatalog entry
+        previous: Its (lumens, unit_cost, wattage) before an edit, if any
+        deleted: True if the entry was removed
+        refresh: False when only descriptive fields changed; the index is
+            reloaded but stored alternatives are kept
+    """
+    change = CatalogChange(instance.pk, instance.lumens, instance.unit_cost, previous, deleted, refresh)
+    pending = pending_catalog_changes()
+    if pending is not None:
+        pending.changes.append(change)
+        return
+
+    pending = _pending.changes = PendingCatalogChanges(transaction.get_connection())
+    pending.changes.append(change)
+    transaction.on_commit(pending.flush)
+
+
+def stored_recommendations(catalog_items: Iterable[LightingCatalog]) -> Dict[int, Dict[str, List[LightingCatalog]]]:
+    """
+    Read stored alternatives for catalog items
+
+    Read-only: items never stored (e.g. rows added with ``bulk_create``)
+    are computed from the index for this call only; the
+    ``refresh_recommendations --missing`` command stores them.
+
+    Args:
+        catalog_items: LightingCatalog items (e.g. those used by a project)
+
+    Returns:
+        Dictionary mapping catalog item ID to its 'below', 'within', 'above'
+        and 'all_recommendations' lists, as ``project_recommendations``
+    """
+    index = get_catalog_index()
+    catalog_items = {item.id: item for item in catalog_items}
+    missing = [
+        index.by_id[pk] for pk, item in catalog_items.items()
+        if item.recommendations_updated_at is None and pk in index.by_id
+    ]
+
+    results = {
+        pk: {'below': [], 'within': [], 'above': [], 'all_recommendations': []}
+        for pk in catalog_items
+    }
+    if missing:
+        computed = index.recommend_many(
+            [item.unit_cost for item in missing], missing, limit=BAND_LIMIT, top=TOP_LIMIT
+        )
+        results.update((item.id, result) for item, result in zip(missing, computed))
+
+    # Read IDs only and resolve them against the in-memory catalog rather
+    # than building a model instance per row
+    stored_ids = [pk for pk, item in catalog_items.items() if item.recommendations_updated_at is not None]
+    rows = FixtureRecommendation.objects.filter(
+        catalog_item_id__in=stored_ids
+    ).order_by('catalog_item_id', 'band', 'priority').values_list('catalog_item_id', 'band', 'recommended_id')
+    for catalog_id, band, recommended_id in rows:
+        recommended = index.by_id.get(recommended_id)
+        if recommended is not None:
+            results[catalog_id]['all_recommendations' if band == 'top' else band].append(recommended)
+    return results
@@ -0,0 +1,212 @@
+"""
+Immutable report snapshots shared by the PDF, CSV and JSON renderers
+"""
+from collections import defaultdict
+from datetime import datetime
+from decimal import Decimal
+from itertools import islice
+from typing import Dict, Iterator, NamedTuple, Optional, Tuple
+
+from .models import CADFile, Fixture, Room
+
+# Rooms per fixture query when rooms are read in chunks
+DEFAULT_CHUNK_SIZE = 200
+
+ROOM_FIELDS = (
+    'id', 'name', 'room_type', 'area', 'height', 'required_lux', 'is_unassigned',
+    'live_total_lumens', 'live_fixture_count', 'live_total_cost', 'live_current_lux', 'live_is_adequately_lit',
+)
+
+FIXTURE_FIELDS = (
+    'room_id', 'lighting_catalog__symbol_name', 'lighting_catalog__model_number', 'quantity',
+    'lighting_catalog__lumens', 'lighting_catalog__wattage', 'lighting_catalog__unit_cost',
+)
+
+
+class ReportFixture(NamedTuple):
+    """One fixture row with its catalog values"""
+    symbol_name: str
+    model_number: str
+    quantity: int
+    lumens: int
+    wattage: float
+    unit_cost: Decimal
+
+    @property
+    def total_lumens(self) -> int:
+        return self.lumens * self.quantity
+
+    @property
+    def total_cost(self) -> Decimal:
+        return self.unit_cost * self.quantity
+
+
+class ReportRoom(NamedTuple):
+    """One room with metrics computed from its fixture rows"""
+    id: int
+    name: str
+    room_type: str
+    area: float
+    height: float
+    required_lux: float
+    is_unassigned: bool
+    total_lumens: int
+    fixture_count: int
+    total_cost: Decimal
+    current_lux: float
+    is_adequately_lit: bool
+    fixtures: Tuple[ReportFixture, ...]
+
+
+class ReportProject(NamedTuple):
+    """Project header of a report"""
+    cad_file_id: int
+    project_name: str
+    filename: str
+    uploaded_at: datetime
+    user_name: str
+    revision: int
+
+
+class ReportSnapshot(NamedTuple):
+    """Everything a report shows, read in a constant number of queries"""
+    project: ReportProject
+    rooms: Tuple[ReportRoom, ...]
+
+    @property
+    def total_rooms(self) -> int:
+        return len(self.rooms)
+
+    @property
+    def fixture_rows(self) -> int:
+        return sum(len(room.fixtures) for room in self.rooms)
+
+    @property
+    def total_fixtures(self) -> int:
+        return sum(room.fixture_count for room in self.rooms)
+
+    @property
+    def total_cost(self) -> Decimal:
+        return sum((room.total_cost for room in self.rooms), Decimal('0.00'))
+
+
+def report_project(cad_file: CADFile) -> ReportProject:
+    """Project header, reading the owner's name in one query"""
+    first_name, last_name, username = CADFile.objects.filter(pk=cad_file.pk).values_list(
+        'user__first_name', 'user__last_name', 'user__username'
+    ).get()
+    return ReportProject(
+        cad_file_id=cad_file.id,
+        project_name=cad_file.project_name,
+        filename=cad_file.filename,
+        uploaded_at=cad_file.uploaded_at,
+        user_name=f'{first_name} {last_name}'.strip() or username,
+        revision=cad_file.revision,
+    )
+
+
+def iter_report_rooms(cad_file: CADFile, chunk_size: Optional[int] = None) -> Iterator[ReportRoom]:
+    """
+    Rooms of a project by name with their fixture rows
+
+    Args:
+        cad_file: CADFile to read
+        chunk_size: Read rooms this many at a time with one fixture query
+            per chunk, so memory stays flat; None reads all rooms with one
+            room query and one fixture query
+
+    Yields:
+        ReportRoom records
+    """
+    # Meta.ordering is not applied to the aggregating query
+    rooms = Room.objects.filter(cad_file=cad_file).with_lighting_metrics().order_by('name', 'id')
+    rooms = rooms.values_list(*ROOM_FIELDS)
+    fixtures = Fixture.objects.order_by('room_id', 'lighting_catalog__symbol_name', 'id').values_list(*FIXTURE_FIELDS)
+
+    if chunk_size is None:
+        batches = [(list(rooms), fixtures.filter(room__cad_file=cad_file))]
+    else:
+        room_rows = rooms.iterator(chunk_size=chunk_size)
+        batches = (
+            (batch, fixtures.filter(room_id__in=[row[0] for row in batch]))
+            for batch in iter(lambda: list(islice(room_rows, chunk_size)), [])
+        )
+
+    for batch, fixture_rows in batches:
+        by_room: Dict[int, list] = defaultdict(list)
+        for room_id, *values in fixture_rows:
+            by_room[room_id].append(ReportFixture(*values))
+        for *values, current_lux, is_adequately_lit in batch:
+            yield ReportRoom(
+                *values, round(current_lux, 2), bool(is_adequately_lit), tuple(by_room.get(values[0], ())),
+            )
+
+
+def build_report_snapshot(cad_file: CADFile) -> ReportSnapshot:
+    """
+    Snapshot of a project for reports in three queries regardless of size
+
+    Args:
+        cad_file: CADFile to snapshot
+
+    Returns:
+        ReportSnapshot
+    """
+    return ReportSnapshot(report_project(cad_file), tuple(iter_report_rooms(cad_file)))
+
+
+def snapshot_as_dict(snapshot: ReportSnapshot) -> Dict:
+    """
+    JSON-ready form of a snapshot
+
+    Returns:
+        Dictionary with the 'project' header, 'rooms' (each with its
+        'fixtures') and the 'summary' totals; costs in INR as floats
+    """
+    project = snapshot.project
+    return {
+        'project': {
+            'id': project.cad_file_id,
+            'name': project.project_name,
+            'filename': project.filename,
+            'uploaded_at': project.uploaded_at.isoformat(),
+            'user': project.user_name,
+            'revision': project.revision,
+        },
+        'rooms': [
+            {
+                'id': room.id,
+                'name': room.name,
+                'room_type': room.room_type,
+                'area': round(room.area, 2),
+                'height': round(room.height, 2),
+                'required_lux': room.required_lux,
+                'current_lux': room.current_lux,
+                'is_adequately_lit': room.is_adequately_lit,
+                'is_unassigned': room.is_unassigned,
+                'total_lumens': room.total_lumens,
+                'fixture_count': room.fixture_count,
+                'total_cost': float(room.total_cost),
+                'fixtures': [
+                    {
+                        'symbol_name': fixture.symbol_name,
+                        'model_number': fixture.model_number,
+                        'quantity': fixture.quantity,
+                        'lumens': fixture.lumens,
+                        'wattage': fixture.wattage,
+                        'unit_cost': float(fixture.unit_cost),
+                        'total_lumens': fixture.total_lumens,
+                        'total_cost': float(fixture.total_cost),
+                    }
+                    for fixture in room.fixtures
+                ],
+            }
+            for room in snapshot.rooms
+        ],
+        'summary': {
+            'total_rooms': snapshot.total_rooms,
+            'fixture_rows': snapshot.fixture_rows,
+            'total_fixtures': snapshot.total_fixtures,
+            'total_cost': float(snapshot.total_cost),
+        },
+    }
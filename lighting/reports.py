@@ -0,0 +1,171 @@
+"""
+Report files cached per project revision and built off the request thread
+"""
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from typing import Optional
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from .models import CADFile, Report
+from .utils import generate_csv_report, generate_pdf_report
+
+logger = logging.getLogger(__name__)
+
+REPORT_GENERATORS = {
+    'pdf': generate_pdf_report,
+    'csv': generate_csv_report,
+}
+
+CONTENT_TYPES = {
+    'pdf': 'application/pdf',
+    'csv': 'text/csv',
+}
+
+# 'thread' (in-process pool), 'celery' (worker via the configured broker)
+# or 'sync' (build inside the request; tests and debugging)
+DEFAULT_BACKEND = 'thread'
+DEFAULT_WORKERS = 2
+
+# A pending report older than this is assumed lost (worker restarted) and requeued
+STALE_AFTER = timedelta(minutes=10)
+
+_executor = None
+
+
+def report_backend() -> str:
+    """Configured report backend (``settings.REPORT_BACKEND``)"""
+    return getattr(settings, 'REPORT_BACKEND', DEFAULT_BACKEND)
+
+
+def report_file_exists(report: Report) -> bool:
+    """Whether a report's file is still on disk"""
+    return bool(report.file_path) and os.path.exists(report.file_path.path)
+
+
+def cached_report(cad_file: CADFile, report_type: str) -> Optional[Report]:
+    """
+    Newest report of the project's current revision, ready or in progress
+
+    Ready reports whose file was removed and pending reports older than
+    ``STALE_AFTER`` are skipped.
+
+    Returns:
+        Report or None
+    """
+    reports = Report.objects.filter(
+        cad_file=cad_file, report_type=report_type, revision=cad_file.revision, status__in=['pending', 'ready']
+    )
+    for report in reports:
+        if report.status == 'ready' and report_file_exists(report):
+            return report
+        if report.status == 'pending' and report.generated_at >= timezone.now() - STALE_AFTER:
+            return report
+    return None
+
+
+def request_report(cad_file: CADFile, report_type: str) -> Report:
+    """
+    Reuse the project's report for its current revision or queue a new one
+
+    Args:
+        cad_file: CADFile to report on
+        report_type: 'pdf' or 'csv'
+
+    Returns:
+        Ready or pending Report (ready already with the 'sync' backend)
+    """
+    if report_type not in REPORT_GENERATORS:
+        raise ValueError(f"Invalid report type: {report_type}")
+
+    report = cached_report(cad_file, report_type)
+    if report is not None:
+        return report
+
+    report = Report.objects.create(cad_file=cad_file, report_type=report_type, revision=cad_file.revision)
+    backend = report_backend()
+    if backend == 'sync':
+        build_report(report.id)
+        report.refresh_from_db()
+    else:
+        # Workers must see the committed row
+        transaction.on_commit(lambda: dispatch_report(report.id, backend))
+    return report
+
+
+def dispatch_report(report_id: int, backend: str):
+    """Hand a pending report to the configured backend"""
+    global _executor
+
+    if backend == 'celery':
+        # Loading the project's Celery app points shared tasks at its broker
+        from autolight_project.celery import app  # noqa: F401
+        from .tasks import generate_report_task
+        generate_report_task.delay(report_id)
+        return
+
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=getattr(settings, 'REPORT_WORKERS', DEFAULT_WORKERS), thread_name_prefix='report'
+        )
+    _executor.submit(run_in_thread, report_id)
+
+
+def run_in_thread(report_id: int):
+    """Build a report on a pool thread with its own database connection"""
+    close_old_connections()
+    try:
+        build_report(report_id)
+    finally:
+        close_old_connections()
+
+
+def build_report(report_id: int) -> bool:
+    """
+    Render a pending report and mark it ready or failed
+
+    The report is stamped with the revision it was built from, which may
+    be newer than the one it was queued under. Reports of older revisions
+    of the same project and type are deleted with their files once the new
+    one is ready.
+
+    Args:
+        report_id: Report primary key
+
+    Returns:
+        bool: True if the report is ready
+    """
+    report = Report.objects.filter(pk=report_id, status='pending').first()
+    if report is None:
+        return False
+
+    try:
+        # The revision is read first, in the transaction the report's rows
+        # are read in, so the report never claims a revision newer than the
+        # data it shows (changes since it was queued get a newer stamp)
+        with transaction.atomic():
+            cad_file = CADFile.objects.get(pk=report.cad_file_id)
+            file_path = REPORT_GENERATORS[report.report_type](cad_file)
+    except Exception as e:
+        logger.exception("Report %s failed", report_id)
+        Report.objects.filter(pk=report_id).update(status='failed', error_message=str(e))
+        return False
+
+    report.file_path.name = os.path.relpath(file_path, settings.MEDIA_ROOT)
+    report.revision = cad_file.revision
+    report.status = 'ready'
+    report.save(update_fields=['file_path', 'revision', 'status'])
+
+    superseded = Report.objects.filter(
+        cad_file_id=report.cad_file_id, report_type=report.report_type, generated_at__lt=report.generated_at,
+    ).exclude(revision=report.revision).exclude(status='pending')
+    for old in superseded:
+        # Timestamped names repeat when a project is regenerated within a second
+        if report_file_exists(old) and old.file_path.path != report.file_path.path:
+            os.remove(old.file_path.path)
+    superseded.delete()
+    return True
@@ -0,0 +1,167 @@
+"""
+Signal handlers keeping materialized lighting aggregates up to date
+"""
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import aggregates, recommendations
+from .catalog_index import invalidate_catalog_index
+from .models import CADFile, Fixture, LightingCatalog, Room
+
+
+@receiver(post_save, sender=Fixture)
+def fixture_saved(sender, instance, created, raw=False, **kwargs):
+    """Apply the fixture's change to its room (and old room if it moved)"""
+    if raw:
+        return
+
+    loaded = getattr(instance, '_loaded_values', None)
+    pending = aggregates.pending_aggregates()
+
+    if pending is not None:
+        # Batched: the rooms are rebuilt once when the batch ends
+        pending.room_ids.update({instance.room_id, (loaded or {}).get('room_id', instance.room_id)})
+        changed_rooms = set()
+    elif created or not loaded:
+        aggregates.apply_room_delta(instance.room_id, *aggregates.fixture_contribution(instance))
+        changed_rooms = {instance.room_id}
+    else:
+        old_catalog = instance.lighting_catalog
+        if loaded.get('lighting_catalog_id') != instance.lighting_catalog_id:
+            old_catalog = LightingCatalog.objects.get(pk=loaded['lighting_catalog_id'])
+        old_quantity = loaded.get('quantity', instance.quantity)
+        old_room_id = loaded.get('room_id', instance.room_id)
+
+        aggregates.apply_room_delta(
+            old_room_id,
+            -old_catalog.lumens * old_quantity,
+            -old_quantity,
+            -old_catalog.unit_cost * old_quantity,
+        )
+        aggregates.apply_room_delta(instance.room_id, *aggregates.fixture_contribution(instance))
+        changed_rooms = {old_room_id, instance.room_id}
+
+    # The saved state is the new baseline for the next delta
+    instance._loaded_values = {
+        'room_id': instance.room_id,
+        'lighting_catalog_id': instance.lighting_catalog_id,
+        'quantity': instance.quantity,
+    }
+
+    if changed_rooms:
+        for cad_file_id in Room.objects.filter(pk__in=changed_rooms).order_by().values_list('cad_file_id', flat=True).distinct():
+            aggregates.refresh_cad_file(cad_file_id)
+
+
+@receiver(post_delete, sender=Fixture)
+def fixture_deleted(sender, instance, **kwargs):
+    """Remove the deleted fixture's contribution from its room"""
+    loaded = getattr(instance, '_loaded_values', None) or {}
+    room_id = loaded.get('room_id', instance.room_id)
+
+    pending = aggregates.pending_aggregates()
+    if pending is not None:
+        pending.room_ids.add(room_id)
+        return
+
+    catalog = instance.lighting_catalog
+    if loaded.get('lighting_catalog_id', instance.lighting_catalog_id) != instance.lighting_catalog_id:
+        catalog = LightingCatalog.objects.filter(pk=loaded['lighting_catalog_id']).first() or catalog
+    quantity = loaded.get('quantity', instance.quantity)
+
+    aggregates.apply_room_delta(room_id, -catalog.lumens * quantity, -quantity, -catalog.unit_cost * quantity)
+
+    cad_file_id = Room.objects.filter(pk=room_id).values_list('cad_file_id', flat=True).first()
+    if cad_file_id is not None:
+        aggregates.refresh_cad_file(cad_file_id)
+
+
+@receiver(post_save, sender=Room)
+def room_saved(sender, instance, created, raw=False, **kwargs):
+    """New rooms and area or bucket changes alter lux; refresh the room and its project"""
+    if raw:
+        return
+
+    pending = aggregates.pending_aggregates()
+    if pending is not None:
+        pending.room_ids.add(instance.pk)
+        return
+
+    if not created:
+        aggregates.refresh_room_lux(instance.pk)
+    aggregates.refresh_cad_file(instance.cad_file_id)
+
+
+@receiver(post_delete, sender=Room)
+def room_deleted(sender, instance, **kwargs):
+    """Drop a deleted room from its project's totals"""
+    pending = aggregates.pending_aggregates()
+    if pending is not None:
+        # Fixtures cascade-deleted with the room recorded it; it is gone now
+        pending.room_ids.discard(instance.pk)
+        pending.cad_file_ids.add(instance.cad_file_id)
+        return
+
+    aggregates.refresh_cad_file(instance.cad_file_id)
+
+
+@receiver(post_delete, sender=CADFile)
+def cad_file_deleted(sender, instance, **kwargs):
+    """A deleted project needs no totals"""
+    pending = aggregates.pending_aggregates()
+    if pending is not None:
+        pending.cad_file_ids.discard(instance.pk)
+
+
+@receiver(pre_save, sender=LightingCatalog)
+def catalog_saving(sender, instance, raw=False, **kwargs):
+    """Remember lumens/cost/wattage before an edit"""
+    if raw or instance.pk is None:
+        instance._previous_values = None
+        return
+    instance._previous_values = (
+        LightingCatalog.objects.filter(pk=instance.pk).values_list('lumens', 'unit_cost', 'wattage').first()
+    )
+
+
+@receiver(post_save, sender=LightingCatalog)
+def catalog_saved(sender, instance, created, raw=False, **kwargs):
+    """
+    Rebuild aggregates of projects using an item whose lumens or cost changed
+
+    Other edits (model number, brand, wattage, ...) leave the totals alone
+    but still show in reports, so those projects only get a new revision.
+    """
+    previous = getattr(instance, '_previous_values', None)
+    if raw or created or previous is None:
+        return
+
+    cad_file_ids = list(CADFile.objects.filter(
+        rooms__fixtures__lighting_catalog=instance
+    ).order_by().values_list('pk', flat=True).distinct())
+    if not cad_file_ids:
+        return
+    if previous[:2] == (instance.lumens, instance.unit_cost):
+        CADFile.objects.filter(pk__in=cad_file_ids).update(revision=F('revision') + 1)
+    else:
+        aggregates.rebuild_aggregates(cad_file_ids)
+
+
+@receiver(post_save, sender=LightingCatalog)
+def catalog_changed(sender, instance, created, raw=False, **kwargs):
+    """Reload the recommendation index and refresh alternatives near the item once committed"""
+    # Other workers reload when the change commits; this one sees it now
+    invalidate_catalog_index(shared=False)
+
+    previous = getattr(instance, '_previous_values', None)
+    # Only descriptive fields changed: stored alternatives still hold
+    descriptive = not created and previous == (instance.lumens, instance.unit_cost, instance.wattage)
+    recommendations.schedule_catalog_refresh(instance, previous, refresh=not raw and not descriptive)
+
+
+@receiver(post_delete, sender=LightingCatalog)
+def catalog_deleted(sender, instance, **kwargs):
+    """Reload the recommendation index and refresh items that listed the entry once committed"""
+    invalidate_catalog_index(shared=False)
+    recommendations.schedule_catalog_refresh(instance, deleted=True)
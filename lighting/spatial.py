@@ -0,0 +1,221 @@
+"""
+Spatial indexing for assigning fixture positions to room outlines
+"""
+from typing import Optional
+
+import numpy as np
+
+from .utils import calculate_polygon_areas
+
+
+def points_in_polygon(x: np.ndarray, y: np.ndarray, polygon: np.ndarray) -> np.ndarray:
+    """
+    Even-odd point-in-polygon test for many points against one polygon
+
+    Args:
+        x: Point x coordinates
+        y: Point y coordinates
+        polygon: (n, 2) vertices (closing vertex optional)
+
+    Returns:
+        Boolean mask, True where the point is inside the polygon
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    inside = np.zeros(x.shape, dtype=bool)
+    if len(polygon) < 3:
+        return inside
+
+    x1, y1 = polygon[:, 0], polygon[:, 1]
+    x2, y2 = np.roll(x1, -1), np.roll(y1, -1)
+    for ax, ay, bx, by in zip(x1, y1, x2, y2):
+        if ay == by:
+            continue
+        crosses = (ay > y) != (by > y)
+        x_at_y = ax + (y - ay) * (bx - ax) / (by - ay)
+        inside ^= crosses & (x < x_at_y)
+    return inside
+
+
+def polygons_contain(vertices: np.ndarray, offsets: np.ndarray, x: np.ndarray, y: np.ndarray,
+                     polygons: np.ndarray) -> np.ndarray:
+    """
+    Even-odd test of point i against polygon polygons[i], vectorized over pairs
+
+    Edge k of every polygon still having a k-th edge is tested in one pass,
+    so the loop runs as many times as the largest polygon has vertices.
+
+    Args:
+        vertices: (V, 2) vertices of all polygons
+        offsets: (M + 1,) offsets; polygon i is vertices[offsets[i]:offsets[i + 1]]
+        x: Point x coordinates
+        y: Point y coordinates
+        polygons: Polygon index per point
+
+    Returns:
+        Boolean mask per point
+    """
+    inside = np.zeros(len(polygons), dtype=bool)
+    counts = np.diff(offsets)[polygons]
+    starts = offsets[:-1][polygons]
+    active = np.flatnonzero(counts >= 3)
+    edge = 0
+    while len(active):
+        # Edge `edge` of each polygon still having that many vertices
+        first = starts[active] + edge
+        second = starts[active] + (edge + 1) % counts[active]
+        ax, ay = vertices[first, 0], vertices[first, 1]
+        bx, by = vertices[second, 0], vertices[second, 1]
+        px, py = x[active], y[active]
+
+        crosses = (ay > py) != (by > py)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            x_at_y = ax + (py - ay) * (bx - ax) / (by - ay)
+        inside[active] ^= crosses & (px < x_at_y)
+
+        edge += 1
+        active = active[counts[active] > edge]
+    return inside
+
+
+class RoomIndex:
+    """
+    Uniform grid over room bounding boxes with exact polygon tests
+
+    Each grid cell lists the rooms whose bounding box overlaps it, so a point
+    is only tested against the few rooms near it. When outlines are nested
+    (e.g. a building outline around its rooms) the smallest containing room
+    wins.
+    """
+
+    MAX_CELL_ENTRIES = 4_000_000
+
+    def __init__(self, vertices: np.ndarray, offsets: np.ndarray, cell_size: Optional[float] = None):
+        """
+        Args:
+            vertices: (V, 2) vertices of all room outlines
+            offsets: (M + 1,) offsets; room i is vertices[offsets[i]:offsets[i + 1]]
+            cell_size: Grid cell size in drawing units (default: median room
+                bounding box side)
+        """
+        self.vertices = np.asarray(vertices, dtype=np.float64).reshape(-1, 2)
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        self.counts = np.diff(self.offsets)
+        valid = np.flatnonzero(self.counts >= 3)
+
+        # Smaller rooms get a lower rank so nested outlines resolve inwards
+        areas = calculate_polygon_areas(self.vertices, self.offsets)
+        self.rank = np.empty(len(self.counts), dtype=np.int64)
+        self.rank[np.argsort(areas, kind='stable')] = np.arange(len(self.counts))
+
+        self.cell_keys = np.zeros(0, dtype=np.int64)
+        self.cell_starts = np.zeros(1, dtype=np.int64)
+        self.cell_rooms = np.zeros(0, dtype=np.int64)
+        self.cell_size = 1.0
+        self.origin = np.zeros(2)
+        self.grid_shape = (0, 0)
+        if not len(valid):
+            return
+
+        # Bounding boxes: reduce over [start, end) pairs; the padding row keeps
+        # an end index equal to len(vertices) in range
+        padded = np.vstack([self.vertices, np.zeros((1, 2))])
+        bounds = np.column_stack([self.offsets[:-1][valid], self.offsets[1:][valid]]).ravel()
+        mins = np.minimum.reduceat(padded, bounds)[::2]
+        maxs = np.maximum.reduceat(padded, bounds)[::2]
+
+        if cell_size is None:
+            cell_size = float(np.median(np.max(maxs - mins, axis=1)))
+        self.cell_size = cell_size if cell_size > 0 else 1.0
+        self.origin = mins.min(axis=0)
+
+        # Coarsen the grid if a few huge outlines would cover too many cells
+        while True:
+            cell_min = np.floor((mins - self.origin) / self.cell_size).astype(np.int64)
+            cell_max = np.floor((maxs - self.origin) / self.cell_size).astype(np.int64)
+            spans = cell_max - cell_min + 1
+            if np.prod(spans, axis=1).sum() <= self.MAX_CELL_ENTRIES:
+                break
+            self.cell_size *= 2
+        self.grid_shape = tuple(int(n) for n in cell_max.max(axis=0) + 1)
+
+        # Expand every room into the cells its bounding box covers
+        per_room = np.prod(spans, axis=1)
+        entry_room = np.repeat(np.arange(len(valid)), per_room)
+        local = np.arange(per_room.sum()) - np.repeat(np.cumsum(per_room) - per_room, per_room)
+        entry_cx = cell_min[entry_room, 0] + local // spans[entry_room, 1]
+        entry_cy = cell_min[entry_room, 1] + local % spans[entry_room, 1]
+        entry_key = entry_cx * self.grid_shape[1] + entry_cy
+
+        # CSR layout: rooms of cell_keys[i] are cell_rooms[cell_starts[i]:cell_starts[i + 1]]
+        order = np.argsort(entry_key, kind='stable')
+        self.cell_rooms = valid[entry_room[order]]
+        self.cell_keys, first = np.unique(entry_key[order], return_index=True)
+        self.cell_starts = np.append(first, len(order)).astype(np.int64)
+
+    def polygon(self, room: int) -> np.ndarray:
+        """Vertices of room outline ``room``"""
+        return self.vertices[self.offsets[room]:self.offsets[room + 1]]
+
+    def candidates(self, x: np.ndarray, y: np.ndarray):
+        """
+        List (point, room) pairs whose grid cell matches
+
+        Returns:
+            Tuple of (point indices, room indices) arrays
+        """
+        cx = np.floor((x - self.origin[0]) / self.cell_size).astype(np.int64)
+        cy = np.floor((y - self.origin[1]) / self.cell_size).astype(np.int64)
+        in_grid = (cx >= 0) & (cy >= 0) & (cx < self.grid_shape[0]) & (cy < self.grid_shape[1])
+
+        points = np.flatnonzero(in_grid)
+        keys = cx[points] * self.grid_shape[1] + cy[points]
+        position = np.searchsorted(self.cell_keys, keys)
+        position = np.minimum(position, len(self.cell_keys) - 1)
+        found = self.cell_keys[position] == keys
+        points, position = points[found], position[found]
+
+        starts = self.cell_starts[position]
+        counts = self.cell_starts[position + 1] - starts
+        pair_points = np.repeat(points, counts)
+        local = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        pair_rooms = self.cell_rooms[np.repeat(starts, counts) + local]
+        return pair_points, pair_rooms
+
+    def contains(self, x: np.ndarray, y: np.ndarray, rooms: np.ndarray) -> np.ndarray:
+        """
+        Even-odd test of point i against room rooms[i], vectorized over pairs
+
+        Returns:
+            Boolean mask per pair
+        """
+        return polygons_contain(self.vertices, self.offsets, x, y, rooms)
+
+    def assign(self, x: np.ndarray, y: np.ndarray) -> np.ndarray:
+        """
+        Find the room containing each point
+
+        Args:
+            x: Point x coordinates
+            y: Point y coordinates
+
+        Returns:
+            int64 array of room indices, -1 for points outside every room
+        """
+        x = np.asarray(x, dtype=np.float64)
+        y = np.asarray(y, dtype=np.float64)
+        result = np.full(x.shape, -1, dtype=np.int64)
+        if not len(self.cell_keys) or not len(x):
+            return result
+
+        pair_points, pair_rooms = self.candidates(x, y)
+        inside = self.contains(x[pair_points], y[pair_points], pair_rooms)
+        pair_points, pair_rooms = pair_points[inside], pair_rooms[inside]
+
+        # Keep the smallest containing room per point
+        order = np.lexsort((self.rank[pair_rooms], pair_points))
+        pair_points, pair_rooms = pair_points[order], pair_rooms[order]
+        first = np.ones(len(pair_points), dtype=bool)
+        first[1:] = pair_points[1:] != pair_points[:-1]
+        result[pair_points[first]] = pair_rooms[first]
+        return result
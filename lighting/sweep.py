@@ -0,0 +1,279 @@
+"""
+What-if sweep over fixture substitutions with a cost / adequacy / wattage Pareto front
+
+Every fixture row may keep its item or switch to one of its budget-band
+alternatives. A combination is one choice per row; combinations are scored
+in blocks as matrices (combinations × rows gathered from per-option arrays,
+then rows × rooms sums), so no fixture is saved while sweeping. When there
+are too many combinations to enumerate, the current selection, every single
+substitution and a random sample at varying substitution rates are scored.
+"""
+import math
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from .catalog_index import BUDGET_BANDS, CatalogIndex, get_catalog_index
+from .models import CADFile, Fixture, Room
+from .utils import get_budget_based_recommendations
+
+# Alternatives taken from each budget band per fixture row
+DEFAULT_PER_BAND = 2
+
+# Enumerate every combination up to this many; sample beyond it
+MAX_COMBINATIONS = 50_000
+SAMPLE_SIZE = 20_000
+
+# Largest combinations × rows block evaluated at once
+MAX_CELLS = 4_000_000
+
+# Pareto points returned (evenly spread by cost when the front is larger)
+DEFAULT_FRONT_LIMIT = 100
+
+
+def pareto_front_3d(cost: np.ndarray, wattage: np.ndarray, adequate: np.ndarray) -> np.ndarray:
+    """
+    Indices of points not dominated on (lower cost, lower wattage, more adequate rooms)
+
+    Points are taken level by level from the most adequate rooms down; a
+    point survives if no point at its level or above has both lower-or-equal
+    cost and wattage. Points seen so far are kept as a staircase of cost
+    against the lowest wattage, so each level is checked with one
+    ``searchsorted``. Duplicates keep their first occurrence.
+
+    Returns:
+        Indices into the inputs, by adequacy descending then cost ascending
+    """
+    order = np.lexsort((wattage, cost, -adequate))
+    stair_cost = np.zeros(0)
+    stair_wattage = np.zeros(0)
+    keep = []
+
+    levels = adequate[order]
+    starts = np.flatnonzero(np.r_[True, levels[1:] != levels[:-1]])
+    for start, end in zip(starts, np.r_[starts[1:], len(order)]):
+        group = order[start:end]
+        group_cost, group_wattage = cost[group], wattage[group]
+
+        # Dominated by a point at a higher level
+        dominated = np.zeros(len(group), dtype=bool)
+        if len(stair_cost):
+            position = np.searchsorted(stair_cost, group_cost, side='right') - 1
+            dominated = (position >= 0) & (stair_wattage[np.maximum(position, 0)] <= group_wattage)
+        # Dominated by a cheaper (or equally cheap, lower-wattage) point at this level
+        dominated[1:] |= np.minimum.accumulate(group_wattage)[:-1] <= group_wattage[1:]
+        survivors = group[~dominated]
+        keep.append(survivors)
+
+        # Merge survivors into the staircase: by cost, keeping strictly falling wattage
+        merged_cost = np.concatenate([stair_cost, cost[survivors]])
+        merged_wattage = np.concatenate([stair_wattage, wattage[survivors]])
+        merge_order = np.lexsort((merged_wattage, merged_cost))
+        merged_cost, merged_wattage = merged_cost[merge_order], merged_wattage[merge_order]
+        falling = np.ones(len(merged_cost), dtype=bool)
+        falling[1:] = merged_wattage[1:] < np.minimum.accumulate(merged_wattage)[:-1]
+        stair_cost, stair_wattage = merged_cost[falling], merged_wattage[falling]
+
+    return np.concatenate(keep) if keep else np.zeros(0, dtype=np.int64)
+
+
+class SubstitutionSweep:
+    """
+    Fixture rows of one CADFile with their substitution options as arrays
+
+    Option 0 of every row is its current item. Rows with a single option
+    (no alternatives, or in the unassigned bucket) are folded into
+    constant base totals.
+
+    Args:
+        cad_file: CADFile to sweep
+        per_band: Alternatives taken from each budget band per row
+        index: CatalogIndex to draw alternatives from
+    """
+
+    def __init__(self, cad_file: CADFile, per_band: int = DEFAULT_PER_BAND, index: Optional[CatalogIndex] = None):
+        self.index = index or get_catalog_index()
+        all_rooms = list(cad_file.rooms.prefetch_related('fixtures'))
+        self.rooms: List[Room] = [room for room in all_rooms if not room.is_unassigned]
+        room_slot = {room.id: slot for slot, room in enumerate(self.rooms)}
+        self.required = np.array([room.calculate_required_lumens() for room in self.rooms], dtype=np.float64)
+
+        alternatives: Dict[int, List[int]] = {}
+        self.fixtures: List[Fixture] = []
+        options, rows_room, quantities = [], [], []
+        self.base_cost = self.base_wattage = 0.0
+        self.base_lumens = np.zeros(len(self.rooms))
+
+        for room in all_rooms:
+            for fixture in room.fixtures.all():
+                item = self.index.by_id[fixture.lighting_catalog_id]
+                positions = [self.index.position_by_id[item.id]]
+                # Fixtures outside every room have no lux to keep; leave them
+                if not room.is_unassigned:
+                    if item.id not in alternatives:
+                        alternatives[item.id] = self.alternative_positions(item, per_band)
+                    positions += alternatives[item.id]
+                if len(positions) == 1:
+                    self.base_cost += float(item.unit_cost) * fixture.quantity
+                    self.base_wattage += item.wattage * fixture.quantity
+                    if not room.is_unassigned:
+                        self.base_lumens[room_slot[room.id]] += item.lumens * fixture.quantity
+                    continue
+                self.fixtures.append(fixture)
+                options.append(positions)
+                rows_room.append(room_slot[room.id])
+                quantities.append(fixture.quantity)
+
+        # (rows × options) arrays padded with the current item
+        self.option_count = np.array([len(row) for row in options], dtype=np.int64)
+        width = int(self.option_count.max(initial=1))
+        self.positions = np.array([row + [row[0]] * (width - len(row)) for row in options], dtype=np.int64).reshape(-1, width)
+        quantity = np.array(quantities, dtype=np.float64)
+        self.option_cost = self.index.cost[self.positions] / 100 * quantity[:, None]
+        self.option_wattage = self.index.wattage[self.positions] * quantity[:, None]
+        self.option_lumens = self.index.lumens[self.positions] * quantity[:, None]
+        self.rows_room = np.array(rows_room, dtype=np.int64)
+
+    def alternative_positions(self, item, per_band: int) -> List[int]:
+        """Catalog positions of an item's budget-band alternatives"""
+        positions = []
+        for band in BUDGET_BANDS:
+            for alternative in get_budget_based_recommendations(item.unit_cost, item, band, per_band, self.index):
+                position = self.index.position_by_id[alternative.id]
+                if position not in positions:
+                    positions.append(position)
+        return positions
+
+    @property
+    def combination_count(self) -> int:
+        """Number of distinct combinations (exact, may be huge)"""
+        return math.prod(self.option_count.tolist())
+
+    @property
+    def combination_log10(self) -> float:
+        """log10 of the number of combinations"""
+        return float(np.log10(self.option_count).sum())
+
+    def combinations(self, max_combinations: int = MAX_COMBINATIONS, sample_size: int = SAMPLE_SIZE,
+                     seed: int = 0) -> np.ndarray:
+        """
+        Option choice per row for every combination to score
+
+        Returns:
+            (combinations, rows) int array; row 0 is the current selection
+        """
+        rows = len(self.option_count)
+        total = self.combination_count
+        if total <= max_combinations:
+            # Mixed-radix decoding of 0..total-1, row 0 varying fastest
+            codes = np.arange(total, dtype=np.int64)
+            radix = np.cumprod(np.r_[1, self.option_count[:-1]]) if rows else np.zeros(0, dtype=np.int64)
+            return (codes[:, None] // radix[None, :]) % self.option_count[None, :]
+
+        # Every single substitution, then random mixes at varying rates
+        single_rows = np.repeat(np.arange(rows), self.option_count - 1)
+        single_choice = np.arange(len(single_rows)) - np.repeat(np.cumsum(self.option_count - 1) - (self.option_count - 1), self.option_count - 1) + 1
+        singles = np.zeros((len(single_rows), rows), dtype=np.int64)
+        singles[np.arange(len(single_rows)), single_rows] = single_choice
+
+        rng = np.random.default_rng(seed)
+        rate = rng.random(sample_size)[:, None]
+        swap = rng.random((sample_size, rows)) < rate
+        pick = 1 + np.floor(rng.random((sample_size, rows)) * (self.option_count - 1)[None, :]).astype(np.int64)
+        sampled = np.where(swap, pick, 0)
+
+        choices = np.vstack([np.zeros((1, rows), dtype=np.int64), singles, sampled])
+        _, first = np.unique(choices, axis=0, return_index=True)
+        return choices[np.sort(first)]
+
+    def evaluate(self, choices: np.ndarray) -> Dict[str, np.ndarray]:
+        """
+        Score combinations in blocks
+
+        Returns:
+            Dictionary of per-combination 'cost' (₹), 'wattage' (W) and
+            'adequate' (rooms whose lumens meet the requirement) arrays
+        """
+        count = len(choices)
+        cost = np.full(count, self.base_cost)
+        wattage = np.full(count, self.base_wattage)
+        adequate = np.zeros(count, dtype=np.int64)
+        rows = np.arange(len(self.option_count))
+        room_count = len(self.rooms)
+
+        block = max(1, MAX_CELLS // max(1, len(rows), room_count))
+        for start in range(0, count, block):
+            chosen = choices[start:start + block]
+            cost[start:start + block] += self.option_cost[rows, chosen].sum(axis=1)
+            wattage[start:start + block] += self.option_wattage[rows, chosen].sum(axis=1)
+            # Sum row lumens per (combination, room) slot in one bincount
+            slots = np.arange(len(chosen))[:, None] * room_count + self.rows_room
+            room_lumens = np.bincount(
+                slots.ravel(), weights=self.option_lumens[rows, chosen].ravel(), minlength=len(chosen) * room_count,
+            ).reshape(len(chosen), room_count) + self.base_lumens
+            adequate[start:start + block] = (room_lumens >= self.required).sum(axis=1)
+        return {'cost': cost, 'wattage': wattage, 'adequate': adequate}
+
+    def describe(self, choice: np.ndarray, cost: float, wattage: float, adequate: int) -> Dict:
+        """One scored combination as totals plus the substitutions it makes"""
+        changed = np.flatnonzero(choice)
+        return {
+            'total_cost': round(cost, 2),
+            'total_wattage': round(wattage, 2),
+            'adequate_rooms': int(adequate),
+            'changes': [
+                {
+                    'fixture_id': self.fixtures[row].id,
+                    'catalog_id': self.index.items[self.positions[row, choice[row]]].id,
+                    'symbol': self.index.items[self.positions[row, choice[row]]].symbol_name,
+                }
+                for row in changed.tolist()
+            ],
+        }
+
+
+def sweep_project(cad_file: CADFile, per_band: int = DEFAULT_PER_BAND, max_combinations: int = MAX_COMBINATIONS,
+                  sample_size: int = SAMPLE_SIZE, limit: int = DEFAULT_FRONT_LIMIT, seed: int = 0) -> Dict:
+    """
+    Pareto-optimal substitution sets for a project
+
+    Nothing is written; pass a point's 'changes' to ``apply_selection``.
+
+    Args:
+        cad_file: CADFile to sweep
+        per_band: Alternatives per budget band and fixture row
+        max_combinations: Enumerate every combination up to this many
+        sample_size: Random combinations scored beyond that
+        limit: Most Pareto points returned, spread evenly by cost
+        seed: Random seed for sampling
+
+    Returns:
+        Dictionary with 'rooms' (assigned room count), 'combinations'
+        (None beyond 2**53) and 'combinations_log10', 'evaluated', 'exhaustive', the
+        'current' point, the 'front_size' and the 'front' points (each with
+        'total_cost', 'total_wattage', 'adequate_rooms' and 'changes')
+    """
+    sweep = SubstitutionSweep(cad_file, per_band)
+    choices = sweep.combinations(max_combinations, sample_size, seed)
+    scores = sweep.evaluate(choices)
+    front = pareto_front_3d(scores['cost'], scores['wattage'], scores['adequate'])
+
+    shown = front[np.argsort(scores['cost'][front], kind='stable')]
+    if len(shown) > limit:
+        shown = shown[np.unique(np.linspace(0, len(shown) - 1, limit).round().astype(np.int64))]
+
+    total = sweep.combination_count
+
+    def point(row):
+        return sweep.describe(choices[row], scores['cost'][row], scores['wattage'][row], scores['adequate'][row])
+
+    return {
+        'rooms': len(sweep.rooms),
+        'combinations': total if total <= 2 ** 53 else None,
+        'combinations_log10': round(sweep.combination_log10, 2),
+        'evaluated': len(choices),
+        'exhaustive': total <= max_combinations,
+        'current': point(0),
+        'front_size': len(front),
+        'front': [point(row) for row in shown.tolist()],
+    }
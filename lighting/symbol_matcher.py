@@ -0,0 +1,269 @@
+"""
+Batch matching of CAD block names to catalog symbols through a trigram index
+"""
+import re
+import threading
+from functools import lru_cache
+from typing import Dict, Iterable, List, NamedTuple, Optional
+
+import numpy as np
+from django.db.models import Q
+
+from .catalog_index import CatalogIndex, get_catalog_index
+from .models import Fixture, LightingCatalog, SymbolLegend
+
+# Trigram similarity (shared / union of trigrams) a fuzzy match needs to be
+# used at all, and to be trusted without review
+MATCH_THRESHOLD = 0.5
+CONFIDENT_THRESHOLD = 0.8
+
+# Distinct names a matcher remembers resolutions for (least recently used go first)
+RESOLVED_CACHE_SIZE = 4096
+
+_lock = threading.Lock()
+_matcher = None
+
+
+class SymbolMatch(NamedTuple):
+    """Resolved catalog entry for a CAD symbol (``catalog_item`` None if unmapped)"""
+    catalog_item: Optional[LightingCatalog]
+    score: float
+    method: str  # 'stored', 'exact', 'normalized', 'fuzzy' or 'none'
+
+
+def normalize_symbol(symbol: str) -> str:
+    """Upper-case tokens separated by single spaces (``led-panel_600`` -> ``LED PANEL 600``)"""
+    return ' '.join(re.findall(r'[A-Z0-9]+', symbol.upper()))
+
+
+def symbol_trigrams(key: str) -> set:
+    """Trigrams of each token, padded as in PostgreSQL pg_trgm"""
+    trigrams = set()
+    for token in key.split():
+        padded = f'  {token} '
+        trigrams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return trigrams
+
+
+class SymbolMatcher:
+    """
+    Catalog symbol names indexed by exact name, normalized key and trigram
+
+    A lookup tries the exact name, then the normalized key, then scores every
+    catalog symbol sharing a trigram in one ``bincount`` over the posting
+    lists. Results for the most recently used ``RESOLVED_CACHE_SIZE`` names
+    are memoized until the catalog changes.
+    """
+
+    def __init__(self, index: CatalogIndex):
+        """
+        Args:
+            index: CatalogIndex supplying the catalog entries
+        """
+        self.version = index.version
+        self.items = sorted(index.items, key=lambda item: item.symbol_name)
+        self.by_name = {item.symbol_name: item for item in self.items}
+        self.by_key = {}
+        for item in self.items:
+            self.by_key.setdefault(normalize_symbol(item.symbol_name), item)
+
+        postings: Dict[str, List[int]] = {}
+        sizes = []
+        for position, item in enumerate(self.items):
+            trigrams = symbol_trigrams(normalize_symbol(item.symbol_name))
+            sizes.append(len(trigrams))
+            for trigram in trigrams:
+                postings.setdefault(trigram, []).append(position)
+        self.postings = {trigram: np.array(positions, dtype=np.int64) for trigram, positions in postings.items()}
+        self.sizes = np.array(sizes, dtype=np.int64)
+        self.resolved = lru_cache(maxsize=RESOLVED_CACHE_SIZE)(self.resolve)
+
+    def fuzzy(self, name: str) -> SymbolMatch:
+        """Most similar catalog symbol by trigram similarity"""
+        trigrams = symbol_trigrams(normalize_symbol(name))
+        lists = [self.postings[trigram] for trigram in trigrams if trigram in self.postings]
+        if not lists:
+            return SymbolMatch(None, 0.0, 'none')
+
+        shared = np.bincount(np.concatenate(lists), minlength=len(self.items))
+        similarity = shared / (len(trigrams) + self.sizes - shared)
+        best = int(np.argmax(similarity))
+        score = round(float(similarity[best]), 3)
+        if score < MATCH_THRESHOLD:
+            return SymbolMatch(None, score, 'none')
+        return SymbolMatch(self.items[best], score, 'fuzzy')
+
+    def resolve(self, name: str) -> SymbolMatch:
+        """Resolve one catalog symbol name without the memo"""
+        if name in self.by_name:
+            return SymbolMatch(self.by_name[name], 1.0, 'exact')
+        if normalize_symbol(name) in self.by_key:
+            return SymbolMatch(self.by_key[normalize_symbol(name)], 1.0, 'normalized')
+        return self.fuzzy(name)
+
+    def match(self, name: str) -> SymbolMatch:
+        """Resolve one catalog symbol name (memoized)"""
+        return self.resolved(name)
+
+    def match_many(self, symbols: Iterable[str], legend: Optional[Dict[str, str]] = None,
+                   stored: Optional[Dict[str, LightingCatalog]] = None) -> Dict[str, SymbolMatch]:
+        """
+        Resolve CAD block names, trying the upload's legend, then stored mappings
+
+        Args:
+            symbols: Unique block names from a drawing
+            legend: Optional dictionary mapping CAD symbols to catalog symbol_names
+            stored: Optional confirmed mappings (see ``stored_legend``)
+
+        Returns:
+            Dictionary mapping each CAD symbol to its SymbolMatch
+        """
+        legend = legend or {}
+        stored = stored or {}
+        matches = {}
+        for symbol in symbols:
+            if symbol in legend:
+                matches[symbol] = self.match(legend[symbol])
+            elif symbol in stored:
+                matches[symbol] = SymbolMatch(stored[symbol], 1.0, 'stored')
+            else:
+                matches[symbol] = self.match(symbol)
+        return matches
+
+
+def get_symbol_matcher() -> SymbolMatcher:
+    """
+    Return the process-local matcher, rebuilding it when the catalog changed
+
+    Returns:
+        SymbolMatcher instance (shared)
+    """
+    global _matcher
+
+    index = get_catalog_index()
+    matcher = _matcher
+    if matcher is not None and matcher.version == index.version:
+        return matcher
+
+    with _lock:
+        if _matcher is None or _matcher.version != index.version:
+            _matcher = SymbolMatcher(index)
+        return _matcher
+
+
+def symbol_report(matches: Dict[str, SymbolMatch], insert_counts: Optional[Dict[str, int]] = None) -> Dict:
+    """
+    Unmapped and low-confidence symbols of a drawing, for ``CADFile.symbol_report``
+
+    Args:
+        matches: Result of ``SymbolMatcher.match_many``
+        insert_counts: Optional number of inserts per CAD symbol
+
+    Returns:
+        Dictionary with 'unmapped' and 'low_confidence' lists, most inserts first
+    """
+    insert_counts = insert_counts or {}
+    unmapped = []
+    low_confidence = []
+    for symbol, match in matches.items():
+        inserts = insert_counts.get(symbol, 0)
+        if match.catalog_item is None:
+            unmapped.append({'symbol': symbol, 'inserts': inserts, 'best_score': match.score})
+        elif match.score < CONFIDENT_THRESHOLD:
+            low_confidence.append({
+                'symbol': symbol,
+                'inserts': inserts,
+                'catalog_id': match.catalog_item.id,
+                'catalog_symbol': match.catalog_item.symbol_name,
+                'score': match.score,
+            })
+
+    unmapped.sort(key=lambda row: (-row['inserts'], row['symbol']))
+    low_confidence.sort(key=lambda row: (-row['inserts'], row['symbol']))
+    return {'unmapped': unmapped, 'low_confidence': low_confidence}
+
+
+def stored_legend(user_id: Optional[int], symbols: Iterable[str],
+                  index: Optional[CatalogIndex] = None) -> Dict[str, LightingCatalog]:
+    """
+    Confirmed mappings for CAD symbols in one indexed query
+
+    Args:
+        user_id: Uploading user; their entries override firm-wide ones
+        symbols: Block names to look up
+        index: CatalogIndex to resolve catalog IDs (default: the process-local index)
+
+    Returns:
+        Dictionary mapping CAD symbols to LightingCatalog items
+    """
+    if index is None:
+        index = get_catalog_index()
+
+    # Matcher suggestions stored by earlier versions are not confirmations
+    rows = SymbolLegend.objects.filter(
+        Q(user_id=user_id) | Q(user__isnull=True), cad_symbol__in=list(symbols)
+    ).exclude(source='matcher').order_by().values_list('cad_symbol', 'user_id', 'lighting_catalog_id')
+
+    mapping = {}
+    # Firm-wide entries first so the user's own entries overwrite them
+    for cad_symbol, _, catalog_id in sorted(rows, key=lambda row: row[1] is not None):
+        if catalog_id in index.by_id:
+            mapping[cad_symbol] = index.by_id[catalog_id]
+    return mapping
+
+
+def remember_symbol(user_id: int, cad_symbol: str, catalog_item: LightingCatalog, source: str = 'selection'):
+    """Record (or replace) one user's confirmed mapping for a CAD symbol"""
+    SymbolLegend.objects.update_or_create(
+        user_id=user_id, cad_symbol=cad_symbol,
+        defaults={'lighting_catalog': catalog_item, 'source': source},
+    )
+
+
+def remember_symbols(user_id: int, fixtures: Iterable[Fixture], legend: Optional[Dict[str, str]] = None,
+                     report: Optional[Dict] = None) -> int:
+    """
+    Record the mappings the upload's legend confirmed in the user's legend
+
+    Only confirmed mappings are stored: the upload's legend here and
+    fixture selections through ``remember_symbol``. Matcher results are
+    not, since a stored entry applies before exact matching and a guess
+    would shadow a catalog symbol added later. Low-confidence matches,
+    symbols named exactly as in the catalog and mappings the user's or
+    firm's legend already gives are skipped.
+
+    Args:
+        user_id: Uploading user
+        fixtures: Fixtures built for the drawing (with ``cad_symbol`` set)
+        legend: The upload's legend, if any
+        report: The drawing's ``symbol_report``
+
+    Returns:
+        Number of mappings recorded
+    """
+    legend = legend or {}
+    doubtful = {row['symbol'] for row in (report or {}).get('low_confidence', [])}
+    mappings = {
+        fixture.cad_symbol: fixture.lighting_catalog
+        for fixture in fixtures if fixture.cad_symbol in legend
+    }
+    if not mappings:
+        return 0
+    known = stored_legend(user_id, mappings)
+
+    confirmed = []
+    for cad_symbol, catalog_item in mappings.items():
+        if cad_symbol in doubtful or normalize_symbol(cad_symbol) == normalize_symbol(catalog_item.symbol_name):
+            continue
+        if cad_symbol in known and known[cad_symbol].id == catalog_item.id:
+            continue
+        confirmed.append(
+            SymbolLegend(user_id=user_id, cad_symbol=cad_symbol, lighting_catalog=catalog_item, source='legend')
+        )
+
+    if confirmed:
+        SymbolLegend.objects.bulk_create(
+            confirmed, update_conflicts=True, unique_fields=['cad_symbol', 'user'],
+            update_fields=['lighting_catalog', 'source', 'updated_at'],
+        )
+    return len(confirmed)
@@ -1,12 +1,28 @@
 """
 Celery tasks for async processing
-Optional: Uncomment to enable background processing
+Report generation runs here with REPORT_BACKEND = 'celery'; CAD processing
+is optional: uncomment to enable it
 """
 from celery import shared_task
 from .models import CADFile
 from .utils import process_cad_file
 
 
+@shared_task
+def generate_report_task(report_id):
+    """
+    Build a queued report (see ``reports.request_report``)
+    
+    Args:
+        report_id: ID of a pending Report
+    
+    Returns:
+        bool: True if the report is ready
+    """
+    from .reports import build_report
+    return build_report(report_id)
+
+
 # Uncomment to enable async CAD processing
 # @shared_task
 # def process_cad_file_async(cad_file_id, legend=None):
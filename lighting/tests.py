@@ -1,3 +1,1362 @@
-from django.test import TestCase
+import csv
+import importlib
+import itertools
+import math
+import os
+import shutil
+import tempfile
+from decimal import Decimal
+from io import StringIO
+from unittest import mock, skipUnless
 
-# Create your tests here.
+import numpy as np
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.db import IntegrityError, connection, transaction
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+import ezdxf
+
+from . import parse_cache, photometry, recommendations, sweep, symbol_matcher
+from .cad_geometry import parse_cad_columnar
+from .catalog_index import CatalogIndex, invalidate_catalog_index
+from .aggregates import deferred_aggregates
+from .energy import dimming_profile, occupancy_matrix, simulate, tariff_rates
+from .layout import auto_layout, grid_layout
+from .models import (
+    CADFile, Fixture, FixtureRecommendation, LightingCatalog, LightingCatalogQuerySet, Report, Room, SymbolLegend,
+)
+from .pdf_report import PdfReader, parallel_available
+from .report_data import build_report_snapshot, iter_report_rooms
+from .reports import build_report, cached_report, request_report
+from .spatial import RoomIndex, points_in_polygon
+from .symbol_matcher import (
+    CONFIDENT_THRESHOLD, MATCH_THRESHOLD, SymbolMatch, SymbolMatcher, stored_legend, symbol_report,
+)
+from .optimizer import ProjectOptimizer, apply_selection
+from .sweep import SubstitutionSweep, pareto_front_3d
+from .utilization import (
+    CEILING_REFLECTANCES, ROOM_INDICES, UF_TABLE, WALL_REFLECTANCES, room_index, utilization_factors,
+)
+from .utils import (
+    INSUNITS_TO_METERS,
+    calculate_fixture_efficiency_score,
+    calculate_polygon_areas,
+    generate_pdf_report,
+    infer_unit_scale,
+    is_ascii_dxf,
+    parse_cad,
+    process_cad_file,
+)
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, REPORT_BACKEND='sync')
+class ProjectTestCase(TestCase):
+    """A 2-room and a 12-room project lit from a three-item catalog"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('planner', password='secret')
+        cls.catalog = [
+            LightingCatalog.objects.create(
+                symbol_name=f'LED-{lumens}', model_number=f'M{lumens}', brand='Test', lumens=lumens,
+                wattage=lumens / 100, beam_angle=90, color_temp=4000, unit_cost=Decimal(lumens) / 10,
+            )
+            for lumens in (800, 1500, 3000)
+        ]
+        cls.small = cls.create_project('Small', rooms=2)
+        cls.large = cls.create_project('Large', rooms=12)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    @classmethod
+    def create_project(cls, name, rooms):
+        cad_file = CADFile.objects.create(
+            user=cls.user, project_name=name, filename=f'{name}.dxf', file='cad_files/test.dxf', status='completed'
+        )
+        for number in range(rooms):
+            room = Room.objects.create(cad_file=cad_file, name=f'Room {number}', area=10 + number, required_lux=300)
+            for quantity, item in enumerate(cls.catalog[:1 + number % 3], start=1):
+                Fixture.objects.create(room=room, lighting_catalog=item, quantity=quantity)
+        return cad_file
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+            if hasattr(response, 'streaming_content'):
+                b''.join(response.streaming_content)
+        self.assertEqual(response.status_code, 200)
+        return len(context.captured_queries)
+
+    def assertConstantQueries(self, view_name, *args):
+        small = self.count_queries(reverse(view_name, args=(self.small.id, *args)))
+        large = self.count_queries(reverse(view_name, args=(self.large.id, *args)))
+        self.assertEqual(small, large)
+
+
+class RoomLightingMetricsTests(ProjectTestCase):
+    """Pages listing rooms run a fixed number of queries"""
+
+    def test_metrics_match_stored_aggregates(self):
+        rooms = Room.objects.filter(cad_file=self.large).with_lighting_metrics()
+        for room in rooms:
+            self.assertEqual(room.live_total_lumens, room.total_lumens)
+            self.assertEqual(room.live_fixture_count, room.fixture_count)
+            self.assertEqual(room.live_total_cost, room.total_cost)
+            self.assertAlmostEqual(room.live_current_lux, room.current_lux, places=2)
+            self.assertEqual(room.live_is_adequately_lit, room.is_adequately_lit)
+
+    def test_room_without_fixtures(self):
+        room = Room.objects.create(cad_file=self.small, name='Empty', area=5)
+        room = Room.objects.with_lighting_metrics().get(pk=room.pk)
+        self.assertEqual(room.live_total_lumens, 0)
+        self.assertEqual(room.live_fixture_count, 0)
+        self.assertEqual(room.live_total_cost, Decimal('0.00'))
+        self.assertEqual(room.live_current_lux, 0)
+        self.assertFalse(room.live_is_adequately_lit)
+
+    def test_dashboard_queries(self):
+        url = reverse('lighting:dashboard')
+        before = self.count_queries(url)
+        self.create_project('Later', rooms=15)
+        self.assertEqual(self.count_queries(url), before)
+
+    def test_project_detail_queries(self):
+        self.assertConstantQueries('lighting:project_detail')
+
+    def test_csv_report_queries(self):
+        self.assertConstantQueries('lighting:generate_report', 'csv')
+
+    def test_pdf_report_queries(self):
+        self.assertConstantQueries('lighting:generate_report', 'pdf')
+
+
+class ReportSnapshotTests(ProjectTestCase):
+    """CSV and JSON reports agree with the shared snapshot"""
+
+    def test_csv_report_totals(self):
+        response = self.client.get(reverse('lighting:generate_report', args=(self.large.id, 'csv')))
+        rows = list(csv.reader(b''.join(response.streaming_content).decode().splitlines()))
+        summary = dict(row for row in rows if len(row) == 2 and row[0].startswith('Total'))
+        self.assertEqual(summary['Total Rooms'], '12')
+        self.assertEqual(summary['Total Fixtures'], str(Fixture.objects.filter(room__cad_file=self.large).count()))
+        self.large.refresh_from_db()
+        self.assertEqual(summary['Total Cost'], f'{self.large.total_cost:.2f}')
+
+    def test_report_snapshot(self):
+        with self.assertNumQueries(3):
+            snapshot = build_report_snapshot(self.large)
+        self.assertEqual(snapshot.total_rooms, 12)
+        self.assertEqual(snapshot.fixture_rows, Fixture.objects.filter(room__cad_file=self.large).count())
+
+        chunked = tuple(iter_report_rooms(self.large, chunk_size=5))
+        self.assertEqual(chunked, snapshot.rooms)
+
+        data = self.client.get(reverse('lighting:generate_report', args=(self.large.id, 'json'))).json()
+        self.assertEqual(data['summary']['total_fixtures'], snapshot.total_fixtures)
+        self.assertEqual([room['name'] for room in data['rooms']], [room.name for room in snapshot.rooms])
+
+
+class ChunkedPdfTests(ProjectTestCase):
+    """Large PDF reports are rendered in chunks and merged"""
+
+    @skipUnless(parallel_available(), 'pypdf not installed')
+    @override_settings(PDF_PARALLEL_MIN_ROOMS=0, PDF_CHUNK_ROOMS=5, PDF_WORKERS=2)
+    def test_chunked_pdf(self):
+        reader = PdfReader(generate_pdf_report(self.large))
+        pages = len(reader.pages)
+        for number, page in enumerate(reader.pages, start=1):
+            self.assertIn(f'Page {number} of {pages}', page.extract_text())
+
+        section = reader.outline[1]
+        self.assertEqual([item.title for item in section], [f'Room {number}' for number in sorted(range(12), key=str)])
+        for item in section:
+            page = reader.get_destination_page_number(item)
+            self.assertIn(item.title, reader.pages[page].extract_text())
+
+
+class ReportCacheTests(ProjectTestCase):
+    """Reports are cached per project revision and built off the request"""
+
+    def test_report_reused_until_revision_changes(self):
+        url = reverse('lighting:generate_report', args=(self.small.id, 'pdf'))
+        self.count_queries(url)
+        self.count_queries(url)
+        self.assertEqual(self.small.reports.count(), 1)
+
+        fixture = Fixture.objects.filter(room__cad_file=self.small).first()
+        fixture.quantity += 1
+        fixture.save()
+        self.count_queries(url)
+        self.small.refresh_from_db()
+        self.assertEqual(list(self.small.reports.values_list('revision', 'status')), [(self.small.revision, 'ready')])
+
+    def test_catalog_edits_give_projects_a_new_revision(self):
+        first = request_report(self.small, 'pdf')
+        unused = self.catalog[2]
+        unused.brand = 'Other'
+        unused.save()
+        self.small.refresh_from_db()
+        self.assertEqual(cached_report(self.small, 'pdf'), first)
+
+        revision = self.small.revision
+        for field, value in (('model_number', 'M800-B'), ('wattage', 7.5), ('unit_cost', Decimal('75.00'))):
+            with self.subTest(field=field):
+                item = LightingCatalog.objects.get(pk=self.catalog[0].pk)
+                setattr(item, field, value)
+                item.save()
+                self.small.refresh_from_db()
+                self.assertEqual(self.small.revision, revision + 1)
+                revision = self.small.revision
+                self.assertIsNone(cached_report(self.small, 'pdf'))
+
+        report = request_report(self.small, 'pdf')
+        self.assertNotEqual(report.pk, first.pk)
+        self.assertEqual((report.revision, report.status), (revision, 'ready'))
+
+    def test_report_stamped_with_the_revision_it_was_built_from(self):
+        report = Report.objects.create(cad_file=self.small, report_type='csv', revision=self.small.revision)
+        fixture = Fixture.objects.filter(room__cad_file=self.small).first()
+        fixture.quantity += 1
+        fixture.save()
+
+        self.assertTrue(build_report(report.id))
+        report.refresh_from_db()
+        self.small.refresh_from_db()
+        self.assertEqual(report.revision, self.small.revision)
+        self.assertEqual(cached_report(self.small, 'csv'), report)
+        with open(report.file_path.path, encoding='utf-8') as csvfile:
+            summary = dict(row for row in csv.reader(csvfile) if len(row) == 2 and row[0].startswith('Total'))
+        self.assertEqual(summary['Total Cost'], f'{self.small.total_cost:.2f}')
+
+    @override_settings(REPORT_BACKEND='thread')
+    def test_report_queued_off_request(self):
+        response = self.client.get(reverse('lighting:generate_report', args=(self.large.id, 'pdf')))
+        self.assertTemplateUsed(response, 'lighting/report_status.html')
+        report = self.large.reports.get()
+        status = self.client.get(reverse('lighting:report_status', args=(report.id,))).json()
+        self.assertEqual(status['status'], 'pending')
+
+
+class CADParserTests(TestCase):
+    """The streaming DXF reader agrees with ezdxf"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.directory = tempfile.mkdtemp()
+        doc = ezdxf.new('R2010')
+        doc.header['$INSUNITS'] = 4
+        modelspace = doc.modelspace()
+        modelspace.add_lwpolyline([(0, 0), (6000, 0), (6000, 4000), (0, 4000)], close=True, dxfattribs={'layer': 'ROOMS'})
+        modelspace.add_lwpolyline([(0, 0), (100, 0), (100, 100)], dxfattribs={'layer': 'ROOMS'})
+        modelspace.add_lwpolyline(
+            [(8000, 0), (12000.5, 0), (12000.5, 3000.25), (10000, 5000), (8000, 3000.25)], close=True,
+            dxfattribs={'layer': 'ROOMS'},
+        )
+        # Only LWPOLYLINE outlines are rooms; both readers skip POLYLINE entities
+        modelspace.add_polyline2d([(0, 0), (50, 0), (50, 50), (0, 50)], close=True, dxfattribs={'layer': 'ROOMS'})
+        modelspace.add_polyline3d([(0, 0, 0), (10, 0, 5), (10, 10, 0)], close=True)
+        doc.blocks.new('LED-1500')
+        for x, y in ((1500, 1000), (4500.5, 3000), (10000, 2000)):
+            modelspace.add_blockref('LED-1500', (x, y), dxfattribs={'layer': 'LIGHTS', 'rotation': 90})
+        cls.ascii_path = os.path.join(cls.directory, 'plan.dxf')
+        cls.binary_path = os.path.join(cls.directory, 'plan_binary.dxf')
+        doc.saveas(cls.ascii_path)
+        doc.saveas(cls.binary_path, fmt='bin')
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.directory, ignore_errors=True)
+        super().tearDownClass()
+
+    def assertSameParse(self, streamed, loaded):
+        self.assertTrue(streamed['success'], streamed.get('error'))
+        self.assertTrue(loaded['success'], loaded.get('error'))
+        self.assertEqual(streamed['blocks'], loaded['blocks'])
+        self.assertEqual(streamed['rooms'], loaded['rooms'])
+
+    def test_streaming_matches_ezdxf(self):
+        self.assertTrue(is_ascii_dxf(self.ascii_path))
+        streamed = parse_cad(self.ascii_path, streaming=True)
+        self.assertSameParse(streamed, parse_cad(self.ascii_path, streaming=False))
+
+        self.assertEqual(streamed['total_blocks'], 3)
+        self.assertEqual([len(room['points']) for room in streamed['rooms']], [4, 5])
+        self.assertEqual(streamed['blocks'][1]['x'], 4500.5)
+        self.assertEqual(streamed['rooms'][1]['points'][1][:2], (12000.5, 0))
+
+        streamed = parse_cad_columnar(self.ascii_path, streaming=True)
+        loaded = parse_cad_columnar(self.ascii_path, streaming=False)
+        self.assertEqual(streamed.insunits, 4)
+        self.assertEqual(loaded.insunits, 4)
+        self.assertEqual(streamed.unit_scale, loaded.unit_scale)
+        np.testing.assert_array_equal(streamed.vertices, loaded.vertices)
+        np.testing.assert_array_equal(streamed.offsets, loaded.offsets)
+
+    def test_binary_file_falls_back_to_ezdxf(self):
+        self.assertFalse(is_ascii_dxf(self.binary_path))
+        self.assertSameParse(parse_cad(self.binary_path, streaming=True), parse_cad(self.ascii_path, streaming=False))
+
+    def test_non_ascii_layer_names(self):
+        # R2010 files are UTF-8, R2000 files use the ANSI code page
+        for version in ('R2010', 'R2000'):
+            doc = ezdxf.new(version)
+            doc.modelspace().add_lwpolyline(
+                [(0, 0), (3000, 0), (3000, 3000), (0, 3000)], close=True, dxfattribs={'layer': 'Küche'},
+            )
+            doc.modelspace().add_blockref('Leuchte-Ø60', (1500, 1500), dxfattribs={'layer': 'Büro'})
+            path = os.path.join(self.directory, f'non_ascii_{version}.dxf')
+            doc.saveas(path)
+
+            streamed = parse_cad(path, streaming=True)
+            self.assertSameParse(streamed, parse_cad(path, streaming=False))
+            self.assertEqual(streamed['rooms'][0]['layer'], 'Küche')
+            self.assertEqual(streamed['blocks'][0]['block_name'], 'Leuchte-Ø60')
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class ParseCacheTests(TestCase):
+    """Parsed geometry is reused for identical bytes and evicted by age"""
+
+    def setUp(self):
+        parse_cache.purge()
+        cache.delete_many([parse_cache.HITS_KEY, parse_cache.MISSES_KEY])
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+
+    def write_dxf(self, name, width):
+        doc = ezdxf.new('R2010')
+        doc.modelspace().add_lwpolyline([(0, 0), (width, 0), (width, 3000), (0, 3000)], close=True)
+        path = os.path.join(self.directory, name)
+        doc.saveas(path)
+        return path
+
+    def test_hit_and_miss(self):
+        path = self.write_dxf('plan.dxf', 4000)
+        first, content_hash = parse_cache.parse_cad_cached(path)
+        second, second_hash = parse_cache.parse_cad_cached(path)
+        self.assertEqual(second_hash, content_hash)
+        np.testing.assert_array_equal(second.vertices, first.vertices)
+        self.assertEqual(parse_cache.cache_stats()['hits'], 1)
+        self.assertEqual(parse_cache.cache_stats()['misses'], 1)
+
+        # One changed byte is a different file
+        changed = self.write_dxf('changed.dxf', 5000)
+        _, changed_hash = parse_cache.parse_cad_cached(changed)
+        self.assertNotEqual(changed_hash, content_hash)
+        stats = parse_cache.cache_stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['entries']), (1, 2, 2))
+
+    def test_evicts_least_recently_used(self):
+        geometry = parse_cad_columnar(self.write_dxf('plan.dxf', 4000))
+        hashes = ['a' * 64, 'b' * 64, 'c' * 64]
+        for age, content_hash in zip((300, 200, 100), hashes):
+            parse_cache.store_parsed(content_hash, geometry)
+            path = parse_cache.get_cache_path(content_hash)
+            os.utime(path, (os.path.getmtime(path) - age,) * 2)
+        entry_size = os.path.getsize(parse_cache.get_cache_path(hashes[0]))
+
+        # Reading the oldest entry makes it the most recently used
+        self.assertIsNotNone(parse_cache.get_cached_parse(hashes[0]))
+        self.assertEqual(parse_cache.evict(2 * entry_size), 1)
+        self.assertFalse(os.path.exists(parse_cache.get_cache_path(hashes[1])))
+        self.assertTrue(os.path.exists(parse_cache.get_cache_path(hashes[0])))
+
+        with override_settings(CAD_PARSE_CACHE_MAX_BYTES=entry_size):
+            parse_cache.store_parsed('d' * 64, geometry)
+        stats = parse_cache.cache_stats()
+        self.assertEqual(stats['entries'], 1)
+        self.assertLessEqual(stats['bytes'], entry_size)
+        self.assertIsNotNone(parse_cache.get_cached_parse('d' * 64))
+
+    def test_purge_command(self):
+        parse_cache.parse_cad_cached(self.write_dxf('plan.dxf', 4000))
+        parse_cache.parse_cad_cached(self.write_dxf('other.dxf', 5000))
+        self.assertEqual(parse_cache.cache_stats()['entries'], 2)
+
+        call_command('cad_parse_cache', 'purge', stdout=StringIO())
+        stats = parse_cache.cache_stats()
+        self.assertEqual((stats['entries'], stats['bytes']), (0, 0))
+
+
+class PolygonAreaTests(TestCase):
+    """Vectorized areas and the drawing unit scale"""
+
+    @staticmethod
+    def shoelace(points):
+        area = 0.0
+        for i in range(len(points)):
+            x1, y1 = points[i]
+            x2, y2 = points[(i + 1) % len(points)]
+            area += x1 * y2 - x2 * y1
+        return abs(area) / 2.0 if len(points) >= 3 else 0.0
+
+    def test_matches_per_polygon_loop(self):
+        rng = np.random.default_rng(0)
+        polygons = [
+            [(0, 0), (4000, 0), (4000, 3000), (0, 3000)],                 # counter-clockwise, open ring
+            [(0, 0), (0, 3000), (4000, 3000), (4000, 0)],                 # clockwise
+            [(0, 0), (4000, 0), (4000, 3000), (0, 3000), (0, 0)],         # ring repeating its first vertex
+            [(0, 0), (12, 0), (12, 4), (4, 4), (4, 10), (0, 10)][::-1],   # concave, clockwise
+            [(5e6, 5e6), (5e6 + 3000, 5e6), (5e6 + 3000, 5e6 + 2000)],    # far from the origin
+            [(0, 0), (10, 10)],                                           # degenerate
+            [],
+        ]
+        for _ in range(20):
+            angles = np.sort(rng.uniform(0, 2 * np.pi, rng.integers(3, 12)))
+            if rng.random() < 0.5:
+                angles = angles[::-1]
+            radii = rng.uniform(1000, 5000, len(angles))
+            polygons.append(list(zip(radii * np.cos(angles), radii * np.sin(angles))))
+
+        vertices = np.array([point for polygon in polygons for point in polygon], dtype=float)
+        offsets = np.concatenate([[0], np.cumsum([len(polygon) for polygon in polygons])])
+        areas = calculate_polygon_areas(vertices, offsets)
+
+        self.assertEqual(len(areas), len(polygons))
+        for polygon, area in zip(polygons, areas):
+            self.assertAlmostEqual(area, self.shoelace(polygon), delta=1e-9 * max(area, 1.0))
+        self.assertEqual(areas[0], areas[1])
+        self.assertEqual(areas[0], areas[2])
+
+    def test_insunits_take_precedence_over_median(self):
+        # 20 m² rooms drawn in millimeters: the median alone infers millimeters
+        millimeter_rooms = np.array([16e6, 20e6, 24e6])
+        self.assertEqual(infer_unit_scale(millimeter_rooms), 0.001)
+        # The same numbers are plausible in centimeters (2000 m²), so the header wins
+        self.assertEqual(infer_unit_scale(millimeter_rooms, insunits=5), INSUNITS_TO_METERS[5])
+        # A header giving implausible room sizes is ignored
+        self.assertEqual(infer_unit_scale(millimeter_rooms, insunits=6), 0.001)
+
+        # 200 ft² rooms: the median alone would guess meters
+        feet_rooms = np.array([150.0, 200.0, 250.0])
+        self.assertEqual(infer_unit_scale(feet_rooms), 1.0)
+        self.assertEqual(infer_unit_scale(feet_rooms, insunits=2), INSUNITS_TO_METERS[2])
+
+        self.assertEqual(infer_unit_scale(np.array([]), insunits=1), INSUNITS_TO_METERS[1])
+
+
+class RoomIndexTests(TestCase):
+    """Grid-indexed room assignment agrees with testing every room"""
+
+    def setUp(self):
+        self.polygons = [
+            np.array([[0, 0], [40, 0], [40, 30], [0, 30]], dtype=float),                    # building outline
+            np.array([[2, 2], [12, 2], [12, 6], [6, 6], [6, 14], [2, 14]], dtype=float),    # concave (L-shaped)
+            np.array([[12, 2], [20, 2], [20, 10], [12, 10]], dtype=float),                  # shares an edge with the L
+            np.array([[18, 8], [28, 8], [28, 18], [18, 18]], dtype=float),                  # overlaps the previous room
+            np.array([[22, 12], [26, 12], [26, 16], [22, 16]], dtype=float),                # nested in the previous room
+            np.array([[50, 50], [60, 50], [55, 58]], dtype=float),                          # apart from the rest
+        ]
+        self.vertices = np.vstack(self.polygons)
+        self.offsets = np.concatenate([[0], np.cumsum([len(polygon) for polygon in self.polygons])])
+        self.areas = calculate_polygon_areas(self.vertices, self.offsets)
+
+    def brute_force(self, x, y):
+        expected = np.full(len(x), -1)
+        for point in range(len(x)):
+            containing = [
+                room for room, polygon in enumerate(self.polygons)
+                if points_in_polygon(x[point:point + 1], y[point:point + 1], polygon)[0]
+            ]
+            if containing:
+                expected[point] = min(containing, key=lambda room: (self.areas[room], room))
+        return expected
+
+    def test_matches_brute_force(self):
+        rng = np.random.default_rng(0)
+        x = np.concatenate([rng.uniform(-5, 65, 2000), [8, 4, 12, 12, 24, 19, -1, 45, 55]])
+        y = np.concatenate([rng.uniform(-5, 65, 2000), [10, 10, 4, 2, 14, 9, -1, 45, 40]])
+        expected = self.brute_force(x, y)
+
+        for cell_size in (None, 1.0, 100.0):
+            assigned = RoomIndex(self.vertices, self.offsets, cell_size).assign(x, y)
+            np.testing.assert_array_equal(assigned, expected)
+
+        special = expected[-9:]
+        self.assertEqual(special[0], 0)      # in the notch of the L: only the building
+        self.assertEqual(special[1], 1)      # inside the L
+        self.assertEqual(special[2], 2)      # on the edge shared by two rooms: exactly one of them
+        self.assertEqual(special[4], 4)      # nested room beats its parent
+        self.assertEqual(special[5], 2)      # overlap resolves to the smaller room
+        self.assertEqual(list(special[6:]), [-1, -1, -1])    # outside every room
+
+    def test_empty_inputs(self):
+        self.assertEqual(len(RoomIndex(self.vertices, self.offsets).assign(np.array([]), np.array([]))), 0)
+        no_rooms = RoomIndex(np.zeros((0, 2)), np.array([0]))
+        np.testing.assert_array_equal(no_rooms.assign(np.array([1.0]), np.array([1.0])), [-1])
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class CADProcessingTests(TestCase):
+    """Uploaded drawings become rooms and fixtures"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('drafter', password='secret')
+        cls.catalog = LightingCatalog.objects.create(
+            symbol_name='LED-1500', model_number='M1500', brand='Test', lumens=1500,
+            wattage=15, beam_angle=90, color_temp=4000, unit_cost=Decimal('150.00'),
+        )
+
+    def setUp(self):
+        parse_cache.purge()
+
+    def upload(self, inserts, block='LED-1500', outlines=True):
+        """CADFile for a drawing with two 6 m x 4 m rooms (or none) and inserts (meters) of one block"""
+        doc = ezdxf.new('R2010')
+        doc.header['$INSUNITS'] = 4
+        modelspace = doc.modelspace()
+        for left in (0, 6000) if outlines else ():
+            modelspace.add_lwpolyline(
+                [(left, 0), (left + 6000, 0), (left + 6000, 4000), (left, 4000)], close=True,
+            )
+        doc.blocks.new(block)
+        for x, y in inserts:
+            modelspace.add_blockref(block, (x * 1000, y * 1000))
+        stream = StringIO()
+        doc.write(stream)
+        return CADFile.objects.create(
+            user=self.user, filename='plan.dxf',
+            file=ContentFile(stream.getvalue().encode('utf-8'), name='plan.dxf'),
+        )
+
+    def test_inserts_outside_every_room_are_unassigned(self):
+        cad_file = self.upload([(1, 1), (2, 1), (8, 2), (20, 20), (-3, 1)])
+        self.assertTrue(process_cad_file(cad_file))
+
+        quantities = {
+            room.name: sum(fixture.quantity for fixture in room.fixtures.all())
+            for room in cad_file.rooms.prefetch_related('fixtures')
+        }
+        self.assertEqual(quantities, {'Main Area': 2, 'Room 2': 1, 'Unassigned': 2})
+        unassigned = cad_file.rooms.get(is_unassigned=True)
+        self.assertEqual(unassigned.required_lux, 0)
+
+    def test_layout_only_for_drawings_without_fixture_blocks(self):
+        invalidate_catalog_index()
+        unmapped = self.upload([(1, 1), (2, 1), (3, 1), (8, 2), (9, 2)], block='ZZQQXX')
+        self.assertTrue(process_cad_file(unmapped))
+        self.assertFalse(Fixture.objects.filter(room__cad_file=unmapped).exists())
+        self.assertEqual(
+            [(row['symbol'], row['inserts']) for row in unmapped.symbol_report['unmapped']], [('ZZQQXX', 5)],
+        )
+
+        blank = self.upload([])
+        self.assertTrue(process_cad_file(blank))
+        laid_out = Fixture.objects.filter(room__cad_file=blank)
+        self.assertEqual(set(laid_out.values_list('room__name', flat=True)), {'Main Area', 'Room 2'})
+        self.assertEqual(set(laid_out.values_list('lighting_catalog', flat=True)), {self.catalog.id})
+
+        # The default room of a drawing without outlines has no shape to lay out
+        no_outlines = self.upload([], outlines=False)
+        self.assertTrue(process_cad_file(no_outlines))
+        self.assertEqual(list(no_outlines.rooms.values_list('name', flat=True)), ['Main Area'])
+        self.assertFalse(Fixture.objects.filter(room__cad_file=no_outlines).exists())
+
+    def test_failed_fixture_insert_rolls_back(self):
+        cad_file = self.upload([(1, 1), (8, 2)])
+        with mock.patch.object(Fixture.objects, 'bulk_create', side_effect=IntegrityError('fixture insert failed')):
+            self.assertFalse(process_cad_file(cad_file))
+
+        cad_file.refresh_from_db()
+        self.assertEqual(cad_file.status, 'failed')
+        self.assertEqual(cad_file.error_message, 'fixture insert failed')
+        self.assertFalse(Room.objects.filter(cad_file=cad_file).exists())
+        self.assertFalse(Fixture.objects.filter(room__cad_file=cad_file).exists())
+        self.assertEqual(cad_file.fixture_count, 0)
+
+    def test_fixture_selection_applies_to_the_next_upload(self):
+        invalidate_catalog_index()
+        choice = LightingCatalog.objects.create(
+            symbol_name='PANEL-3000', model_number='P3000', brand='Test', lumens=3000,
+            wattage=30, beam_angle=90, color_temp=4000, unit_cost=Decimal('300.00'),
+        )
+        cad_file = self.upload([(1, 1), (8, 2)], block='LED-1500-EM')
+        self.assertTrue(process_cad_file(cad_file))
+        fixture = Fixture.objects.filter(room__cad_file=cad_file).first()
+        self.assertEqual(fixture.lighting_catalog, self.catalog)
+
+        self.client.force_login(self.user)
+        response = self.client.post(
+            reverse('lighting:update_fixture'),
+            data={'fixture_id': fixture.id, 'catalog_id': choice.id}, content_type='application/json',
+        )
+        self.assertTrue(response.json()['success'])
+        entry = SymbolLegend.objects.get(user=self.user, cad_symbol='LED-1500-EM')
+        self.assertEqual((entry.lighting_catalog, entry.source), (choice, 'selection'))
+
+        repeat = self.upload([(1, 1), (8, 2)], block='LED-1500-EM')
+        with mock.patch.object(SymbolMatcher, 'match', side_effect=AssertionError('symbol was matched')):
+            self.assertTrue(process_cad_file(repeat))
+        self.assertEqual(
+            set(Fixture.objects.filter(room__cad_file=repeat).values_list('lighting_catalog', flat=True)), {choice.id},
+        )
+        self.assertEqual(repeat.symbol_report, {'unmapped': [], 'low_confidence': []})
+        # The selection is not replaced by the matcher's suggestion
+        self.assertEqual(SymbolLegend.objects.get(user=self.user, cad_symbol='LED-1500-EM').source, 'selection')
+
+    def test_only_confirmed_mappings_are_remembered(self):
+        invalidate_catalog_index()
+        self.assertTrue(process_cad_file(self.upload([(1, 1)], block='LED-1500-EM')))
+        self.assertFalse(SymbolLegend.objects.exists())
+
+        # An unconfirmed suggestion stored earlier does not apply
+        other = LightingCatalog.objects.create(
+            symbol_name='LED-1500-EM', model_number='M1500E', brand='Test', lumens=1500,
+            wattage=15, beam_angle=90, color_temp=4000, unit_cost=Decimal('180.00'),
+        )
+        invalidate_catalog_index()
+        SymbolLegend.objects.create(
+            user=self.user, cad_symbol='LED-1500-EM', lighting_catalog=self.catalog, source='matcher',
+        )
+        cad_file = self.upload([(1, 1)], block='LED-1500-EM')
+        self.assertTrue(process_cad_file(cad_file))
+        self.assertEqual(Fixture.objects.get(room__cad_file=cad_file).lighting_catalog, other)
+
+        cad_file = self.upload([(1, 1)], block='LAMP-A')
+        self.assertTrue(process_cad_file(cad_file, legend={'LAMP-A': 'LED-1500'}))
+        entry = SymbolLegend.objects.get(user=self.user, cad_symbol='LAMP-A')
+        self.assertEqual((entry.lighting_catalog, entry.source), (self.catalog, 'legend'))
+
+    def test_failed_legend_write_keeps_the_analysis(self):
+        cad_file = self.upload([(1, 1), (8, 2)], block='LAMP-A')
+        with mock.patch.object(
+            SymbolLegend.objects, 'bulk_create', side_effect=IntegrityError('legend insert failed')
+        ), self.assertLogs('lighting.utils', 'ERROR'):
+            self.assertTrue(process_cad_file(cad_file, legend={'LAMP-A': 'LED-1500'}))
+
+        cad_file.refresh_from_db()
+        self.assertEqual(cad_file.status, 'completed')
+        self.assertFalse(cad_file.error_message)
+        self.assertEqual(Fixture.objects.filter(room__cad_file=cad_file).count(), 2)
+        self.assertFalse(SymbolLegend.objects.exists())
+
+    def test_insertion_points_round_trip(self):
+        cad_file = CADFile.objects.create(user=self.user, filename='plan.dxf', file='cad_files/plan.dxf')
+        room = Room.objects.create(cad_file=cad_file, name='Office', area=6, height=3)
+        x = [1234.5678901234, -0.1, 1e7 + 0.25]
+        y = [0.0, 9876.54321, -3.3333333333333335]
+        rotation = [0.0, 45.5, 359.999]
+        fixture = Fixture.objects.create(
+            room=room, lighting_catalog=self.catalog, quantity=3, points=Fixture.pack_points(x, y, rotation),
+        )
+
+        points = Fixture.objects.get(pk=fixture.pk).insertion_points
+        self.assertEqual(points.shape, (3, 3))
+        self.assertEqual(points.dtype, np.float64)
+        np.testing.assert_array_equal(points, np.column_stack([x, y, rotation]))
+        self.assertFalse(points.flags.writeable)
+
+        # No recorded points: fall back to the single coordinate, or to nothing
+        self.assertEqual(Fixture.pack_points([], [], []), b'')
+        empty = Fixture.objects.create(room=room, lighting_catalog=self.catalog, points=Fixture.pack_points([], [], []))
+        self.assertEqual(Fixture.objects.get(pk=empty.pk).insertion_points.shape, (0, 3))
+        legacy = Fixture(room=room, lighting_catalog=self.catalog, x_coordinate=2.5, y_coordinate=-1.5)
+        np.testing.assert_array_equal(legacy.insertion_points, [[2.5, -1.5, 0.0]])
+
+
+class AggregateSignalTests(TestCase):
+    """Stored room and project totals track fixture changes, row by row or batched"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('estimator', password='secret')
+        cls.small_item, cls.large_item = [
+            LightingCatalog.objects.create(
+                symbol_name=f'PANEL-{lumens}', model_number=f'P{lumens}', brand='Test', lumens=lumens,
+                wattage=lumens / 100, beam_angle=90, color_temp=4000, unit_cost=Decimal(lumens) / 8,
+            )
+            for lumens in (1200, 3600)
+        ]
+        cls.cad_file = CADFile.objects.create(user=cls.user, filename='plan.dxf', file='cad_files/plan.dxf')
+        cls.rooms = [
+            Room.objects.create(cad_file=cls.cad_file, name=f'Room {number}', area=12 + 4 * number, required_lux=300)
+            for number in range(3)
+        ]
+
+    def assertAggregatesCurrent(self):
+        rooms = list(Room.objects.filter(cad_file=self.cad_file).with_lighting_metrics().order_by('id'))
+        for room in rooms:
+            self.assertEqual(room.total_lumens, room.live_total_lumens)
+            self.assertEqual(room.fixture_count, room.live_fixture_count)
+            self.assertEqual(room.total_cost, room.live_total_cost)
+            self.assertAlmostEqual(room.current_lux, room.live_current_lux, places=2)
+
+        cad_file = CADFile.objects.get(pk=self.cad_file.pk)
+        self.assertEqual(cad_file.total_lumens, sum(room.live_total_lumens for room in rooms))
+        self.assertEqual(cad_file.fixture_count, sum(room.live_fixture_count for room in rooms))
+        self.assertEqual(cad_file.total_cost, sum((room.live_total_cost for room in rooms), Decimal('0.00')))
+        lux = [room.live_current_lux for room in rooms if not room.is_unassigned]
+        self.assertAlmostEqual(cad_file.average_lux, sum(lux) / len(lux) if lux else 0.0, places=1)
+        return cad_file
+
+    def test_row_by_row_changes(self):
+        fixture = Fixture.objects.create(room=self.rooms[0], lighting_catalog=self.small_item, quantity=2)
+        self.assertAggregatesCurrent()
+
+        fixture.quantity = 5
+        fixture.save()
+        self.assertAggregatesCurrent()
+
+        fixture = Fixture.objects.get(pk=fixture.pk)
+        fixture.lighting_catalog = self.large_item
+        fixture.save()
+        self.assertAggregatesCurrent()
+
+        fixture.room = self.rooms[1]
+        fixture.save()
+        self.assertAggregatesCurrent()
+
+        fixture.delete()
+        cad_file = self.assertAggregatesCurrent()
+        self.assertEqual(cad_file.fixture_count, 0)
+
+    def create_fixtures(self, room, count):
+        return [Fixture.objects.create(room=room, lighting_catalog=self.small_item, quantity=1) for _ in range(count)]
+
+    def test_batched_changes(self):
+        fixtures = self.create_fixtures(self.rooms[0], 4) + self.create_fixtures(self.rooms[1], 3)
+
+        changes = [{'fixture_id': fixture.id, 'catalog_id': self.large_item.id} for fixture in fixtures[::2]]
+        revision = CADFile.objects.get(pk=self.cad_file.pk).revision
+        with CaptureQueriesContext(connection) as few:
+            apply_selection(self.cad_file, changes[:1])
+        with CaptureQueriesContext(connection) as many:
+            apply_selection(self.cad_file, changes[1:])
+        self.assertAggregatesCurrent()
+        # One rebuild per batch: only the fixture UPDATEs grow with the batch
+        self.assertEqual(len(many.captured_queries) - len(few.captured_queries), len(changes) - 2)
+        self.assertGreater(CADFile.objects.get(pk=self.cad_file.pk).revision, revision)
+
+        auto_layout(self.cad_file, self.large_item, room_ids=[self.rooms[0].id, self.rooms[2].id], replace=True)
+        self.assertAggregatesCurrent()
+        self.assertFalse(Fixture.objects.filter(room=self.rooms[0], lighting_catalog=self.small_item).exists())
+
+        with deferred_aggregates():
+            Fixture.objects.filter(room=self.rooms[1]).update(quantity=7)
+            for fixture in Fixture.objects.filter(room=self.rooms[1]):
+                fixture.save()
+        self.assertAggregatesCurrent()
+
+    def test_cascade_deletes_run_constant_queries(self):
+        counts = []
+        for room, fixture_count in zip(self.rooms[:2], (3, 40)):
+            self.create_fixtures(room, fixture_count)
+            with CaptureQueriesContext(connection) as context:
+                Room.objects.get(pk=room.pk).delete()
+            counts.append(len(context.captured_queries))
+            self.assertAggregatesCurrent()
+        self.assertEqual(counts[0], counts[1])
+
+        self.create_fixtures(self.rooms[2], 5)
+        Room.objects.filter(cad_file=self.cad_file).delete()
+        cad_file = self.assertAggregatesCurrent()
+        self.assertEqual((cad_file.fixture_count, cad_file.total_lumens), (0, 0))
+
+        cad_file.delete()
+        self.assertFalse(CADFile.objects.filter(pk=cad_file.pk).exists())
+
+
+class CatalogRecommendationTests(TestCase):
+    """In-memory budget bands agree with the database queries they replaced"""
+
+    @classmethod
+    def setUpTestData(cls):
+        rng = np.random.default_rng(0)
+        # Few distinct values so band limits and sort keys tie often
+        costs = ['30.00', '80.00', '99.99', '100.00', '100.01', '120.00', '150.00', '150.01', '60.00', '45.50']
+        cls.items = [
+            LightingCatalog.objects.create(
+                symbol_name=f'ITEM-{number}', model_number=f'I{number}', brand='Test',
+                lumens=int(rng.choice([700, 1000, 1200, 1350, 1500, 2000])), wattage=float(rng.choice([8, 12, 15])),
+                beam_angle=90, color_temp=4000, unit_cost=Decimal(str(rng.choice(costs))),
+            )
+            for number in range(60)
+        ]
+
+    def setUp(self):
+        # The process-wide index may hold rows of other tests' rolled-back transactions
+        invalidate_catalog_index()
+
+    @staticmethod
+    def orm_recommend(current_cost, catalog_item, budget_range, limit):
+        """The per-request band queries the index replaced (ties ordered by id)"""
+        base = LightingCatalog.objects.filter(
+            lumens__gte=catalog_item.lumens * 0.65, lumens__lte=catalog_item.lumens * 1.35,
+        ).exclude(id=catalog_item.id)
+        bands = {
+            'below': base.filter(
+                unit_cost__gte=current_cost * Decimal('0.3'), unit_cost__lt=current_cost,
+            ).order_by('unit_cost', '-lumens', 'id'),
+            'within': base.filter(
+                unit_cost__gte=current_cost * Decimal('0.8'), unit_cost__lte=current_cost * Decimal('1.2'),
+            ).order_by('-lumens', 'unit_cost', 'id'),
+            'above': base.filter(
+                unit_cost__gt=current_cost, unit_cost__lte=current_cost * Decimal('1.5'),
+            ).order_by('-lumens', 'unit_cost', 'id'),
+        }
+        recommended = []
+        for band in ('below', 'within', 'above'):
+            if budget_range in (band, 'all'):
+                recommended.extend(item.id for item in bands[band][:limit] if item.id not in recommended)
+        return recommended[:limit]
+
+    def test_index_matches_orm_band_queries(self):
+        index = CatalogIndex(list(LightingCatalog.objects.all()))
+        for item in self.items:
+            for budget_range in ('below', 'within', 'above', 'all'):
+                for limit in (15, 3):
+                    self.assertEqual(
+                        [rec.id for rec in index.recommend(item.unit_cost, item, budget_range, limit)],
+                        self.orm_recommend(item.unit_cost, item, budget_range, limit),
+                        (item.id, budget_range, limit),
+                    )
+
+    def test_sql_efficiency_score_matches_python(self):
+        rng = np.random.default_rng(1)
+        specs = [(1000, 0.0, '250.00'), (1000, 10.0, '0.00'), (0, 10.0, '250.00'), (1500, 12.5, '300')]
+        specs += [
+            (int(rng.integers(100, 20000)), round(float(rng.uniform(0.5, 200)), 1), f'{rng.uniform(1, 5000):.2f}')
+            for _ in range(200)
+        ]
+        LightingCatalog.objects.bulk_create([
+            LightingCatalog(
+                symbol_name=f'SCORE-{number}', model_number=f'S{number}', brand='Test', lumens=lumens,
+                wattage=wattage, beam_angle=90, color_temp=4000, unit_cost=Decimal(cost),
+            )
+            for number, (lumens, wattage, cost) in enumerate(specs)
+        ])
+        scored = LightingCatalog.objects.filter(symbol_name__startswith='SCORE-')
+        scored.update_efficiency_scores()
+
+        rows = list(scored.annotate(sql_score=LightingCatalogQuerySet.efficiency_score_expression()).order_by('id'))
+        self.assertEqual(len(rows), len(specs))
+        for item in rows:
+            self.assertEqual(item.sql_score, calculate_fixture_efficiency_score(item), item.symbol_name)
+            self.assertEqual(item.efficiency_score, calculate_fixture_efficiency_score(item), item.symbol_name)
+        self.assertEqual([item.efficiency_score for item in rows[:3]], [0.0, 0.0, 0.0])
+
+        # The index ranks by the stored column
+        index = CatalogIndex(list(LightingCatalog.objects.all()))
+        for item in rows:
+            self.assertEqual(index.efficiency[index.position_by_id[item.id]], item.efficiency_score)
+
+    def stored_rows(self):
+        return set(FixtureRecommendation.objects.values_list('catalog_item_id', 'band', 'priority', 'recommended_id'))
+
+    def test_bulk_import_refreshes_once_on_commit(self):
+        recommendations.refresh_recommendations()
+
+        with mock.patch.object(
+            recommendations, 'refresh_recommendations', wraps=recommendations.refresh_recommendations
+        ) as refresh:
+            with self.captureOnCommitCallbacks(execute=True) as callbacks:
+                with transaction.atomic():
+                    for number in range(20):
+                        LightingCatalog.objects.create(
+                            symbol_name=f'IMPORT-{number}', model_number=f'N{number}', brand='Import',
+                            lumens=900 + 50 * number, wattage=10, beam_angle=90, color_temp=4000,
+                            unit_cost=Decimal(60 + 3 * number),
+                        )
+                    repriced = LightingCatalog.objects.get(pk=self.items[0].pk)
+                    repriced.unit_cost = Decimal('101.00')
+                    repriced.save()
+                    self.items[1].delete()
+                    self.assertEqual(refresh.call_count, 0)
+            self.assertEqual(len(callbacks), 1)
+            self.assertEqual(refresh.call_count, 1)
+
+        incremental = self.stored_rows()
+        recommendations.refresh_recommendations()
+        self.assertEqual(incremental, self.stored_rows())
+
+    def test_rolled_back_changes_are_not_refreshed(self):
+        with mock.patch.object(
+            recommendations, 'refresh_for_catalog_changes', wraps=recommendations.refresh_for_catalog_changes
+        ) as refresh:
+            with self.captureOnCommitCallbacks(execute=True) as callbacks:
+                with self.assertRaises(IntegrityError), transaction.atomic():
+                    LightingCatalog.objects.create(
+                        symbol_name='DISCARDED', model_number='D1', brand='Import', lumens=1000,
+                        wattage=10, beam_angle=90, color_temp=4000, unit_cost=Decimal('90.00'),
+                    )
+                    raise IntegrityError('import failed')
+                with transaction.atomic():
+                    kept = LightingCatalog.objects.create(
+                        symbol_name='KEPT', model_number='K1', brand='Import', lumens=1000,
+                        wattage=10, beam_angle=90, color_temp=4000, unit_cost=Decimal('90.00'),
+                    )
+            self.assertEqual(len(callbacks), 1)
+        refresh.assert_called_once()
+        self.assertEqual([change.catalog_id for change in refresh.call_args.args[0]], [kept.pk])
+
+    def project_using_items(self, items):
+        user = User.objects.create_user('specifier', password='secret')
+        cad_file = CADFile.objects.create(user=user, filename='plan.dxf', file='cad_files/plan.dxf')
+        room = Room.objects.create(cad_file=cad_file, name='Hall', area=200, required_lux=300)
+        for item in items:
+            Fixture.objects.create(room=room, lighting_catalog=item, quantity=2)
+        return cad_file
+
+    def assertStoredMatchesRebuild(self, cad_file):
+        catalog_ids = Fixture.objects.filter(room__cad_file=cad_file).values_list('lighting_catalog_id', flat=True)
+        stored = recommendations.stored_recommendations(LightingCatalog.objects.filter(pk__in=catalog_ids))
+        rebuilt = recommendations.project_recommendations(cad_file)
+        self.assertEqual(stored.keys(), rebuilt.keys())
+        for pk, bands in rebuilt.items():
+            for band, items in bands.items():
+                self.assertEqual([item.id for item in stored[pk][band]], [item.id for item in items], (pk, band))
+
+    def test_incremental_refresh_matches_full_rebuild(self):
+        cad_file = self.project_using_items(self.items[:20])
+        recommendations.refresh_recommendations()
+        self.assertStoredMatchesRebuild(cad_file)
+
+        def change(item, **values):
+            previous = (item.lumens, item.unit_cost, item.wattage)
+            for field, value in values.items():
+                setattr(item, field, value)
+            # Call the incremental refresh directly instead of on commit
+            with mock.patch.object(recommendations, 'schedule_catalog_refresh'):
+                item.save()
+            invalidate_catalog_index()
+            recommendations.refresh_for_catalog_change(item, previous)
+            self.assertStoredMatchesRebuild(cad_file)
+
+        change(self.items[3], unit_cost=Decimal('100.00'))
+        change(self.items[5], unit_cost=Decimal('45.00'))
+        change(self.items[30], lumens=1100)
+        change(self.items[31], lumens=1400, unit_cost=Decimal('99.00'))
+
+        added = LightingCatalog.objects.bulk_create([LightingCatalog(
+            symbol_name='ADDED', model_number='A1', brand='Test', lumens=1250, wattage=9,
+            beam_angle=90, color_temp=4000, unit_cost=Decimal('98.00'),
+        )])[0]
+        invalidate_catalog_index()
+        recommendations.refresh_for_catalog_change(added)
+        self.assertStoredMatchesRebuild(cad_file)
+
+        removed = self.items[40]
+        with mock.patch.object(recommendations, 'schedule_catalog_refresh'):
+            removed.delete()
+        invalidate_catalog_index()
+        recommendations.refresh_for_catalog_change(removed, deleted=True)
+        self.assertStoredMatchesRebuild(cad_file)
+
+    def test_reading_stored_recommendations_writes_nothing(self):
+        cad_file = self.project_using_items(self.items[:5])
+        recommendations.refresh_recommendations([item.id for item in self.items[1:5]])
+
+        with CaptureQueriesContext(connection) as context:
+            self.assertStoredMatchesRebuild(cad_file)
+        self.assertTrue(all(query['sql'].startswith('SELECT') for query in context.captured_queries))
+        self.assertIsNone(LightingCatalog.objects.get(pk=self.items[0].pk).recommendations_updated_at)
+
+        call_command('refresh_recommendations', '--missing', stdout=StringIO())
+        self.assertFalse(LightingCatalog.objects.filter(recommendations_updated_at__isnull=True).exists())
+        self.assertStoredMatchesRebuild(cad_file)
+
+
+class ProjectOptimizerTests(TestCase):
+    """Room-by-room knapsack and the budget relaxation against exhaustive search"""
+
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create_user('optimizer', password='secret')
+        specs = [(800, 8, 100), (1200, 10, 180), (1500, 18, 140), (2000, 15, 320), (2500, 30, 210), (3000, 22, 450)]
+        cls.items = [
+            LightingCatalog.objects.create(
+                symbol_name=f'OPT-{lumens}', model_number=f'O{lumens}', brand='Test', lumens=lumens,
+                wattage=wattage, beam_angle=90, color_temp=4000, unit_cost=Decimal(cost),
+            )
+            for lumens, wattage, cost in specs
+        ]
+        cls.cad_file = CADFile.objects.create(user=user, filename='plan.dxf', file='cad_files/plan.dxf')
+        office = Room.objects.create(cad_file=cls.cad_file, name='Office', area=20, required_lux=300)
+        store = Room.objects.create(cad_file=cls.cad_file, name='Store', area=12, required_lux=200)
+        for room, item, quantity in ((office, 0, 3), (office, 2, 4), (store, 1, 4)):
+            Fixture.objects.create(room=room, lighting_catalog=cls.items[item], quantity=quantity)
+
+    def setUp(self):
+        self.index = CatalogIndex(list(LightingCatalog.objects.filter(symbol_name__startswith='OPT-')))
+        self.optimizer = ProjectOptimizer(self.cad_file, None, self.index)
+
+    def enumerate_selections(self):
+        """Every selection of the project: (choices per room, cost, wattage, rooms lit)"""
+        positions = range(len(self.index))
+        groups = [fixture for room_groups in self.optimizer.room_groups for fixture, _ in room_groups]
+        for flat in itertools.product(positions, repeat=len(groups)):
+            selection, lit, start = [], [], 0
+            for room, room_groups in zip(self.optimizer.rooms, self.optimizer.room_groups):
+                choices = list(flat[start:start + len(room_groups)])
+                start += len(room_groups)
+                lumens = sum(self.index.lumens[position] * fixture.quantity for (fixture, _), position in zip(room_groups, choices))
+                selection.append(choices)
+                lit.append(lumens >= ProjectOptimizer.required_lumens(room))
+            yield (
+                selection,
+                self.optimizer.total(selection, self.optimizer.cost),
+                self.optimizer.total(selection, self.index.wattage),
+                all(lit),
+            )
+
+    def test_cost_objective_is_optimal(self):
+        selection, met = self.optimizer.optimize('cost')
+        self.assertTrue(all(met))
+        best = min(cost for _, cost, _, lit in self.enumerate_selections() if lit)
+        self.assertEqual(self.optimizer.total(selection, self.optimizer.cost), best)
+
+        proposal = self.optimizer.proposal(selection, met, 'cost')
+        self.assertTrue(proposal['all_rooms_lit'])
+        for room in proposal['rooms']:
+            self.assertGreaterEqual(room['proposed_lux'], room['required_lux'])
+
+    def test_wattage_objective_within_budget(self):
+        unconstrained = min(wattage for _, _, wattage, lit in self.enumerate_selections() if lit)
+        selection, met = self.optimizer.optimize('wattage')
+        self.assertTrue(all(met))
+        self.assertAlmostEqual(self.optimizer.total(selection, self.index.wattage), unconstrained)
+
+        cheapest = min(cost for _, cost, _, lit in self.enumerate_selections() if lit)
+        budget = Decimal(int(cheapest * 1.2)) / 100
+        # The lowest-wattage selection does not fit, so the budget binds
+        self.assertGreater(self.optimizer.total(selection, self.optimizer.cost), float(budget) * 100)
+        selection, met = self.optimizer.optimize('wattage', budget)
+        self.assertTrue(all(met))
+        self.assertLessEqual(self.optimizer.total(selection, self.optimizer.cost), float(budget) * 100)
+        # The relaxation may miss the exact optimum but never beats it
+        best = min(
+            wattage for _, cost, wattage, lit in self.enumerate_selections()
+            if lit and cost <= float(budget) * 100
+        )
+        self.assertGreaterEqual(self.optimizer.total(selection, self.index.wattage), best - 1e-9)
+        self.assertTrue(self.optimizer.proposal(selection, met, 'wattage', budget)['budget_met'])
+
+    def test_infeasible_budget_returns_cheapest(self):
+        cheapest = min(cost for _, cost, _, lit in self.enumerate_selections() if lit)
+        budget = Decimal(int(cheapest) - 100) / 100
+        selection, met = self.optimizer.optimize('wattage', budget)
+        self.assertTrue(all(met))
+        self.assertEqual(self.optimizer.total(selection, self.optimizer.cost), cheapest)
+        proposal = self.optimizer.proposal(selection, met, 'wattage', budget)
+        self.assertFalse(proposal['budget_met'])
+        self.assertTrue(proposal['all_rooms_lit'])
+
+    def test_unreachable_lux_picks_brightest(self):
+        Room.objects.filter(name='Store', cad_file=self.cad_file).update(required_lux=5000)
+        optimizer = ProjectOptimizer(self.cad_file, None, self.index)
+        selection, met = optimizer.optimize('cost')
+        self.assertEqual(met, [True, False])
+        brightest = int(np.argmax(self.index.lumens))
+        self.assertEqual(selection[1], [brightest])
+
+
+class SymbolMatcherTests(TestCase):
+    """CAD block names resolve exactly, by normalized key or by trigram similarity"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.items = {
+            name: LightingCatalog.objects.create(
+                symbol_name=name, model_number=f'M-{name}', brand='Test', lumens=1000,
+                wattage=10, beam_angle=90, color_temp=4000, unit_cost=Decimal('100.00'),
+            )
+            for name in ('LED-PANEL-600', 'DOWNLIGHT-12W', 'TRACK-SPOT', 'LED-STRIP')
+        }
+
+    def setUp(self):
+        self.matcher = SymbolMatcher(CatalogIndex(list(self.items.values())))
+
+    def test_exact_and_normalized_names(self):
+        self.assertEqual(self.matcher.match('LED-PANEL-600'), SymbolMatch(self.items['LED-PANEL-600'], 1.0, 'exact'))
+        self.assertEqual(self.matcher.match('led panel_600'), SymbolMatch(self.items['LED-PANEL-600'], 1.0, 'normalized'))
+        self.assertEqual(self.matcher.match(' Track--Spot '), SymbolMatch(self.items['TRACK-SPOT'], 1.0, 'normalized'))
+
+    def test_fuzzy_match_picks_the_most_similar_symbol(self):
+        match = self.matcher.match('TRACK SPOTS')
+        self.assertEqual(match, SymbolMatch(self.items['TRACK-SPOT'], 0.769, 'fuzzy'))
+        # Memoized for the matcher's lifetime
+        self.assertIs(self.matcher.match('TRACK SPOTS'), match)
+        # No trigram in common with any catalog symbol
+        self.assertEqual(self.matcher.match('XYZ'), SymbolMatch(None, 0.0, 'none'))
+
+    def test_memo_is_bounded(self):
+        with mock.patch.object(symbol_matcher, 'RESOLVED_CACHE_SIZE', 3):
+            matcher = SymbolMatcher(CatalogIndex(list(self.items.values())))
+        for number in range(10):
+            matcher.match(f'TRACK SPOT {number}')
+        self.assertEqual(matcher.resolved.cache_info().currsize, 3)
+        self.assertEqual(matcher.match('TRACK SPOT 0').catalog_item, self.items['TRACK-SPOT'])
+
+    def test_match_threshold(self):
+        # 10 of the query's 20 trigrams are those of LED-STRIP
+        at_threshold = self.matcher.match('LED STRIP QWERTYUIO')
+        self.assertEqual(at_threshold, SymbolMatch(self.items['LED-STRIP'], MATCH_THRESHOLD, 'fuzzy'))
+        # One more trigram drops the similarity to 10 / 21
+        self.assertEqual(self.matcher.match('LED STRIP QWERTYUIOP'), SymbolMatch(None, 0.476, 'none'))
+
+    def test_confident_threshold(self):
+        # 12 of 15 trigrams: exactly confident, so not reported
+        confident = self.matcher.match('LED-PANEL-60')
+        self.assertEqual(confident, SymbolMatch(self.items['LED-PANEL-600'], CONFIDENT_THRESHOLD, 'fuzzy'))
+        doubtful = self.matcher.match('LED PANL 600')
+        self.assertEqual(doubtful, SymbolMatch(self.items['LED-PANEL-600'], 0.688, 'fuzzy'))
+
+        report = symbol_report(
+            {'LED-PANEL-60': confident, 'LED PANL 600': doubtful}, {'LED-PANEL-60': 4, 'LED PANL 600': 2},
+        )
+        self.assertEqual(report['unmapped'], [])
+        self.assertEqual(report['low_confidence'], [{
+            'symbol': 'LED PANL 600', 'inserts': 2, 'catalog_id': self.items['LED-PANEL-600'].id,
+            'catalog_symbol': 'LED-PANEL-600', 'score': 0.688,
+        }])
+
+    def test_report_lists_most_inserts_first_then_by_name(self):
+        symbols = ['XYZ', 'EXIT', 'LED STRIP QWERTYUIOP', 'LED PANL 600', 'DOWNLITE-12W', 'TRACK SPOTS', 'LED-STRIP']
+        matches = self.matcher.match_many(symbols)
+        report = symbol_report(matches, {'XYZ': 3, 'EXIT': 3, 'LED STRIP QWERTYUIOP': 7, 'LED PANL 600': 1,
+                                         'DOWNLITE-12W': 5, 'TRACK SPOTS': 1, 'LED-STRIP': 9})
+
+        self.assertEqual(
+            [(row['symbol'], row['inserts']) for row in report['unmapped']],
+            [('LED STRIP QWERTYUIOP', 7), ('EXIT', 3), ('XYZ', 3)],
+        )
+        self.assertEqual(
+            [(row['symbol'], row['inserts']) for row in report['low_confidence']],
+            [('DOWNLITE-12W', 5), ('LED PANL 600', 1), ('TRACK SPOTS', 1)],
+        )
+        # Symbols without an insert count sort last
+        self.assertEqual(symbol_report(matches, {'EXIT': 1})['unmapped'][0]['symbol'], 'EXIT')
+
+
+    def test_upload_legend_then_user_then_firm_then_matcher(self):
+        user, other = User.objects.create_user('owner'), User.objects.create_user('colleague')
+        index = CatalogIndex(list(self.items.values()))
+        symbol = 'TRACK SPOTS'
+        SymbolLegend.objects.create(cad_symbol=symbol, lighting_catalog=self.items['LED-STRIP'])
+        SymbolLegend.objects.create(user=user, cad_symbol=symbol, lighting_catalog=self.items['DOWNLIGHT-12W'])
+        SymbolLegend.objects.create(user=other, cad_symbol=symbol, lighting_catalog=self.items['LED-PANEL-600'])
+
+        def resolve(legend=None):
+            return self.matcher.match_many([symbol], legend, stored_legend(user.id, [symbol], index))[symbol]
+
+        self.assertEqual(resolve({symbol: 'LED-PANEL-600'}), SymbolMatch(self.items['LED-PANEL-600'], 1.0, 'exact'))
+        self.assertEqual(resolve(), SymbolMatch(self.items['DOWNLIGHT-12W'], 1.0, 'stored'))
+        SymbolLegend.objects.filter(user=user).delete()
+        self.assertEqual(resolve(), SymbolMatch(self.items['LED-STRIP'], 1.0, 'stored'))
+        SymbolLegend.objects.filter(user__isnull=True).delete()
+        # Another user's entry never applies
+        self.assertEqual(resolve(), SymbolMatch(self.items['TRACK-SPOT'], 0.769, 'fuzzy'))
+
+class IlluminanceTests(TestCase):
+    """Tiled, chunked point illuminance matches the formula evaluated point by point"""
+
+    @staticmethod
+    def direct(x, y, lights, mounting_height):
+        """Sum of each luminaire's contribution at each point, one pair at a time"""
+        lux = np.zeros(len(x))
+        for point in range(len(x)):
+            for light in range(len(lights.x)):
+                half_angle = math.radians(min(max(lights.beam_angle[light], photometry.MIN_BEAM_ANGLE), 360.0) / 2)
+                cutoff = math.cos(min(half_angle, math.pi / 2))
+                intensity = lights.lumens[light] / (2 * math.pi * (1 - cutoff))
+                distance_squared = (
+                    (x[point] - lights.x[light]) ** 2 + (y[point] - lights.y[light]) ** 2 + mounting_height ** 2
+                )
+                cosine = mounting_height / math.sqrt(distance_squared)
+                if cosine >= cutoff:
+                    lux[point] += intensity * cosine / distance_squared
+        return lux
+
+    def setUp(self):
+        xs, ys = np.meshgrid(np.arange(0.25, 12, 0.5), np.arange(0.25, 6, 0.5))
+        # The last point is beyond the reach of every cone
+        self.x = np.append(xs.ravel(), 40.0)
+        self.y = np.append(ys.ravel(), 30.0)
+        rng = np.random.default_rng(3)
+        self.lights = photometry.Luminaires(
+            rng.uniform(0, 12, 9), rng.uniform(0, 6, 9), rng.choice([800.0, 1500.0, 3000.0], 9),
+            np.array([30.0, 60.0, 90.0, 120.0, 0.5, 45.0, 90.0, 60.0, 24.0]),
+        )
+
+    def test_narrow_beams_match_direct_sum(self):
+        for max_cells in (photometry.MAX_CELLS, 5):
+            with self.subTest(max_cells=max_cells), mock.patch.object(photometry, 'MAX_CELLS', max_cells):
+                lux = photometry.illuminance(self.x, self.y, self.lights, 2.2)
+                np.testing.assert_allclose(lux, self.direct(self.x, self.y, self.lights, 2.2), rtol=1e-12)
+                self.assertEqual(lux[-1], 0.0)
+                self.assertTrue((lux[:-1] > 0).any())
+
+    def test_hemispherical_beams_reach_every_point(self):
+        lights = self.lights._replace(beam_angle=np.where(self.lights.beam_angle > 100, 200.0, self.lights.beam_angle))
+        with mock.patch.object(photometry, 'MAX_CELLS', 7):
+            lux = photometry.illuminance(self.x, self.y, lights, 2.2)
+        np.testing.assert_allclose(lux, self.direct(self.x, self.y, lights, 2.2), rtol=1e-12)
+        self.assertGreater(lux[-1], 0.0)
+
+    def test_no_points_or_luminaires(self):
+        none = photometry.Luminaires(*(np.zeros(0),) * 4)
+        np.testing.assert_array_equal(photometry.illuminance(self.x, self.y, none, 2.2), np.zeros(len(self.x)))
+        self.assertEqual(len(photometry.illuminance(np.zeros(0), np.zeros(0), self.lights, 2.2)), 0)
+
+
+class UtilizationFactorTests(TestCase):
+    """UF interpolation over the tabulated room index and reflectance curves"""
+
+    def test_table_points_are_exact(self):
+        for (c, ceiling), (w, wall) in itertools.product(enumerate(CEILING_REFLECTANCES), enumerate(WALL_REFLECTANCES)):
+            np.testing.assert_array_equal(utilization_factors(ROOM_INDICES, ceiling, wall), UF_TABLE[c, w])
+
+    def test_midpoints_are_linear_in_index_and_reflectances(self):
+        # Between K = 1.0 and 1.25
+        self.assertAlmostEqual(utilization_factors(1.125, 0.7, 0.5)[0], (0.49 + 0.54) / 2, places=12)
+        # Between ceilings 0.5 / 0.7 and walls 0.3 / 0.5 at K = 1.0
+        self.assertAlmostEqual(utilization_factors(1.0, 0.6, 0.4)[0], (0.40 + 0.46 + 0.42 + 0.49) / 4, places=12)
+        # Both at once: the mean of the eight surrounding table entries
+        self.assertAlmostEqual(
+            utilization_factors(1.125, 0.6, 0.4)[0], UF_TABLE[1:, 1:, 1:3].mean(), places=12,
+        )
+        # Clamped beyond the table
+        np.testing.assert_array_equal(
+            utilization_factors([0.1, 9.0], 0.9, 0.0), [UF_TABLE[2, 0, 0], UF_TABLE[2, 0, -1]],
+        )
+
+    def test_migration_copy_matches_engine(self):
+        migration = importlib.import_module('lighting.migrations.0013_room_utilization_factor')
+        rng = np.random.default_rng(7)
+        index = room_index(rng.uniform(5, 400, 50), rng.uniform(10, 90, 50), rng.uniform(0, 5, 50))
+        ceiling, wall = rng.uniform(0.2, 0.8, 50), rng.uniform(0.0, 0.6, 50)
+        np.testing.assert_allclose(
+            migration.utilization_factors(index, ceiling, wall), utilization_factors(index, ceiling, wall), rtol=1e-12,
+        )
+
+
+class SubstitutionSweepTests(TestCase):
+    """Block-wise combination scores agree with totals summed fixture by fixture"""
+
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create_user('sweeper')
+        cls.items = [
+            LightingCatalog.objects.create(
+                symbol_name=f'SWP-{lumens}', model_number=f'S{lumens}', brand='Test', lumens=lumens,
+                wattage=lumens / 100, beam_angle=90, color_temp=4000, unit_cost=Decimal(cost),
+            )
+            for lumens, cost in ((1000, '100.00'), (900, '80.00'), (1200, '120.00'), (1100, '140.00'), (800, '50.00'))
+        ]
+        cls.cad_file = CADFile.objects.create(user=user, filename='plan.dxf', file='cad_files/plan.dxf')
+        office = Room.objects.create(cad_file=cls.cad_file, name='Office', area=6, height=3)
+        store = Room.objects.create(cad_file=cls.cad_file, name='Store', area=4, height=3, room_type='warehouse')
+        Room.objects.create(cad_file=cls.cad_file, name='Empty', area=8, height=3)
+        unassigned = Room.objects.create(cad_file=cls.cad_file, name='Unassigned', area=0, height=3, is_unassigned=True)
+        for room, item, quantity in ((office, 0, 3), (office, 2, 2), (store, 1, 1), (store, 4, 2), (unassigned, 0, 4)):
+            Fixture.objects.create(room=room, lighting_catalog=cls.items[item], quantity=quantity)
+
+    def test_evaluate_matches_direct_totals(self):
+        project = SubstitutionSweep(self.cad_file, index=CatalogIndex(self.items))
+        choices = project.combinations()
+        self.assertEqual(len(choices), project.combination_count)
+        self.assertGreater(len(choices), 1)
+        with mock.patch.object(sweep, 'MAX_CELLS', 5):
+            scores = project.evaluate(choices)
+
+        rooms = list(self.cad_file.rooms.prefetch_related('fixtures'))
+        for choice, cost, wattage, adequate in zip(choices, scores['cost'], scores['wattage'], scores['adequate']):
+            picked = {
+                fixture.id: project.index.items[project.positions[row, choice[row]]]
+                for row, fixture in enumerate(project.fixtures)
+            }
+            expected_cost = expected_wattage = 0.0
+            expected_adequate = 0
+            for room in rooms:
+                lumens = 0
+                for fixture in room.fixtures.all():
+                    item = picked.get(fixture.id, fixture.lighting_catalog)
+                    expected_cost += float(item.unit_cost) * fixture.quantity
+                    expected_wattage += item.wattage * fixture.quantity
+                    lumens += item.lumens * fixture.quantity
+                if not room.is_unassigned and lumens >= room.calculate_required_lumens():
+                    expected_adequate += 1
+            self.assertAlmostEqual(cost, expected_cost, places=6)
+            self.assertAlmostEqual(wattage, expected_wattage, places=6)
+            self.assertEqual(adequate, expected_adequate)
+        self.assertGreater(len(set(scores['adequate'].tolist())), 1)
+
+
+class GridLayoutTests(TestCase):
+    """Fixture grids cover their counts inside non-rectangular outlines"""
+
+    def test_l_shaped_and_rectangular_rooms(self):
+        l_shape = np.array([[0, 0], [12, 0], [12, 4], [4, 4], [4, 10], [0, 10]], dtype=float)
+        rectangle = np.array([[20, 0], [30, 0], [30, 5], [20, 5]], dtype=float)
+        vertices = np.vstack([l_shape, rectangle])
+        offsets = np.array([0, 6, 10])
+        counts = np.array([9, 6])
+
+        layout = grid_layout(vertices, offsets, counts, np.array([100.0, 100.0]))
+        for room, polygon in enumerate((l_shape, rectangle)):
+            mask = layout.room == room
+            self.assertGreaterEqual(mask.sum(), counts[room])
+            self.assertTrue(points_in_polygon(layout.x[mask], layout.y[mask], polygon).all())
+
+    def test_spacing_limit(self):
+        rectangle = np.array([[0, 0], [20, 0], [20, 10], [0, 10]], dtype=float)
+        layout = grid_layout(rectangle, np.array([0, 4]), np.array([1]), np.array([3.0]))
+        self.assertLessEqual(np.diff(np.unique(layout.x)).max(), 3.0)
+        self.assertLessEqual(np.diff(np.unique(layout.y)).max(), 3.0)
+
+
+class EnergySimulationTests(TestCase):
+    """Vectorized annual simulation agrees with an hour-by-hour sum"""
+
+    def test_matches_hourly_sum(self):
+        rng = np.random.default_rng(0)
+        watts = rng.uniform(10, 200, 20)
+        types = rng.integers(0, occupancy_matrix().shape[0], 20)
+        rates = tariff_rates()
+
+        result = simulate(watts, types, rates, dimming=True)
+        load = occupancy_matrix() * dimming_profile(True)
+        for row in range(20):
+            hourly_kwh = watts[row] / 1000 * load[types[row]]
+            self.assertAlmostEqual(result['kwh'][row], hourly_kwh.sum())
+            self.assertAlmostEqual(result['cost'][row], (hourly_kwh * rates).sum())
+        self.assertEqual(len(load[0]), 8760)
+        self.assertAlmostEqual(result['monthly_kwh'].sum(), result['kwh'].sum())
+
+
+class ParetoFrontTests(TestCase):
+    """3-objective front matches a pairwise dominance check"""
+
+    def test_matches_pairwise_dominance(self):
+        rng = np.random.default_rng(0)
+        cost = rng.integers(0, 20, 300).astype(float)
+        wattage = rng.integers(0, 20, 300).astype(float)
+        adequate = rng.integers(0, 4, 300)
+
+        expected = set()
+        for i in range(300):
+            dominated = (
+                (cost <= cost[i]) & (wattage <= wattage[i]) & (adequate >= adequate[i])
+                & ((cost < cost[i]) | (wattage < wattage[i]) | (adequate > adequate[i]))
+            ).any()
+            if not dominated:
+                expected.add((cost[i], wattage[i], adequate[i]))
+
+        front = pareto_front_3d(cost, wattage, adequate)
+        self.assertEqual({(cost[i], wattage[i], adequate[i]) for i in front}, expected)
+        self.assertEqual(len(front), len(expected))
@@ -0,0 +1,30 @@
+"""
+Upload handlers for AutoLight Analyser
+"""
+import hashlib
+
+from django.core.files.uploadhandler import FileUploadHandler
+
+
+class HashingUploadHandler(FileUploadHandler):
+    """
+    Compute a SHA-256 digest of each uploaded file while it streams in
+
+    The handler passes every chunk on unchanged to the next handler, so it
+    must be listed before Django's memory/temporary file handlers. Digests
+    are stored on ``request.upload_hashes`` keyed by form field name.
+    """
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.hasher = hashlib.sha256()
+
+    def receive_data_chunk(self, raw_data, start):
+        self.hasher.update(raw_data)
+        return raw_data
+
+    def file_complete(self, file_size):
+        if not hasattr(self.request, 'upload_hashes'):
+            self.request.upload_hashes = {}
+        self.request.upload_hashes[self.field_name] = self.hasher.hexdigest()
+        return None
@@ -22,9 +22,17 @@ urlpatterns = [
     
     # Reports
     path('report/<int:cad_id>/<str:report_type>/', views.generate_report, name='generate_report'),
+    path('report/file/<int:report_id>/', views.download_report, name='download_report'),
     
     # AJAX endpoints
     path('api/update-fixture/', views.update_fixture_selection, name='update_fixture'),
+    path('api/optimize/<int:cad_id>/', views.optimize_fixtures, name='optimize_fixtures'),
+    path('api/optimize/<int:cad_id>/apply/', views.apply_optimization, name='apply_optimization'),
+    path('api/sweep/<int:cad_id>/', views.sweep_substitutions, name='sweep_substitutions'),
+    path('api/layout/<int:cad_id>/', views.layout_fixtures, name='layout_fixtures'),
+    path('api/photometry/<int:cad_id>/', views.room_photometry, name='room_photometry'),
+    path('api/energy/<int:cad_id>/', views.project_energy_summary, name='project_energy'),
+    path('api/report/<int:report_id>/', views.report_status, name='report_status'),
     
     # Catalog
     path('catalog/', views.catalog_list, name='catalog'),
@@ -0,0 +1,129 @@
+"""
+Utilization factor (coefficient of utilization) engine for the lumen method
+
+    E = Φ × UF × MF / A
+
+UF depends on the room index K = 2A / (Hm × P) (L·W / (Hm (L + W)) for a
+rectangle) and on ceiling and wall reflectances. It is interpolated from a
+tabulated set of curves for a general-diffuse luminaire on a 0.2 floor.
+"""
+from functools import lru_cache
+from typing import Tuple
+
+import numpy as np
+
+# Work-plane height above the floor (m); the mounting height Hm is measured from it
+WORK_PLANE_HEIGHT = 0.75
+
+# Lamp lumen depreciation and dirt (clean environment, yearly cleaning)
+MAINTENANCE_FACTOR = 0.8
+
+# Typical office finishes
+DEFAULT_CEILING_REFLECTANCE = 0.7
+DEFAULT_WALL_REFLECTANCE = 0.5
+
+# Lowest mounting height used for the room index
+MIN_MOUNTING_HEIGHT = 0.1
+
+ROOM_INDICES = np.array([0.75, 1.0, 1.25, 1.5, 2.0, 2.5, 3.0, 4.0, 5.0])
+CEILING_REFLECTANCES = np.array([0.3, 0.5, 0.7])
+WALL_REFLECTANCES = np.array([0.1, 0.3, 0.5])
+
+# UF_TABLE[ceiling, wall] is the UF curve over ROOM_INDICES
+UF_TABLE = np.array([
+    [  # ceiling 0.3
+        [0.29, 0.35, 0.39, 0.42, 0.47, 0.50, 0.52, 0.55, 0.57],
+        [0.34, 0.39, 0.43, 0.46, 0.50, 0.53, 0.55, 0.57, 0.59],
+        [0.39, 0.44, 0.48, 0.50, 0.54, 0.56, 0.58, 0.60, 0.61],
+    ],
+    [  # ceiling 0.5
+        [0.30, 0.36, 0.40, 0.44, 0.49, 0.52, 0.55, 0.58, 0.60],
+        [0.35, 0.40, 0.45, 0.48, 0.53, 0.56, 0.58, 0.61, 0.63],
+        [0.41, 0.46, 0.50, 0.53, 0.57, 0.60, 0.62, 0.64, 0.66],
+    ],
+    [  # ceiling 0.7
+        [0.31, 0.37, 0.42, 0.46, 0.52, 0.56, 0.59, 0.63, 0.65],
+        [0.36, 0.42, 0.47, 0.51, 0.56, 0.60, 0.63, 0.66, 0.68],
+        [0.43, 0.49, 0.54, 0.57, 0.62, 0.65, 0.67, 0.70, 0.72],
+    ],
+])
+
+
+def room_index(area, perimeter, mounting_height):
+    """
+    Room index K = 2A / (Hm × P), vectorized
+
+    Args:
+        area: Floor area(s) in m²
+        perimeter: Floor perimeter(s) in m
+        mounting_height: Luminaire height(s) above the work plane in m
+
+    Returns:
+        Room index array (0 where the perimeter is 0)
+    """
+    area = np.asarray(area, dtype=np.float64)
+    perimeter = np.asarray(perimeter, dtype=np.float64)
+    height = np.maximum(np.asarray(mounting_height, dtype=np.float64), MIN_MOUNTING_HEIGHT)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        index = 2 * area / (height * perimeter)
+    return np.where(perimeter > 0, index, 0.0)
+
+
+def blend_weights(values: np.ndarray, value: float) -> Tuple[int, int, float]:
+    """Bracketing table positions and the weight of the upper one (clamped)"""
+    value = float(np.clip(value, values[0], values[-1]))
+    upper = int(np.clip(np.searchsorted(values, value), 1, len(values) - 1))
+    lower = upper - 1
+    return lower, upper, (value - values[lower]) / (values[upper] - values[lower])
+
+
+@lru_cache(maxsize=256)
+def uf_curve(ceiling: float, wall: float) -> np.ndarray:
+    """
+    UF curve over ROOM_INDICES for one pair of reflectances
+
+    Bilinear in the reflectances, clamped to the table; cached since a
+    project's rooms share a few finishes.
+    """
+    c0, c1, tc = blend_weights(CEILING_REFLECTANCES, ceiling)
+    w0, w1, tw = blend_weights(WALL_REFLECTANCES, wall)
+    curve = (
+        (1 - tc) * (1 - tw) * UF_TABLE[c0, w0]
+        + (1 - tc) * tw * UF_TABLE[c0, w1]
+        + tc * (1 - tw) * UF_TABLE[c1, w0]
+        + tc * tw * UF_TABLE[c1, w1]
+    )
+    curve.setflags(write=False)
+    return curve
+
+
+def utilization_factors(index, ceiling=DEFAULT_CEILING_REFLECTANCE, wall=DEFAULT_WALL_REFLECTANCE) -> np.ndarray:
+    """
+    Utilization factors for many rooms in one call
+
+    Args:
+        index: Room index per room
+        ceiling: Ceiling reflectance, scalar or per room
+        wall: Wall reflectance, scalar or per room
+
+    Returns:
+        UF per room, linear in the room index and clamped to the table ends
+    """
+    index = np.atleast_1d(np.asarray(index, dtype=np.float64))
+    ceiling = np.broadcast_to(np.asarray(ceiling, dtype=np.float64), index.shape)
+    wall = np.broadcast_to(np.asarray(wall, dtype=np.float64), index.shape)
+
+    factors = np.empty(index.shape)
+    pairs, inverse = np.unique(np.column_stack([ceiling, wall]), axis=0, return_inverse=True)
+    inverse = inverse.reshape(-1)
+    for pair, (pair_ceiling, pair_wall) in enumerate(pairs.tolist()):
+        rooms = inverse == pair
+        factors[rooms] = np.interp(index[rooms], ROOM_INDICES, uf_curve(pair_ceiling, pair_wall))
+    return factors
+
+
+def square_room_factor(area: float, height: float = 3.0) -> float:
+    """UF × MF for a square room of the given area and height (when only the area is known)"""
+    perimeter = 4 * np.sqrt(max(area, 0.0))
+    index = room_index(area, perimeter, height - WORK_PLANE_HEIGHT)
+    return float(utilization_factors(index)[0]) * MAINTENANCE_FACTOR
@@ -3,62 +3,300 @@ Utility functions for CAD parsing, lighting calculations, and report generation
 """
 import os
 import csv
+import logging
 import ezdxf
+import numpy as np
 from decimal import Decimal
 from collections import defaultdict
-from typing import Dict, List, Tuple, Optional
+from typing import Dict, Iterable, Iterator, List, Tuple, Optional
 from datetime import datetime
+from concurrent.futures.process import BrokenProcessPool
 
 from django.conf import settings
-from reportlab.lib import colors
-from reportlab.lib.pagesizes import letter, A4
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.units import inch
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, PageBreak, Image
-from reportlab.lib.enums import TA_CENTER, TA_LEFT, TA_RIGHT
+from django.db import transaction
+from django.utils import timezone
 
 from .models import LightingCatalog, CADFile, Room, Fixture, Report
+from . import pdf_report
+from .report_data import (
+    DEFAULT_CHUNK_SIZE,
+    ReportProject,
+    ReportRoom,
+    ReportSnapshot,
+    build_report_snapshot,
+    iter_report_rooms,
+    report_project,
+)
 
+logger = logging.getLogger(__name__)
 
-def parse_cad(file_path: str) -> Dict:
+
+def parse_cad(file_path: str, streaming: bool = True) -> Dict:
     """
     Parse CAD file (.dwg or .dxf) and extract lighting fixture information
     
     Args:
         file_path: Path to the CAD file
+        streaming: Read ASCII DXF files in a single pass over the ENTITIES
+            section instead of loading the whole document (default: True).
+            Files the streaming reader cannot handle fall back to ezdxf.
         
     Returns:
         Dictionary containing parsed data with blocks, coordinates, and metadata
     """
+    if streaming and is_ascii_dxf(file_path):
+        return parse_cad_streaming(file_path)
+    
     try:
-        # Read DXF/DWG file
-        doc = ezdxf.readfile(file_path)
-        modelspace = doc.modelspace()
-        
-        # Extract block inserts (typically used for lighting fixtures)
         blocks = []
-        for entity in modelspace.query('INSERT'):
-            block_data = {
-                'block_name': entity.dxf.name,
-                'x': entity.dxf.insert.x,
-                'y': entity.dxf.insert.y,
-                'z': entity.dxf.insert.z if hasattr(entity.dxf.insert, 'z') else 0,
-                'rotation': entity.dxf.rotation if hasattr(entity.dxf, 'rotation') else 0,
+        rooms_data = []
+        for entity_type, entity in iter_cad_document_entities(ezdxf.readfile(file_path)):
+            if entity_type == 'INSERT':
+                blocks.append(entity)
+            else:
+                entity['area'] = calculate_polyline_area(entity['points'])
+                rooms_data.append(entity)
+        
+        return {
+            'blocks': blocks,
+            'rooms': rooms_data,
+            'total_blocks': len(blocks),
+            'total_rooms': len(rooms_data),
+            'success': True,
+        }
+    except Exception as e:
+        return {
+            'success': False,
+            'error': str(e),
+            'blocks': [],
+            'rooms': [],
+        }
+
+
+def iter_cad_document_entities(doc) -> Iterator[Tuple[str, Dict]]:
+    """
+    Yield fixture inserts and closed polylines from a loaded ezdxf document
+    
+    Args:
+        doc: ezdxf Drawing (e.g. from ``ezdxf.readfile``)
+        
+    Yields:
+        Same ('INSERT', block_data) / ('LWPOLYLINE', room_data) tuples as
+        ``iter_cad_entities``, inserts first
+    """
+    modelspace = doc.modelspace()
+    
+    # Extract block inserts (typically used for lighting fixtures)
+    for entity in modelspace.query('INSERT'):
+        yield 'INSERT', {
+            'block_name': entity.dxf.name,
+            'x': entity.dxf.insert.x,
+            'y': entity.dxf.insert.y,
+            'z': entity.dxf.insert.z if hasattr(entity.dxf.insert, 'z') else 0,
+            'rotation': entity.dxf.rotation if hasattr(entity.dxf, 'rotation') else 0,
+            'layer': entity.dxf.layer,
+        }
+    
+    # Extract polylines and closed shapes (for room boundaries)
+    for entity in modelspace.query('LWPOLYLINE'):
+        if entity.closed:
+            yield 'LWPOLYLINE', {
+                'points': list(entity.get_points()),
                 'layer': entity.dxf.layer,
             }
-            blocks.append(block_data)
+
+
+def is_ascii_dxf(file_path: str) -> bool:
+    """
+    Check whether a file looks like an ASCII DXF the streaming reader can handle
+    
+    Args:
+        file_path: Path to the CAD file
+        
+    Returns:
+        True for ASCII DXF files, False for binary DXF, DWG or unreadable files
+    """
+    try:
+        with open(file_path, 'rb') as f:
+            head = f.read(32)
+    except OSError:
+        return False
+    
+    # Binary DXF starts with a sentinel, DWG with its version string (AC10xx)
+    if head.startswith(b'AutoCAD Binary DXF') or head.startswith(b'AC10'):
+        return False
+    return head.lstrip().startswith(b'0')
+
+
+def _decode_dxf_string(value: bytes) -> str:
+    """Decode a DXF string value (UTF-8 for R2007+, ANSI code page before)"""
+    try:
+        return value.decode('utf-8')
+    except UnicodeDecodeError:
+        return value.decode('cp1252', errors='replace')
+
+
+def iter_dxf_tags(stream) -> Iterator[Tuple[int, bytes]]:
+    """
+    Iterate over (group code, value) pairs of an ASCII DXF byte stream
+    
+    Args:
+        stream: Binary file object positioned at the start of a DXF file
+        
+    Yields:
+        Tuples of (group code, stripped raw value)
+    """
+    readline = stream.readline
+    while True:
+        code_line = readline()
+        value_line = readline()
+        if not value_line:
+            return
+        yield int(code_line), value_line.strip()
+
+
+def read_dxf_insunits(file_path: str) -> Optional[int]:
+    """
+    Read the $INSUNITS drawing units code from an ASCII DXF header
+    
+    Only the HEADER section is scanned; the rest of the file is not read.
+    
+    Args:
+        file_path: Path to an ASCII DXF file
+        
+    Returns:
+        The units code, or None if the header does not set it
+    """
+    with open(file_path, 'rb') as f:
+        tags = iter_dxf_tags(f)
+        for code, value in tags:
+            if code == 9 and value == b'$INSUNITS':
+                for code, value in tags:
+                    if code == 70:
+                        return int(value)
+                    if code in (0, 9):
+                        return None
+            elif code == 0 and value == b'ENDSEC':
+                return None
+    return None
+
+
+def iter_cad_entities(file_path: str) -> Iterator[Tuple[str, Dict]]:
+    """
+    Stream fixture inserts and closed room polylines from an ASCII DXF file
+    
+    Only the ENTITIES section is read, tag by tag, and only the entity being
+    decoded is held in memory, so memory use does not grow with file size.
+    Paper space entities are skipped to match ``doc.modelspace()``.
+    
+    Args:
+        file_path: Path to an ASCII DXF file
+        
+    Yields:
+        ('INSERT', block_data) and ('LWPOLYLINE', room_data) tuples with the
+        same keys ``parse_cad`` produces (room_data has no 'area' yet)
+    """
+    with open(file_path, 'rb') as f:
+        tags = iter_dxf_tags(f)
+        
+        # Skip ahead to the ENTITIES section
+        for code, value in tags:
+            if code == 2 and value == b'ENTITIES':
+                break
+        else:
+            return
+        
+        entity_type = None
+        entity = None
+        
+        for code, value in tags:
+            if code == 0:
+                # Entity boundary: emit the finished entity, start the next one
+                if entity is not None and not entity.pop('paperspace'):
+                    if entity_type == 'INSERT':
+                        yield entity_type, entity
+                    elif entity.pop('closed'):
+                        entity['points'] = [tuple(vertex) for vertex in entity['points']]
+                        yield entity_type, entity
+                
+                if value == b'ENDSEC':
+                    return
+                
+                entity_type = value.decode('ascii', errors='replace')
+                if entity_type == 'INSERT':
+                    entity = {
+                        'block_name': '',
+                        'x': 0.0,
+                        'y': 0.0,
+                        'z': 0,
+                        'rotation': 0,
+                        'layer': '0',
+                        'paperspace': False,
+                    }
+                elif entity_type == 'LWPOLYLINE':
+                    entity = {
+                        'points': [],
+                        'layer': '0',
+                        'closed': False,
+                        'paperspace': False,
+                    }
+                else:
+                    entity = None
+                continue
+            
+            if entity is None:
+                continue
+            
+            if code == 8:
+                entity['layer'] = _decode_dxf_string(value)
+            elif code == 67:
+                entity['paperspace'] = int(value) == 1
+            elif entity_type == 'INSERT':
+                if code == 2:
+                    entity['block_name'] = _decode_dxf_string(value)
+                elif code == 10:
+                    entity['x'] = float(value)
+                elif code == 20:
+                    entity['y'] = float(value)
+                elif code == 30:
+                    entity['z'] = float(value)
+                elif code == 50:
+                    entity['rotation'] = float(value)
+            else:
+                # LWPOLYLINE vertices: (x, y, start_width, end_width, bulge)
+                if code == 10:
+                    entity['points'].append([float(value), 0.0, 0.0, 0.0, 0.0])
+                elif code == 20 and entity['points']:
+                    entity['points'][-1][1] = float(value)
+                elif code == 40 and entity['points']:
+                    entity['points'][-1][2] = float(value)
+                elif code == 41 and entity['points']:
+                    entity['points'][-1][3] = float(value)
+                elif code == 42 and entity['points']:
+                    entity['points'][-1][4] = float(value)
+                elif code == 70:
+                    entity['closed'] = bool(int(value) & 1)
+
+
+def parse_cad_streaming(file_path: str) -> Dict:
+    """
+    Parse an ASCII DXF file in a single streaming pass
+    
+    Args:
+        file_path: Path to an ASCII DXF file
         
-        # Extract polylines and closed shapes (for room boundaries)
+    Returns:
+        Dictionary with the same shape as ``parse_cad``
+    """
+    try:
+        blocks = []
         rooms_data = []
-        for entity in modelspace.query('LWPOLYLINE'):
-            if entity.closed:
-                points = list(entity.get_points())
-                area = calculate_polyline_area(points)
-                rooms_data.append({
-                    'points': points,
-                    'area': area,
-                    'layer': entity.dxf.layer,
-                })
+        for entity_type, entity in iter_cad_entities(file_path):
+            if entity_type == 'INSERT':
+                blocks.append(entity)
+            else:
+                entity['area'] = calculate_polyline_area(entity['points'])
+                rooms_data.append(entity)
         
         return {
             'blocks': blocks,
@@ -114,6 +352,110 @@ def calculate_polyline_area(points: List[Tuple[float, float]]) -> float:
     return area_m2
 
 
+# Meters per drawing unit for each DXF $INSUNITS code (0 = unitless)
+INSUNITS_TO_METERS = {
+    1: 0.0254,              # inches
+    2: 0.3048,              # feet
+    3: 1609.344,            # miles
+    4: 0.001,               # millimeters
+    5: 0.01,                # centimeters
+    6: 1.0,                 # meters
+    7: 1000.0,              # kilometers
+    8: 2.54e-8,             # microinches
+    9: 2.54e-5,             # mils
+    10: 0.9144,             # yards
+    11: 1e-10,              # angstroms
+    12: 1e-9,               # nanometers
+    13: 1e-6,               # microns
+    14: 0.1,                # decimeters
+    15: 10.0,               # decameters
+    16: 100.0,              # hectometers
+    17: 1e9,                # gigameters
+    18: 1.495978707e11,     # astronomical units
+    19: 9.4607304725808e15, # light years
+    20: 3.0856775814914e16, # parsecs
+    21: 1200.0 / 3937.0,    # US survey feet
+    22: 100.0 / 3937.0,     # US survey inches
+    23: 3600.0 / 3937.0,    # US survey yards
+    24: 6336000.0 / 3937.0, # US survey miles
+}
+
+
+def calculate_polygon_areas(vertices: np.ndarray, offsets: np.ndarray) -> np.ndarray:
+    """
+    Calculate the areas of many closed polylines at once (Shoelace formula)
+    
+    Args:
+        vertices: (V, 2) array of x, y coordinates of all polygons
+        offsets: (M + 1,) array; polygon i is vertices[offsets[i]:offsets[i + 1]]
+        
+    Returns:
+        (M,) array of raw areas in square drawing units (0 for polygons with
+        fewer than 3 vertices)
+    """
+    vertices = np.asarray(vertices, dtype=np.float64).reshape(-1, 2)
+    offsets = np.asarray(offsets, dtype=np.int64)
+    counts = np.diff(offsets)
+    polygon_count = len(counts)
+    if not len(vertices):
+        return np.zeros(polygon_count)
+    
+    polygon_ids = np.repeat(np.arange(polygon_count), counts)
+    starts = offsets[:-1]
+    
+    # Index of the next vertex, wrapping the last vertex of each polygon
+    # back to its first one
+    next_index = np.arange(1, len(vertices) + 1)
+    ends = offsets[1:][counts > 0] - 1
+    next_index[ends] = starts[counts > 0]
+    
+    # Shift each polygon to its first vertex to keep precision with large
+    # drawing coordinates
+    origin = vertices[starts[polygon_ids]]
+    local = vertices - origin
+    local_next = vertices[next_index] - origin
+    cross = local[:, 0] * local_next[:, 1] - local_next[:, 0] * local[:, 1]
+    
+    areas = np.abs(np.bincount(polygon_ids, weights=cross, minlength=polygon_count)) / 2.0
+    areas[counts < 3] = 0.0
+    return areas
+
+
+def infer_unit_scale(raw_areas: np.ndarray, insunits: Optional[int] = None) -> float:
+    """
+    Choose the drawing unit scale once for a whole drawing
+    
+    The $INSUNITS header is used when it yields plausible room sizes. Many
+    exporters leave it at a default that does not match the geometry, so
+    otherwise the median room is checked against the same mm / cm / m
+    thresholds ``calculate_polyline_area`` applies per polygon.
+    
+    Args:
+        raw_areas: Room areas in square drawing units
+        insunits: DXF $INSUNITS code, if known
+        
+    Returns:
+        Meters per drawing unit
+    """
+    raw_areas = np.asarray(raw_areas, dtype=np.float64)
+    raw_areas = raw_areas[raw_areas > 0]
+    if not len(raw_areas):
+        return INSUNITS_TO_METERS.get(insunits, 0.001)
+    
+    median_area = float(np.median(raw_areas))
+    
+    scale = INSUNITS_TO_METERS.get(insunits)
+    if scale is not None and 0.1 <= median_area * scale * scale <= 10000:
+        return scale
+    
+    area_m2 = median_area / 1_000_000.0
+    if area_m2 > 10000:
+        return 0.01   # centimeters
+    elif area_m2 < 0.1:
+        return 1.0    # meters
+    return 0.001      # millimeters
+
+
 def map_symbols_to_catalog(symbols: List[str], legend: Optional[Dict[str, str]] = None) -> Dict[str, LightingCatalog]:
     """
     Map CAD block symbols to lighting catalog entries
@@ -123,30 +465,17 @@ def map_symbols_to_catalog(symbols: List[str], legend: Optional[Dict[str, str]]
         legend: Optional dictionary mapping CAD symbols to catalog symbol_names
         
     Returns:
-        Dictionary mapping CAD symbols to LightingCatalog objects
+        Dictionary mapping CAD symbols to LightingCatalog objects (None for
+        symbols with no match above the similarity threshold)
     """
-    mapping = {}
+    from .symbol_matcher import get_symbol_matcher
     
-    for symbol in symbols:
-        # Try to find exact match first
-        catalog_name = legend.get(symbol, symbol) if legend else symbol
-        
-        try:
-            catalog_item = LightingCatalog.objects.get(symbol_name=catalog_name)
-            mapping[symbol] = catalog_item
-        except LightingCatalog.DoesNotExist:
-            # Try fuzzy matching
-            similar = LightingCatalog.objects.filter(symbol_name__icontains=symbol[:3])
-            if similar.exists():
-                mapping[symbol] = similar.first()
-            else:
-                # Return None for unmapped symbols
-                mapping[symbol] = None
-    
-    return mapping
+    matches = get_symbol_matcher().match_many(symbols, legend)
+    return {symbol: match.catalog_item for symbol, match in matches.items()}
 
 
-def calculate_required_fixtures(room_area: float, lumens_per_fixture: int, required_lux: float = 300) -> int:
+def calculate_required_fixtures(room_area: float, lumens_per_fixture: int, required_lux: float = 300,
+                                lumen_factor: Optional[float] = None) -> int:
     """
     Calculate number of fixtures required to achieve target lux level
     
@@ -154,6 +483,8 @@ def calculate_required_fixtures(room_area: float, lumens_per_fixture: int, requi
         room_area: Room area in square meters
         lumens_per_fixture: Light output per fixture in lumens
         required_lux: Target illuminance in lux (default: 300)
+        lumen_factor: Utilization × maintenance factor (default: a square
+            3 m high room of this area)
         
     Returns:
         Number of fixtures required
@@ -161,11 +492,13 @@ def calculate_required_fixtures(room_area: float, lumens_per_fixture: int, requi
     if lumens_per_fixture <= 0:
         return 0
     
-    # Apply lighting efficiency factor (accounting for losses)
-    efficiency_factor = 0.7
+    # Apply utilization and maintenance factors (lumen method)
+    if lumen_factor is None:
+        from .utilization import square_room_factor
+        lumen_factor = square_room_factor(room_area)
     
     total_lumens_required = room_area * required_lux
-    effective_lumens_per_fixture = lumens_per_fixture * efficiency_factor
+    effective_lumens_per_fixture = lumens_per_fixture * lumen_factor
     
     fixtures_needed = total_lumens_required / effective_lumens_per_fixture
     
@@ -174,13 +507,15 @@ def calculate_required_fixtures(room_area: float, lumens_per_fixture: int, requi
     return math.ceil(fixtures_needed)
 
 
-def calculate_room_lux(fixtures_list: List[Fixture], room_area: float) -> float:
+def calculate_room_lux(fixtures_list: List[Fixture], room_area: float, lumen_factor: Optional[float] = None) -> float:
     """
     Calculate average lux in a room based on installed fixtures
     
     Args:
         fixtures_list: List of Fixture objects in the room
         room_area: Room area in square meters
+        lumen_factor: Utilization × maintenance factor (default: a square
+            3 m high room of this area)
         
     Returns:
         Average illuminance in lux
@@ -190,132 +525,241 @@ def calculate_room_lux(fixtures_list: List[Fixture], room_area: float) -> float:
     
     total_lumens = sum(fixture.total_lumens for fixture in fixtures_list)
     
-    # Apply lighting efficiency factor
-    efficiency_factor = 0.7
-    effective_lumens = total_lumens * efficiency_factor
+    # Apply utilization and maintenance factors (lumen method)
+    if lumen_factor is None:
+        from .utilization import square_room_factor
+        lumen_factor = square_room_factor(room_area)
+    effective_lumens = total_lumens * lumen_factor
     
     return effective_lumens / room_area
 
 
-def process_cad_file(cad_file: CADFile, legend: Optional[Dict[str, str]] = None) -> bool:
+def build_analysis(cad_file: CADFile, geometry, legend: Optional[Dict[str, str]] = None,
+                   layout_item: Optional[LightingCatalog] = None) -> Tuple[List[Room], List[Fixture]]:
     """
-    Process uploaded CAD file and create Room and Fixture entries
+    Build unsaved Room and Fixture rows for a parsed drawing
+    
+    Derived Room fields (area from dimensions, required lux) are computed
+    here, so the rows can be written with ``bulk_create`` without going
+    through ``Room.save``.
     
     Args:
         cad_file: CADFile model instance
+        geometry: CADGeometry of the drawing
         legend: Optional mapping of CAD symbols to catalog entries
+        layout_item: Optional catalog item laid out in drawn rooms
+            without fixtures (drawings without any fixture blocks use the
+            most efficient catalog item)
         
     Returns:
-        True if processing successful, False otherwise
+        Tuple of (rooms, fixtures); fixtures reference the unsaved rooms
     """
-    try:
-        # Update status
-        cad_file.status = 'processing'
-        cad_file.save()
-        
-        # Parse CAD file
-        file_path = cad_file.file.path
-        parsed_data = parse_cad(file_path)
-        
-        if not parsed_data['success']:
-            cad_file.status = 'failed'
-            cad_file.error_message = parsed_data.get('error', 'Unknown error')
-            cad_file.save()
-            return False
-        
-        # Create rooms with validated areas
-        rooms_data = parsed_data['rooms']
-        created_rooms = []
-        
-        if not rooms_data:
-            # Create a default room if no rooms detected
-            room = Room.objects.create(
-                cad_file=cad_file,
-                name="Main Area",
-                area=100.0,  # Default area
-                height=3.0,
-            )
-            created_rooms.append(room)
+    # Create rooms with validated areas (drawing units are resolved once
+    # per drawing from $INSUNITS / the room sizes)
+    room_areas = geometry.room_areas()
+    cad_file.unit_scale = geometry.unit_scale
+    rooms = []
+    room_outlines = []  # geometry outline index of each room
+    
+    for idx, room_area in enumerate(room_areas.tolist()):
+        # Validate and constrain room area (1 m² to 10,000 m²)
+        if room_area < 1.0:
+            room_area = 1.0
+        elif room_area > 10000.0:
+            # Skip unreasonably large rooms (likely parsing errors)
+            continue
+        
+        rooms.append(Room(
+            cad_file=cad_file,
+            name=f"Room {idx + 1}" if idx > 0 else "Main Area",
+            area=room_area,
+            height=3.0,
+            outline=np.ascontiguousarray(geometry.polygon(idx), dtype=np.float64).tobytes(),
+        ))
+        room_outlines.append(idx)
+    
+    # Create a default room if no valid rooms detected
+    if not rooms:
+        rooms.append(Room(
+            cad_file=cad_file,
+            name="Main Area",
+            area=100.0,  # Default area
+            height=3.0,
+        ))
+    
+    # Map symbols to catalog in one batch; unmapped and low-confidence
+    # symbols are reported on the CAD file
+    from .symbol_matcher import get_symbol_matcher, stored_legend, symbol_report
+    codes, counts = np.unique(geometry.block_codes, return_counts=True)
+    insert_counts = {geometry.block_names[code]: count for code, count in zip(codes.tolist(), counts.tolist())}
+    # The user's (and firm's) stored legend applies before any fuzzy matching
+    stored = stored_legend(cad_file.user_id, insert_counts)
+    matches = get_symbol_matcher().match_many(insert_counts, legend, stored)
+    symbol_mapping = {symbol: match.catalog_item for symbol, match in matches.items()}
+    cad_file.symbol_report = symbol_report(matches, insert_counts)
+    
+    # Assign each insert to the room outline containing it (-1 = outside
+    # every room). Drawings without outlines put everything in the
+    # default room.
+    if room_outlines:
+        from .spatial import RoomIndex
+        vertices, offsets = geometry.select_rooms(room_outlines)
+        insert_rooms = RoomIndex(vertices, offsets).assign(geometry.x, geometry.y)
+    else:
+        insert_rooms = np.zeros(geometry.total_blocks, dtype=np.int64)
+    
+    # One Fixture per (room, symbol): sort inserts on a combined key so each
+    # group is a contiguous run (stable, so runs keep file order)
+    symbol_count = len(geometry.block_names)
+    keys = (insert_rooms + 1) * symbol_count + geometry.block_codes
+    order = np.argsort(keys, kind='stable')
+    group_keys, group_starts = np.unique(keys[order], return_index=True)
+    group_ends = np.append(group_starts[1:], len(order))
+    
+    fixtures = []
+    unassigned_room = None
+    for key, start, end in zip(group_keys.tolist(), group_starts.tolist(), group_ends.tolist()):
+        room_slot, code = divmod(key, symbol_count)
+        catalog_item = symbol_mapping.get(geometry.block_names[code])
+        if not catalog_item:
+            # Only create fixture if catalog item found
+            continue
+        
+        if room_slot > 0:
+            room = rooms[room_slot - 1]
         else:
-            for idx, room_data in enumerate(rooms_data):
-                room_area = room_data['area']
-                
-                # Validate and constrain room area (1 m² to 10,000 m²)
-                if room_area < 1.0:
-                    room_area = 1.0
-                elif room_area > 10000.0:
-                    # Skip unreasonably large rooms (likely parsing errors)
-                    continue
-                
-                room = Room.objects.create(
+            # Fixtures outside every room go to an explicit bucket
+            if unassigned_room is None:
+                unassigned_room = Room(
                     cad_file=cad_file,
-                    name=f"Room {idx + 1}" if idx > 0 else "Main Area",
-                    area=room_area,
+                    name="Unassigned",
+                    area=1.0,
                     height=3.0,
+                    required_lux=0,
+                    is_unassigned=True,
                 )
-                created_rooms.append(room)
-        
-        # If no valid rooms created, create a default one
-        if not created_rooms:
-            room = Room.objects.create(
-                cad_file=cad_file,
-                name="Main Area",
-                area=100.0,
-                height=3.0,
-            )
-            created_rooms.append(room)
-        
-        # Group blocks by name and count
-        blocks_data = parsed_data['blocks']
-        block_counts = defaultdict(list)
-        for block in blocks_data:
-            block_counts[block['block_name']].append(block)
-        
-        # Map symbols to catalog
-        unique_symbols = list(block_counts.keys())
-        symbol_mapping = map_symbols_to_catalog(unique_symbols, legend)
-        
-        # Distribute fixtures across rooms based on spatial proximity
-        # For simplicity, assign all fixtures to the first room
-        if created_rooms and block_counts:
-            room = created_rooms[0]
-            
-            for symbol, blocks in block_counts.items():
-                catalog_item = symbol_mapping.get(symbol)
-                if catalog_item:
-                    # Only create fixture if catalog item found
-                    Fixture.objects.create(
-                        room=room,
-                        lighting_catalog=catalog_item,
-                        quantity=len(blocks),
-                        x_coordinate=blocks[0]['x'],
-                        y_coordinate=blocks[0]['y'],
-                    )
+                rooms.append(unassigned_room)
+            room = unassigned_room
+        
+        inserts = order[start:end]
+        fixtures.append(Fixture(
+            room=room,
+            lighting_catalog=catalog_item,
+            cad_symbol=geometry.block_names[code],
+            quantity=len(inserts),
+            x_coordinate=float(geometry.x[inserts[0]]),
+            y_coordinate=float(geometry.y[inserts[0]]),
+            points=Fixture.pack_points(geometry.x[inserts], geometry.y[inserts], geometry.rotation[inserts]),
+        ))
+    
+    for room in rooms:
+        room.apply_derived_fields()
+    # One batched utilization factor lookup for every room
+    Room.apply_utilization_factors(rooms)
+    
+    # Drawn rooms without fixtures get a generated grid; by default only
+    # when the drawing has no fixture blocks at all (unmapped blocks are
+    # reported rather than replaced) and never in the outline-less
+    # default room
+    from .layout import default_layout_item, layout_fixtures
+    if layout_item is None and geometry.total_blocks == 0 and room_outlines:
+        layout_item = default_layout_item()
+    if layout_item is not None and room_outlines:
+        lit_rooms = {id(fixture.room) for fixture in fixtures}
+        empty_rooms = [room for room in rooms if not room.is_unassigned and id(room) not in lit_rooms]
+        fixtures.extend(layout_fixtures(empty_rooms, layout_item, cad_file.unit_scale))
+    
+    return rooms, fixtures
+
+
+def persist_analysis(cad_file: CADFile, rooms: List[Room], fixtures: List[Fixture]):
+    """
+    Write analysis results and mark the CAD file completed in one transaction
+    
+    A failure part-way leaves no rooms or fixtures behind.
+    
+    Args:
+        cad_file: CADFile model instance
+        rooms: Unsaved rooms from ``build_analysis``
+        fixtures: Unsaved fixtures referencing those rooms
+    """
+    from .aggregates import compute_aggregates
+    
+    # bulk_create skips signals, so fill the materialized aggregates here
+    compute_aggregates(cad_file, rooms, fixtures)
+    
+    with transaction.atomic():
+        Room.objects.bulk_create(rooms)
+        Fixture.objects.bulk_create(fixtures)
         
-        # Update status
         cad_file.status = 'completed'
-        cad_file.processed_at = datetime.now()
-        cad_file.save()
+        cad_file.processed_at = timezone.now()
+        cad_file.error_message = None
+        cad_file.save(update_fields=[
+            'status', 'processed_at', 'error_message', 'content_hash', 'unit_scale', 'symbol_report',
+            'total_lumens', 'fixture_count', 'total_cost', 'average_lux',
+        ])
+
+
+def process_cad_file(cad_file: CADFile, legend: Optional[Dict[str, str]] = None,
+                     layout_item: Optional[LightingCatalog] = None) -> bool:
+    """
+    Process uploaded CAD file and create Room and Fixture entries
+    
+    Args:
+        cad_file: CADFile model instance
+        legend: Optional mapping of CAD symbols to catalog entries
+        layout_item: Optional catalog item laid out in rooms without fixtures
         
-        return True
+    Returns:
+        True if processing successful, False otherwise
+    """
+    try:
+        # Update status
+        cad_file.status = 'processing'
+        CADFile.objects.filter(pk=cad_file.pk).update(status='processing')
+        
+        # Parse CAD file into columnar arrays (byte-identical uploads reuse
+        # the cached result)
+        from .parse_cache import parse_cad_cached
+        geometry, cad_file.content_hash = parse_cad_cached(cad_file.file.path, cad_file.content_hash or None)
+        
+        rooms, fixtures = build_analysis(cad_file, geometry, legend, layout_item)
+        persist_analysis(cad_file, rooms, fixtures)
         
     except Exception as e:
         cad_file.status = 'failed'
-        cad_file.error_message = str(e)
-        cad_file.save()
+        cad_file.error_message = str(e) or 'Unknown error'
+        # Aggregates filled in memory for the rolled-back rooms are not saved
+        cad_file.save(update_fields=['status', 'error_message'])
         return False
+    
+    # Remember the legend's mappings so repeat uploads skip fuzzy matching.
+    # The analysis is already saved; failing here only loses the mappings.
+    from .symbol_matcher import remember_symbols
+    try:
+        with transaction.atomic():
+            remember_symbols(cad_file.user_id, fixtures, legend, cad_file.symbol_report)
+    except Exception:
+        logger.exception("Could not record the symbol legend of CAD file %s", cad_file.pk)
+    
+    return True
 
 
-def generate_pdf_report(cad_file: CADFile) -> str:
+def generate_pdf_report(cad_file: CADFile, snapshot: Optional[ReportSnapshot] = None) -> str:
     """
     Generate PDF report for a CAD file with lighting analysis
     
     Args:
         cad_file: CADFile model instance
+        snapshot: ReportSnapshot to render (default: built from cad_file)
         
     Returns:
         Path to generated PDF file
     """
+    if snapshot is None:
+        snapshot = build_report_snapshot(cad_file)
+    
     # Create reports directory
     report_dir = os.path.join(settings.MEDIA_ROOT, 'reports')
     os.makedirs(report_dir, exist_ok=True)
@@ -325,139 +769,134 @@ def generate_pdf_report(cad_file: CADFile) -> str:
     filename = f"lighting_report_{cad_file.id}_{timestamp}.pdf"
     filepath = os.path.join(report_dir, filename)
     
-    # Create PDF
-    doc = SimpleDocTemplate(filepath, pagesize=A4)
-    story = []
-    styles = getSampleStyleSheet()
-    
-    # Title
-    title_style = ParagraphStyle(
-        'CustomTitle',
-        parent=styles['Heading1'],
-        fontSize=24,
-        textColor=colors.HexColor('#1a5490'),
-        spaceAfter=30,
-        alignment=TA_CENTER,
-    )
-    story.append(Paragraph("AutoLight Analyser Report", title_style))
-    story.append(Spacer(1, 0.3 * inch))
-    
-    # Project info
-    project_info = [
-        ['Project:', cad_file.project_name],
-        ['File:', cad_file.filename],
-        ['Date:', cad_file.uploaded_at.strftime('%Y-%m-%d %H:%M')],
-        ['User:', cad_file.user.get_full_name() or cad_file.user.username],
-    ]
-    
-    info_table = Table(project_info, colWidths=[2*inch, 4*inch])
-    info_table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (0, -1), colors.grey),
-        ('TEXTCOLOR', (0, 0), (0, -1), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-        ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, -1), 10),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 12),
-        ('BACKGROUND', (1, 0), (1, -1), colors.beige),
-        ('GRID', (0, 0), (-1, -1), 1, colors.black),
-    ]))
-    story.append(info_table)
-    story.append(Spacer(1, 0.5 * inch))
-    
-    # Room-by-room analysis
-    story.append(Paragraph("Lighting Analysis by Room", styles['Heading2']))
-    story.append(Spacer(1, 0.2 * inch))
-    
-    total_fixtures = 0
-    total_cost = Decimal('0.00')
+    # Large projects render room chunks in parallel and merge them
+    min_rooms = getattr(settings, 'PDF_PARALLEL_MIN_ROOMS', pdf_report.PARALLEL_MIN_ROOMS)
+    if snapshot.total_rooms >= min_rooms and pdf_report.parallel_available():
+        try:
+            pdf_report.render_parallel(
+                snapshot,
+                filepath,
+                chunk_rooms=getattr(settings, 'PDF_CHUNK_ROOMS', pdf_report.CHUNK_ROOMS),
+                workers=getattr(settings, 'PDF_WORKERS', pdf_report.DEFAULT_WORKERS),
+            )
+            return filepath
+        except (BrokenProcessPool, OSError) as e:
+            logger.warning("Parallel PDF rendering failed, rendering in process: %s", e)
+    
+    pdf_report.render_single(snapshot, filepath)
+    
+    return filepath
+
+
+# CSV lines joined into one streamed chunk
+CSV_LINES_PER_CHUNK = 1000
+
+
+class EchoBuffer:
+    """File-like object whose write() returns the value, for csv.writer"""
+
+    def write(self, value):
+        return value
+
+
+def csv_report_rows(project: ReportProject, rooms: Iterable[ReportRoom]) -> Iterator[List]:
+    """
+    Rows of the CSV report
+    
+    Summary totals are accumulated while the rooms are consumed, so
+    ``rooms`` may be a chunked iterator.
     
-    for room in cad_file.rooms.all():
-        # Room header
-        story.append(Paragraph(f"<b>{room.name}</b>", styles['Heading3']))
+    Args:
+        project: ReportProject header
+        rooms: ReportRoom records
         
-        room_data = [
-            ['Area:', f"{room.area:.2f} m²"],
-            ['Height:', f"{room.height:.2f} m"],
-            ['Required Lux:', f"{room.required_lux:.0f} lux"],
-            ['Current Lux:', f"{room.current_lux:.0f} lux"],
-            ['Status:', 'Adequate' if room.is_adequately_lit else 'Insufficient'],
+    Yields:
+        Lists of cell values
+    """
+    # Header
+    yield ['AutoLight Analyser Report']
+    yield ['Project:', project.project_name]
+    yield ['File:', project.filename]
+    yield ['Date:', project.uploaded_at.strftime('%Y-%m-%d %H:%M')]
+    yield ['User:', project.user_name]
+    yield []
+    
+    # Room-by-room data
+    total_rooms = total_fixtures = 0
+    total_cost = Decimal('0.00')
+    for room in rooms:
+        total_rooms += 1
+        total_fixtures += len(room.fixtures)
+        total_cost += room.total_cost
+        
+        yield [f'Room: {room.name}']
+        yield ['Area (m²)', 'Height (m)', 'Required Lux', 'Current Lux', 'Status']
+        yield [
+            f"{room.area:.2f}",
+            f"{room.height:.2f}",
+            f"{room.required_lux:.0f}",
+            f"{room.current_lux:.0f}",
+            'Adequate' if room.is_adequately_lit else 'Insufficient'
         ]
-        
-        room_table = Table(room_data, colWidths=[2*inch, 3*inch])
-        room_table.setStyle(TableStyle([
-            ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, -1), 9),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
-            ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
-        ]))
-        story.append(room_table)
-        story.append(Spacer(1, 0.2 * inch))
-        
-        # Fixtures table
-        if room.fixtures.exists():
-            fixture_data = [['Fixture', 'Quantity', 'Lumens/Unit', 'Total Lumens', 'Unit Cost', 'Total Cost']]
-            
-            for fixture in room.fixtures.all():
-                fixture_data.append([
-                    fixture.lighting_catalog.symbol_name,
-                    str(fixture.quantity),
-                    str(fixture.lighting_catalog.lumens),
-                    str(fixture.total_lumens),
-                    f"₹{fixture.lighting_catalog.unit_cost:.2f}",
-                    f"₹{fixture.total_cost:.2f}",
-                ])
-                total_fixtures += fixture.quantity
-                total_cost += fixture.total_cost
-            
-            fixture_table = Table(fixture_data, colWidths=[1.8*inch, 0.8*inch, 0.9*inch, 1*inch, 0.8*inch, 0.9*inch])
-            fixture_table.setStyle(TableStyle([
-                ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-                ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-                ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                ('FONTSIZE', (0, 0), (-1, -1), 8),
-                ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
-                ('GRID', (0, 0), (-1, -1), 1, colors.black),
-                ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.lightgrey]),
-            ]))
-            story.append(fixture_table)
-        else:
-            story.append(Paragraph("<i>No fixtures installed in this room</i>", styles['Italic']))
-        
-        story.append(Spacer(1, 0.3 * inch))
+        yield []
+        
+        # Fixtures
+        yield ['Fixture', 'Quantity', 'Lumens/Unit', 'Total Lumens', 'Unit Cost', 'Total Cost']
+        for fixture in room.fixtures:
+            yield [
+                fixture.symbol_name,
+                fixture.quantity,
+                fixture.lumens,
+                fixture.total_lumens,
+                f"{fixture.unit_cost:.2f}",
+                f"{fixture.total_cost:.2f}",
+            ]
+        yield []
     
     # Summary
-    story.append(PageBreak())
-    story.append(Paragraph("Project Summary", styles['Heading2']))
-    story.append(Spacer(1, 0.2 * inch))
-    
-    summary_data = [
-        ['Total Rooms:', str(cad_file.rooms.count())],
-        ['Total Fixtures:', str(total_fixtures)],
-        ['Total Project Cost:', f"₹{total_cost:.2f}"],
-    ]
-    
-    summary_table = Table(summary_data, colWidths=[3*inch, 3*inch])
-    summary_table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (0, -1), colors.HexColor('#1a5490')),
-        ('TEXTCOLOR', (0, 0), (0, -1), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-        ('FONTNAME', (0, 0), (-1, -1), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, -1), 12),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 15),
-        ('GRID', (0, 0), (-1, -1), 2, colors.black),
-    ]))
-    story.append(summary_table)
-    
-    # Build PDF
-    doc.build(story)
+    yield ['Summary']
+    yield ['Total Rooms', total_rooms]
+    yield ['Total Fixtures', total_fixtures]
+    yield ['Total Cost', f"{total_cost:.2f}"]
+
+
+def stream_csv_report(cad_file: CADFile) -> Iterator[str]:
+    """
+    CSV report as text chunks, for a StreamingHttpResponse
     
-    return filepath
+    Rooms are read ``report_data.DEFAULT_CHUNK_SIZE`` at a time, so memory
+    stays flat however large the project is.
+    
+    Args:
+        cad_file: CADFile model instance
+        
+    Yields:
+        Chunks of up to ``CSV_LINES_PER_CHUNK`` CSV lines
+    """
+    rooms = iter_report_rooms(cad_file, chunk_size=DEFAULT_CHUNK_SIZE)
+    writer = csv.writer(EchoBuffer())
+    lines = []
+    for row in csv_report_rows(report_project(cad_file), rooms):
+        lines.append(writer.writerow(row))
+        if len(lines) >= CSV_LINES_PER_CHUNK:
+            yield ''.join(lines)
+            lines = []
+    if lines:
+        yield ''.join(lines)
+
+
+def csv_report_filename(cad_file: CADFile) -> str:
+    """Download name of a CSV report generated now"""
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    return f"lighting_report_{cad_file.id}_{timestamp}.csv"
 
 
 def generate_csv_report(cad_file: CADFile) -> str:
     """
-    Generate CSV report for a CAD file with lighting analysis
+    Generate CSV report file for a CAD file with lighting analysis
+    
+    The download view streams ``stream_csv_report`` instead; this keeps a
+    copy on disk.
     
     Args:
         cad_file: CADFile model instance
@@ -469,136 +908,39 @@ def generate_csv_report(cad_file: CADFile) -> str:
     report_dir = os.path.join(settings.MEDIA_ROOT, 'reports')
     os.makedirs(report_dir, exist_ok=True)
     
-    # Generate filename
-    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-    filename = f"lighting_report_{cad_file.id}_{timestamp}.csv"
-    filepath = os.path.join(report_dir, filename)
-    
-    # Write CSV
+    filepath = os.path.join(report_dir, csv_report_filename(cad_file))
     with open(filepath, 'w', newline='', encoding='utf-8') as csvfile:
-        writer = csv.writer(csvfile)
-        
-        # Header
-        writer.writerow(['AutoLight Analyser Report'])
-        writer.writerow(['Project:', cad_file.project_name])
-        writer.writerow(['File:', cad_file.filename])
-        writer.writerow(['Date:', cad_file.uploaded_at.strftime('%Y-%m-%d %H:%M')])
-        writer.writerow(['User:', cad_file.user.get_full_name() or cad_file.user.username])
-        writer.writerow([])
-        
-        # Room-by-room data
-        for room in cad_file.rooms.all():
-            writer.writerow([f'Room: {room.name}'])
-            writer.writerow(['Area (m²)', 'Height (m)', 'Required Lux', 'Current Lux', 'Status'])
-            writer.writerow([
-                f"{room.area:.2f}",
-                f"{room.height:.2f}",
-                f"{room.required_lux:.0f}",
-                f"{room.current_lux:.0f}",
-                'Adequate' if room.is_adequately_lit else 'Insufficient'
-            ])
-            writer.writerow([])
-            
-            # Fixtures
-            writer.writerow(['Fixture', 'Quantity', 'Lumens/Unit', 'Total Lumens', 'Unit Cost', 'Total Cost'])
-            for fixture in room.fixtures.all():
-                writer.writerow([
-                    fixture.lighting_catalog.symbol_name,
-                    fixture.quantity,
-                    fixture.lighting_catalog.lumens,
-                    fixture.total_lumens,
-                    f"{fixture.lighting_catalog.unit_cost:.2f}",
-                    f"{fixture.total_cost:.2f}",
-                ])
-            writer.writerow([])
-        
-        # Summary
-        total_fixtures = sum(room.fixtures.count() for room in cad_file.rooms.all())
-        total_cost = sum(
-            fixture.total_cost
-            for room in cad_file.rooms.all()
-            for fixture in room.fixtures.all()
-        )
-        
-        writer.writerow(['Summary'])
-        writer.writerow(['Total Rooms', cad_file.rooms.count()])
-        writer.writerow(['Total Fixtures', total_fixtures])
-        writer.writerow(['Total Cost', f"{total_cost:.2f}"])
+        csvfile.writelines(stream_csv_report(cad_file))
     
     return filepath
 
 
-def get_budget_based_recommendations(current_fixture_cost, catalog_item, budget_range='medium', limit=15):
+def get_budget_based_recommendations(current_fixture_cost, catalog_item, budget_range='medium', limit=15, index=None):
     """
     Get fixture recommendations based on budget ranges with expanded catalog coverage
     
+    Budget bands (relative to the current cost):
+        below: 30-100%, cheapest first
+        within: 80-120%, brightest first
+        above: 100-150% (exclusive of 100%), brightest first
+    
+    Alternatives must be within ±35% of the current fixture's lumens.
+    
     Args:
         current_fixture_cost: Current fixture unit cost (in INR ₹)
         catalog_item: Current LightingCatalog item
         budget_range: 'below', 'within', 'above', or 'all' (default: 'medium' for varied selection)
         limit: Maximum number of recommendations to return (default: 15)
+        index: CatalogIndex to query (default: the process-local index)
         
     Returns:
-        QuerySet of recommended LightingCatalog items sorted by relevance, efficiency, and cost-effectiveness
-    """
-    from decimal import Decimal
-    
-    # Expanded budget thresholds for wider coverage
-    # Below: 30-100% of current cost
-    # Within: 80-120% of current cost  
-    # Above: 100-150% of current cost
-    below_min_threshold = current_fixture_cost * Decimal('0.3')
-    below_max_threshold = current_fixture_cost
-    within_min_threshold = current_fixture_cost * Decimal('0.8')
-    within_max_threshold = current_fixture_cost * Decimal('1.2')
-    above_min_threshold = current_fixture_cost
-    above_max_threshold = current_fixture_cost * Decimal('1.5')
-    
-    # Wider lumens range (±35%) to include more alternatives while maintaining quality
-    min_lumens = catalog_item.lumens * 0.65
-    max_lumens = catalog_item.lumens * 1.35
-    
-    # Base query: similar specifications, exclude current item
-    base_query = LightingCatalog.objects.filter(
-        lumens__gte=min_lumens,
-        lumens__lte=max_lumens,
-    ).exclude(id=catalog_item.id)
-    
-    recommendations = []
-    
-    if budget_range == 'below' or budget_range == 'all':
-        # Below budget: 30-100% of current cost (more affordable options)
-        below_budget = base_query.filter(
-            unit_cost__gte=below_min_threshold,
-            unit_cost__lt=below_max_threshold
-        ).order_by('unit_cost', '-lumens')[:limit]
-        recommendations.extend(below_budget)
-    
-    if budget_range == 'within' or budget_range == 'all':
-        # Within budget: ±20% (similar price range)
-        within_budget = base_query.filter(
-            unit_cost__gte=within_min_threshold,
-            unit_cost__lte=within_max_threshold
-        ).order_by('-lumens', 'unit_cost')[:limit]
-        recommendations.extend(within_budget)
-    
-    if budget_range == 'above' or budget_range == 'all':
-        # Above budget: 100-150% (premium options with better specs)
-        above_budget = base_query.filter(
-            unit_cost__gt=above_min_threshold,
-            unit_cost__lte=above_max_threshold
-        ).order_by('-lumens', 'unit_cost')[:limit]
-        recommendations.extend(above_budget)
-    
-    # Remove duplicates while preserving order
-    seen = set()
-    unique_recommendations = []
-    for item in recommendations:
-        if item.id not in seen:
-            seen.add(item.id)
-            unique_recommendations.append(item)
-    
-    return unique_recommendations[:limit]
+        List of recommended LightingCatalog items sorted by relevance, efficiency, and cost-effectiveness
+    """
+    from .catalog_index import get_catalog_index
+    
+    if index is None:
+        index = get_catalog_index()
+    return index.recommend(current_fixture_cost, catalog_item, budget_range, limit)
 
 
 def calculate_fixture_efficiency_score(fixture_catalog):
@@ -609,20 +951,7 @@ def calculate_fixture_efficiency_score(fixture_catalog):
         fixture_catalog: LightingCatalog instance
         
     Returns:
-        Efficiency score (higher is better)
+        Efficiency score (higher is better); stored as
+        ``LightingCatalog.efficiency_score`` on save
     """
-    from decimal import Decimal
-    
-    if fixture_catalog.wattage <= 0 or fixture_catalog.unit_cost <= 0:
-        return 0.0
-    
-    # Lumens per watt (energy efficiency)
-    luminous_efficacy = fixture_catalog.lumens / fixture_catalog.wattage
-    
-    # Cost efficiency (lumens per rupee)
-    cost_efficiency = fixture_catalog.lumens / float(fixture_catalog.unit_cost)
-    
-    # Combined score (normalized)
-    efficiency_score = (luminous_efficacy * 0.6) + (cost_efficiency * 0.4)
-    
-    return round(efficiency_score, 2)
+    return fixture_catalog.calculate_efficiency_score()
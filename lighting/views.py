@@ -3,24 +3,31 @@ Views for AutoLight Analyser application
 """
 import json
 import os
+import numpy as np
 from decimal import Decimal
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth import login, authenticate
 from django.contrib import messages
-from django.http import JsonResponse, FileResponse, Http404
-from django.db.models import Sum, Avg, Count
+from django.http import JsonResponse, FileResponse, Http404, StreamingHttpResponse
+from django.db.models import Sum, Avg, Count, Prefetch
 from django.views.decorators.http import require_http_methods
 from django.conf import settings
+from django.core.paginator import Paginator
+from django.template.loader import render_to_string
+from django.urls import reverse
 
 from .models import CADFile, Room, Fixture, LightingCatalog, Report
-from .utils import (
-    process_cad_file, 
-    generate_pdf_report, 
-    generate_csv_report, 
-    get_budget_based_recommendations,
-    calculate_fixture_efficiency_score
-)
+from .utils import csv_report_filename, process_cad_file, stream_csv_report
+from .recommendations import stored_recommendations
+from .energy import alternative_paybacks, project_energy
+from .layout import auto_layout
+from .optimizer import OBJECTIVES, apply_selection, optimize_project
+from .photometry import DEFAULT_SPACING, project_photometry, room_illuminance
+from .report_data import build_report_snapshot, snapshot_as_dict
+from .reports import CONTENT_TYPES, report_file_exists, request_report
+from .sweep import DEFAULT_FRONT_LIMIT, DEFAULT_PER_BAND, sweep_project
+from .symbol_matcher import remember_symbol
 from .forms import CADUploadForm, UserRegistrationForm
 
 
@@ -29,8 +36,11 @@ def dashboard(request):
     """
     Main dashboard showing project overview and analytics
     """
-    # Get user's projects
-    user_projects = CADFile.objects.filter(user=request.user, status='completed').order_by('-uploaded_at')[:10]
+    # Get user's projects (fixture/cost/lux totals are stored on CADFile);
+    # evaluated once since each slice of a queryset is a new query
+    user_projects = list(CADFile.objects.filter(user=request.user, status='completed').annotate(
+        room_total=Count('rooms')
+    ).order_by('-uploaded_at')[:10])
     
     # Calculate summary statistics
     total_projects = CADFile.objects.filter(user=request.user, status='completed').count()
@@ -38,20 +48,25 @@ def dashboard(request):
         total=Sum('quantity')
     )['total'] or 0
     
-    # Calculate average lux across all rooms
-    rooms = Room.objects.filter(cad_file__user=request.user, cad_file__status='completed')
-    avg_lux = sum(room.current_lux for room in rooms) / rooms.count() if rooms.count() > 0 else 0
+    # Calculate average lux across all rooms (stored per room)
+    avg_lux = Room.objects.filter(
+        cad_file__user=request.user, cad_file__status='completed', is_unassigned=False
+    ).aggregate(avg=Avg('current_lux'))['avg'] or 0
     
     # Prepare chart data
-    # Fixtures per room chart
-    fixtures_per_room = []
-    for project in user_projects[:5]:  # Latest 5 projects
-        for room in project.rooms.all():
-            fixture_count = room.fixtures.aggregate(total=Sum('quantity'))['total'] or 0
-            fixtures_per_room.append({
-                'room': f"{project.project_name} - {room.name}",
-                'count': fixture_count
-            })
+    # Fixtures per room chart: every room of the latest 5 projects in one query
+    latest_rooms = Room.objects.filter(
+        cad_file__in=[project.id for project in user_projects[:5]]
+    ).with_lighting_metrics().order_by('-cad_file__uploaded_at', 'name').values(
+        'cad_file__project_name', 'name', 'live_fixture_count'
+    )
+    fixtures_per_room = [
+        {
+            'room': f"{room['cad_file__project_name']} - {room['name']}",
+            'count': room['live_fixture_count'],
+        }
+        for room in latest_rooms
+    ]
     
     # Fixture types distribution
     fixture_types = Fixture.objects.filter(
@@ -63,21 +78,13 @@ def dashboard(request):
     # Lux trends per project
     lux_trends = []
     for project in user_projects[:10]:
-        rooms = project.rooms.all()
-        avg_project_lux = sum(room.current_lux for room in rooms) / rooms.count() if rooms.count() > 0 else 0
         lux_trends.append({
             'project': project.project_name,
-            'lux': round(avg_project_lux, 2)
+            'lux': round(project.average_lux, 2)
         })
     
-    # Calculate total costs per project
-    project_costs = []
-    for project in user_projects:
-        total_cost = Decimal('0.00')
-        for room in project.rooms.all():
-            for fixture in room.fixtures.all():
-                total_cost += fixture.total_cost
-        project_costs.append(total_cost)
+    # Total costs per project
+    project_costs = [project.total_cost for project in user_projects]
     
     context = {
         'total_projects': total_projects,
@@ -104,13 +111,14 @@ def upload_cad(request):
             cad_file = form.save(commit=False)
             cad_file.user = request.user
             cad_file.filename = request.FILES['file'].name
+            cad_file.content_hash = getattr(request, 'upload_hashes', {}).get('file', '')
             cad_file.save()
             
             # Process the file
             try:
-                # Get legend from form if provided
-                legend = form.cleaned_data.get('legend')
-                success = process_cad_file(cad_file, legend)
+                # Get legend from form if provided (parsed by clean_legend_json)
+                legend = form.cleaned_data.get('legend_json')
+                success = process_cad_file(cad_file, legend, form.cleaned_data.get('layout_fixture'))
                 
                 if success:
                     messages.success(request, 'CAD file uploaded and processed successfully!')
@@ -136,7 +144,35 @@ def results(request, cad_id):
     cad_file = get_object_or_404(CADFile, id=cad_id, user=request.user)
     
     # Get all rooms and fixtures
-    rooms = cad_file.rooms.all()
+    rooms = cad_file.rooms.prefetch_related(
+        Prefetch('fixtures', queryset=Fixture.objects.select_related('lighting_catalog'))
+    )
+    
+    # Stored alternatives for every catalog item in the project, read in one
+    # query (15 per budget band, top 20 by efficiency)
+    catalog_items = {
+        fixture.lighting_catalog_id: fixture.lighting_catalog
+        for room in rooms for fixture in room.fixtures.all()
+    }
+    recommendations = stored_recommendations(catalog_items.values())
+    no_recommendations = {'below': [], 'within': [], 'above': [], 'all_recommendations': []}
+    
+    # Annual running cost, cached per project revision; paybacks of every
+    # alternative follow from each item's usage
+    energy = project_energy(cad_file, dimming=request.GET.get('dimming') == '1')
+    
+    # The alternatives panel only depends on the catalog item, so render it
+    # once per item rather than once per fixture row
+    recommendation_panels = {}
+    for catalog_id, alternatives in recommendations.items():
+        if not alternatives['all_recommendations']:
+            continue
+        bands = ('below', 'within', 'above')
+        paybacks = alternative_paybacks(
+            energy, catalog_items[catalog_id], {rec.id: rec for band in bands for rec in alternatives[band]}.values()
+        )
+        panel = {band: [(rec, paybacks.get(rec.id)) for rec in alternatives[band]] for band in bands}
+        recommendation_panels[catalog_id] = render_to_string('lighting/recommendation_panel.html', {'alternatives': panel})
     
     # Prepare data for display
     lights = []
@@ -144,36 +180,7 @@ def results(request, cad_id):
     
     for room in rooms:
         for fixture in room.fixtures.all():
-            # Get comprehensive recommendations based on budget ranges
-            # Enhanced: Get more alternatives (15 per category instead of 5)
-            recommendations_below = get_budget_based_recommendations(
-                fixture.lighting_catalog.unit_cost, 
-                fixture.lighting_catalog, 
-                budget_range='below',
-                limit=15
-            )
-            recommendations_within = get_budget_based_recommendations(
-                fixture.lighting_catalog.unit_cost, 
-                fixture.lighting_catalog, 
-                budget_range='within',
-                limit=15
-            )
-            recommendations_above = get_budget_based_recommendations(
-                fixture.lighting_catalog.unit_cost, 
-                fixture.lighting_catalog, 
-                budget_range='above',
-                limit=15
-            )
-            
-            # Calculate efficiency scores for sorting
-            all_recommendations = list(recommendations_below) + list(recommendations_within) + list(recommendations_above)
-            for rec in all_recommendations:
-                rec.efficiency_score = calculate_fixture_efficiency_score(rec)
-            
-            # Sort by efficiency score and limit to top 20 (increased from 10)
-            all_recommendations.sort(key=lambda x: x.efficiency_score, reverse=True)
-            all_recommendations = all_recommendations[:20]
-            
+            alternatives = recommendations.get(fixture.lighting_catalog_id, no_recommendations)
             light_data = {
                 'room': room.name,
                 'dxf_block_name': fixture.lighting_catalog.symbol_name,
@@ -181,10 +188,11 @@ def results(request, cad_id):
                 'quantity': fixture.quantity,
                 'unit_price': fixture.lighting_catalog.unit_cost,
                 'total_price': fixture.total_cost,
-                'recommendations_below': recommendations_below,
-                'recommendations_within': recommendations_within,
-                'recommendations_above': recommendations_above,
-                'all_recommendations': all_recommendations,
+                'recommendations_below': alternatives['below'],
+                'recommendations_within': alternatives['within'],
+                'recommendations_above': alternatives['above'],
+                'all_recommendations': alternatives['all_recommendations'],
+                'fixture_id': fixture.id,
             }
             lights.append(light_data)
             total_price += fixture.total_cost
@@ -194,6 +202,8 @@ def results(request, cad_id):
         'lights': lights,
         'total_price': total_price,
         'rooms': rooms,
+        'recommendation_panels': recommendation_panels,
+        'energy': energy,
     }
     
     return render(request, 'lighting/results.html', context)
@@ -202,35 +212,70 @@ def results(request, cad_id):
 @login_required
 def generate_report(request, cad_id, report_type):
     """
-    Generate and download report (PDF or CSV)
+    Download a report: JSON and CSV are built on the fly (CSV streamed);
+    a PDF reuses the file built for the project's current revision,
+    otherwise it is queued and a page polls until it is ready
     """
     cad_file = get_object_or_404(CADFile, id=cad_id, user=request.user)
     
-    try:
-        if report_type == 'pdf':
-            file_path = generate_pdf_report(cad_file)
-            content_type = 'application/pdf'
-        elif report_type == 'csv':
-            file_path = generate_csv_report(cad_file)
-            content_type = 'text/csv'
-        else:
-            raise Http404("Invalid report type")
-        
-        # Save report reference
-        Report.objects.create(
-            cad_file=cad_file,
-            report_type=report_type,
-            file_path=file_path
-        )
-        
-        # Serve file
-        response = FileResponse(open(file_path, 'rb'), content_type=content_type)
-        response['Content-Disposition'] = f'attachment; filename="{os.path.basename(file_path)}"'
+    if report_type == 'json':
+        response = JsonResponse(snapshot_as_dict(build_report_snapshot(cad_file)))
+        response['Content-Disposition'] = f'attachment; filename="lighting_report_{cad_file.id}.json"'
         return response
-        
-    except Exception as e:
-        messages.error(request, f'Error generating report: {str(e)}')
+    
+    # CSV is cheap to produce row by row; stream it instead of storing it
+    if report_type == 'csv':
+        response = StreamingHttpResponse(stream_csv_report(cad_file), content_type=CONTENT_TYPES['csv'])
+        response['Content-Disposition'] = f'attachment; filename="{csv_report_filename(cad_file)}"'
+        return response
+    
+    try:
+        report = request_report(cad_file, report_type)
+    except ValueError:
+        raise Http404("Invalid report type")
+    
+    if report.status == 'ready':
+        return report_file_response(report)
+    if report.status == 'failed':
+        messages.error(request, f'Error generating report: {report.error_message}')
         return redirect('lighting:results', cad_id=cad_id)
+    
+    return render(request, 'lighting/report_status.html', {'cad_file': cad_file, 'report': report})
+
+
+def report_file_response(report):
+    """Serve a ready report's file as an attachment"""
+    response = FileResponse(report.file_path.open('rb'), content_type=CONTENT_TYPES[report.report_type])
+    response['Content-Disposition'] = f'attachment; filename="{os.path.basename(report.file_path.name)}"'
+    return response
+
+
+@login_required
+def download_report(request, report_id):
+    """
+    Download a generated report; back to its generation page until ready
+    """
+    report = get_object_or_404(Report, id=report_id, cad_file__user=request.user)
+    if report.status != 'ready' or not report_file_exists(report):
+        return redirect('lighting:generate_report', cad_id=report.cad_file_id, report_type=report.report_type)
+    return report_file_response(report)
+
+
+@login_required
+@require_http_methods(["GET"])
+def report_status(request, report_id):
+    """
+    AJAX endpoint polled while a report is generated
+    """
+    report = get_object_or_404(Report, id=report_id, cad_file__user=request.user)
+    response = {'success': True, 'status': report.status}
+    
+    if report.status == 'ready':
+        response['download_url'] = reverse('lighting:download_report', args=[report.id])
+    elif report.status == 'failed':
+        response['error'] = report.error_message
+    
+    return JsonResponse(response)
 
 
 @login_required
@@ -239,11 +284,11 @@ def project_detail(request, cad_id):
     Detailed view of a specific project
     """
     cad_file = get_object_or_404(CADFile, id=cad_id, user=request.user)
-    rooms = cad_file.rooms.all()
+    rooms = cad_file.rooms.with_lighting_metrics().order_by('is_unassigned', 'name')
     
-    # Calculate totals
-    total_fixtures = sum(fixture.quantity for room in rooms for fixture in room.fixtures.all())
-    total_cost = sum(fixture.total_cost for room in rooms for fixture in room.fixtures.all())
+    # Totals are stored on the CAD file
+    total_fixtures = cad_file.fixture_count
+    total_cost = cad_file.total_cost
     
     context = {
         'cad_file': cad_file,
@@ -273,6 +318,10 @@ def update_fixture_selection(request):
             fixture.lighting_catalog = new_catalog
             fixture.save()
             
+            # Remember the choice for this CAD block on future uploads
+            if fixture.cad_symbol:
+                remember_symbol(request.user.id, fixture.cad_symbol, new_catalog)
+            
             return JsonResponse({
                 'success': True,
                 'new_total_price': float(fixture.total_cost),
@@ -284,6 +333,164 @@ def update_fixture_selection(request):
     return JsonResponse({'success': False, 'error': 'Invalid request'}, status=400)
 
 
+@login_required
+@require_http_methods(["POST"])
+def optimize_fixtures(request, cad_id):
+    """
+    AJAX endpoint proposing the cheapest (or lowest-wattage) fixture selection
+    that keeps every room at its required lux, optionally under a budget.
+    Nothing is saved; accepted changes go to apply_optimization.
+    """
+    cad_file = get_object_or_404(CADFile, id=cad_id, user=request.user)
+    try:
+        data = json.loads(request.body or '{}')
+        objective = data.get('objective', 'cost')
+        if objective not in OBJECTIVES:
+            raise ValueError(f"Objective must be one of: {', '.join(OBJECTIVES)}")
+        budget = data.get('budget')
+        budget = Decimal(str(budget)) if budget not in (None, '') else None
+        
+        proposal = optimize_project(cad_file, objective=objective, budget=budget)
+        return JsonResponse({'success': True, **proposal})
+    except Exception as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+
+
+@login_required
+@require_http_methods(["POST"])
+def sweep_substitutions(request, cad_id):
+    """
+    AJAX endpoint with the cost / adequacy / wattage Pareto front of
+    substitution combinations. Nothing is saved; a chosen point's changes
+    go to apply_optimization.
+    """
+    cad_file = get_object_or_404(CADFile, id=cad_id, user=request.user)
+    try:
+        data = json.loads(request.body or '{}')
+        per_band = int(data.get('per_band', DEFAULT_PER_BAND))
+        limit = int(data.get('limit', DEFAULT_FRONT_LIMIT))
+        if not 1 <= per_band <= 15 or limit < 1:
+            raise ValueError('per_band must be 1-15 and limit positive')
+        
+        result = sweep_project(cad_file, per_band=per_band, limit=limit, seed=int(data.get('seed', 0)))
+        return JsonResponse({'success': True, **result})
+    except Exception as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+
+
+@login_required
+@require_http_methods(["POST"])
+def apply_optimization(request, cad_id):
+    """
+    AJAX endpoint applying accepted optimizer changes in one transaction
+    """
+    cad_file = get_object_or_404(CADFile, id=cad_id, user=request.user)
+    try:
+        data = json.loads(request.body)
+        updated = apply_selection(cad_file, data.get('changes', []))
+        
+        cad_file.refresh_from_db()
+        return JsonResponse({
+            'success': True,
+            'updated': updated,
+            'total_cost': float(cad_file.total_cost),
+            'average_lux': cad_file.average_lux,
+        })
+    except Exception as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+
+
+@login_required
+@require_http_methods(["POST"])
+def layout_fixtures(request, cad_id):
+    """
+    AJAX endpoint generating fixture grids of one catalog item
+
+    Body: ``catalog_id``, optional ``room_ids`` (default: every room) and
+    ``replace`` (default false: only rooms without fixtures are laid out).
+    """
+    cad_file = get_object_or_404(CADFile, id=cad_id, user=request.user)
+    try:
+        data = json.loads(request.body or '{}')
+        catalog_item = get_object_or_404(LightingCatalog, id=data.get('catalog_id'))
+        rooms = auto_layout(cad_file, catalog_item, data.get('room_ids'), bool(data.get('replace', False)))
+        
+        cad_file.refresh_from_db()
+        return JsonResponse({
+            'success': True,
+            'rooms': rooms,
+            'fixture_count': cad_file.fixture_count,
+            'total_cost': float(cad_file.total_cost),
+            'average_lux': cad_file.average_lux,
+        })
+    except Http404:
+        raise
+    except Exception as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+
+
+@login_required
+@require_http_methods(["GET"])
+def project_energy_summary(request, cad_id):
+    """
+    AJAX endpoint with the project's annual energy and operating cost
+
+    ``?dimming=1`` applies daylight dimming; ``?catalog=<id>`` adds the
+    payback of swapping that installed item for each stored alternative.
+    """
+    cad_file = get_object_or_404(CADFile, id=cad_id, user=request.user)
+    energy = project_energy(cad_file, dimming=request.GET.get('dimming') == '1')
+    response = {key: value for key, value in energy.items() if key != 'items'}
+    
+    catalog_id = request.GET.get('catalog')
+    if catalog_id is not None:
+        catalog_item = get_object_or_404(LightingCatalog, id=catalog_id)
+        alternatives = stored_recommendations([catalog_item])[catalog_item.id]['all_recommendations']
+        paybacks = alternative_paybacks(energy, catalog_item, alternatives)
+        response['alternatives'] = [
+            {'catalog_id': item.id, 'symbol_name': item.symbol_name, 'wattage': item.wattage,
+             'unit_cost': float(item.unit_cost), **paybacks[item.id]}
+            for item in alternatives if item.id in paybacks
+        ]
+    
+    return JsonResponse({'success': True, **response})
+
+
+@login_required
+@require_http_methods(["GET"])
+def room_photometry(request, cad_id):
+    """
+    AJAX endpoint with point-by-point illuminance per room
+
+    ``?spacing=`` sets the grid spacing in meters; ``?room=<id>`` limits the
+    result to one room and includes its grid points.
+    """
+    cad_file = get_object_or_404(CADFile, id=cad_id, user=request.user)
+    try:
+        spacing = float(request.GET.get('spacing', DEFAULT_SPACING))
+        if spacing <= 0:
+            raise ValueError('Spacing must be positive')
+        
+        room_id = request.GET.get('room')
+        if room_id is None:
+            return JsonResponse({'success': True, 'rooms': project_photometry(cad_file, spacing)})
+        
+        room = get_object_or_404(Room, id=room_id, cad_file=cad_file)
+        fixtures = room.fixtures.select_related('lighting_catalog')
+        grid = room_illuminance(room, fixtures, cad_file.unit_scale, spacing)
+        return JsonResponse({
+            'success': True,
+            'room': {'room_id': room.id, 'name': room.name, 'required_lux': room.required_lux, **grid.summary()},
+            'grid': {
+                'x': np.round(grid.x, 3).tolist(),
+                'y': np.round(grid.y, 3).tolist(),
+                'lux': np.round(grid.lux, 1).tolist(),
+            },
+        })
+    except ValueError as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+
+
 def register(request):
     """
     User registration view
@@ -310,14 +517,42 @@ def register(request):
     return render(request, 'lighting/register.html', {'form': form})
 
 
+CATALOG_PAGE_SIZE = 48
+
+CATALOG_SORT_ORDERS = {
+    'name': ('symbol_name',),
+    'efficiency': ('-efficiency_score', 'symbol_name'),
+    'lumens': ('-lumens', 'symbol_name'),
+    'price': ('unit_cost', 'symbol_name'),
+}
+
+CATALOG_SORT_LABELS = [
+    ('name', 'Name'),
+    ('efficiency', 'Efficiency'),
+    ('lumens', 'Lumens'),
+    ('price', 'Price'),
+]
+
+
 def catalog_list(request):
     """
     Display lighting catalog
+    
+    ``?sort=efficiency`` orders by the stored efficiency score; pages are
+    fetched with LIMIT/OFFSET so the whole catalog is never loaded.
     """
-    catalog_items = LightingCatalog.objects.all().order_by('symbol_name')
+    sort = request.GET.get('sort')
+    if sort not in CATALOG_SORT_ORDERS:
+        sort = 'name'
+    catalog_items = LightingCatalog.objects.order_by(*CATALOG_SORT_ORDERS[sort])
+    
+    page = Paginator(catalog_items, CATALOG_PAGE_SIZE).get_page(request.GET.get('page'))
     
     context = {
-        'catalog_items': catalog_items,
+        'catalog_items': page.object_list,
+        'page': page,
+        'sort': sort,
+        'sort_options': CATALOG_SORT_LABELS,
     }
     
     return render(request, 'lighting/catalog.html', context)